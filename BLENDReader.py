@@ -2,8 +2,13 @@
 
 # Imports from the python standard library.
 import os
-import random
-import subprocess
+import copy
+import mmap
+import time
+import struct
+
+# Imports from third party libraries.
+import numpy
 
 # Imports from Uranium.
 from UM.Mesh.MeshReader import MeshReader
@@ -11,16 +16,49 @@ from UM.Platform import Platform
 from UM.Logger import Logger
 from UM.Message import Message
 from UM.Application import Application
-from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
 from UM.Math.Vector import Vector
+from UM.Mesh.MeshBuilder import MeshBuilder
+from UM.Resources import Resources
+from UM.Operations.GroupedOperation import GroupedOperation
+from UM.Operations.AddSceneNodeOperation import AddSceneNodeOperation
+from UM.Operations.RemoveSceneNodeOperation import RemoveSceneNodeOperation
 
 # Imports from Cura.
 from cura.Scene.CuraSceneNode import CuraSceneNode
 
 # Imports from own package.
 from CuraBlender import CuraBlender
+from CuraBlender import BlenderWorker
+from CuraBlender import BlenderCapabilities
+from CuraBlender import Tracing
+from CuraBlender import ScratchDirectory
+from CuraBlender import Placement
+from CuraBlender.MeshCache import MeshCache
+from CuraBlender.FormatSelector import FormatSelector
+from CuraBlender.BlendFile import BlendFile, BlendFileError
+from CuraBlender.BlendMesh import read_meshes, read_bounding_boxes
+from CuraBlender.ProgressiveLoadJob import ProgressiveLoadJob
+from CuraBlender.SceneIndex import SceneIndex, get_source_key
 from CuraBlender.DeprecatedVersionCheck import DEPRECATED_VERSION
 
+# Imports from QT.
+if not DEPRECATED_VERSION:
+    from PyQt6.QtCore import QTimer
+else:
+    from PyQt5.QtCore import QTimer
+
+# Header of our binary mesh files: Magic, number of vertices, number of triangles. Must match the one used by the BlenderAPI.
+RAW_MAGIC = b'CBRAW001'
+RAW_HEADER = '<8sII'
+
+# Binary stl files: A header of 80 bytes, the number of triangles and per triangle its normal, three vertices and an attribute.
+STL_HEADER_SIZE = 84
+STL_TRIANGLE = numpy.dtype([('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+
+# Triangles of the proxy boxes. The corners are ordered by their X, Y and Z bit.
+BOX_TRIANGLES = numpy.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                             [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]], dtype = numpy.int32)
+
 if Platform.isWindows():
     if not DEPRECATED_VERSION:
         from PyQt6.QtCore import QEventLoop  # Windows fix for using file watcher on removable devices.
@@ -44,12 +82,32 @@ class BLENDReader(MeshReader):
         self._supported_foreign_extensions = ['stl', 'obj', 'x3d', 'ply']
 
         self._file_extension = None
+        self._export_extension = None
+        self._cache_extension = None
+        self._triangle_budget = None
         self._curasplit = None
         self._check = None
         self._file_path = None
-        self._plugin_path = None
-        self._script_path = None
         self._blender_path = None
+        self._cache = None
+        self._format_selector = None
+        self._auto_format = None
+        self._min_version = None
+        # The result of the native reader for the proxies of a file. Reused by the following conversion.
+        self._native_meshes = None
+        # The result of inspecting the file the native reader parsed last. Saves parsing it again, if blender is needed.
+        self._inspection = None
+        # Fingerprints of all objects of the last conversion with blender per file. Used to skip unchanged objects on reload.
+        self._fingerprints = {}
+        # Number of vertices blender reported per object and file. Used to choose the format when converting a single object.
+        self._object_vertices = {}
+        # Names of the objects of the last conversion with blender by their index. Used to match the proxies.
+        self._object_names = {}
+        # Gets the name and the node of every object as soon as blender exported it. Only set for progressive loads.
+        self._object_loaded = None
+        # Progressive loads which wait for the read to add their proxies to the scene. Only used on the main thread.
+        self._waiting_loads = []
+        self._waiting_timer = None
 
 
     def read(self, file_path):
@@ -60,66 +118,341 @@ class BLENDReader(MeshReader):
         """
 
         self._file_extension = Application.getInstance().getPreferences().getValue('cura_blender/file_extension')
+        self._blender_path = Application.getInstance().getPreferences().getValue('cura_blender/blender_path')
+        # The automatic mode chooses the format per object by measured costs. The chosen format follows the cache extension, e.g. 'auto.ply'.
+        # It takes priority over binary transfer, which skips the encoding and decoding of the file format chosen by the user.
+        self._auto_format = False
+        if Application.getInstance().getPreferences().getValue('cura_blender/auto_file_extension'):
+            self._auto_format = True
+            self._export_extension = 'auto'
+        elif Application.getInstance().getPreferences().getValue('cura_blender/binary_transfer'):
+            self._export_extension = 'raw'
+        else:
+            self._export_extension = self._file_extension
+        # Objects get decimated to stay within the triangle budget. Reduced results are cached separately per budget.
+        self._triangle_budget = int(Application.getInstance().getPreferences().getValue('cura_blender/triangle_budget') or 0)
+        if self._triangle_budget > 0:
+            self._cache_extension = 'b{}.{}'.format(self._triangle_budget, self._export_extension)
+        else:
+            self._cache_extension = self._export_extension
 
         # The return value: A list all nodes gets appended to. If file only contains one object, the list will be of length one.
         nodes = []
 
-        # Only continues if correct path to blender is set.
-        if not CuraBlender.CuraBlender.verify_blender_path(manual=False):
-            # Failure message already gets called at other place.
-            Logger.logException('e', 'Problems with path to blender!')
         # Checks if file extension for conversion is supported (stl, obj, x3d, ply).
-        elif self._file_extension not in self._supported_foreign_extensions:
+        if self._file_extension not in self._supported_foreign_extensions:
             Logger.logException('e', '%s file extension is not supported!', self._file_extension)
             message = Message(text=CuraBlender.catalog.i18nc('@info', '{} file extension is not supported!\nAllowed: {}'.format(self._file_extension, self._supported_foreign_extensions)),
                               title=CuraBlender.catalog.i18nc('@info:title', 'Unsupported file extension'))
             message.show()
-        # Path to blender and file extension is correct. Continues.
+        # File extension is correct. Continues.
         else:
-            self._curasplit = False
-            self._check = False
-            self._file_path = file_path
-
-            temp_path = self._convert_and_open_file(file_path, nodes)
-
-            # Checks if file does not contain any objects.
-            if temp_path == 'no_object':
-                Logger.logException('e', '%s does not contain any objects!', file_path)
-                message = Message(text=CuraBlender.catalog.i18nc('@info', '{}\ndoes not contain any objects.'.format(file_path)),
-                                  title=CuraBlender.catalog.i18nc('@info:title', 'No object found'))
-                message.show()
-            # Checks if user has permission for path of current file.
-            elif temp_path == 'no_permission':
-                Logger.logException('e', '%s - write permission needed!', file_path)
-                message = Message(text=CuraBlender.catalog.i18nc('@info', 'Blender plugin needs write permission.\nPlease move your file or give permission.\n\nPath: {}'.format(file_path)),
-                                  title=CuraBlender.catalog.i18nc('@info:title', 'Not enough permission for this path'))
-                message.show()
-            # Checks if the file is too complex for aimed file extension.
-            elif temp_path == 'complex_filetype':
-                self._complex_file_type()
-            # Continues if file is converted correctly.
-            else:
-                self._change_watched_file(temp_path, file_path)
-
-                if not self._curasplit:
-                    for node in DepthFirstIterator(Application.getInstance().getController().getScene().getRoot()):
-                        if isinstance(node, CuraSceneNode):
-                            if node.callDecoration("isGroup"):
-                                for child in node.getChildren():
-                                    if file_path in child.getMeshData().getFileName() or file_path[:-6] + '_curasplit_' in child.getMeshData().getFileName():
-                                        self._curasplit = True
-                                        break
-                            else:
-                                # Checks if read is actually a reload or if the file is already opened and suppress the scaling message.
-                                if file_path in node.getMeshData().getFileName() or file_path[:-6] + '_curasplit_' in node.getMeshData().getFileName():
-                                    self._curasplit = True
-                                    break
-
-                self._calculate_and_set_scale(nodes)
+            with Tracing.span('Read file', file = file_path):
+                self._curasplit = False
+                self._check = False
+                self._file_path = file_path
+
+                # Files which need blender show proxies first. Their full meshes get converted in the background.
+                proxies = self._create_proxies(file_path)
+                if proxies:
+                    nodes.extend(proxies.values())
+                    temp_path = file_path
+                    job = ProgressiveLoadJob(self._snapshot(), file_path, proxies)
+                    job.objectLoaded.connect(self._progressive_object_loaded)
+                    job.finished.connect(self._progressive_load_finished)
+                    job.start()
+                else:
+                    temp_path = self._convert_and_open_file(file_path, nodes)
+
+                # Continues if file is converted correctly.
+                if self._report_status(temp_path, file_path):
+                    self._change_watched_file(temp_path, file_path)
+
+                    # Checks if read is actually a reload or if the file is already opened and suppress the scaling message.
+                    if not self._curasplit and SceneIndex.get_instance().get_nodes(file_path):
+                        self._curasplit = True
+
+                    with Tracing.span('Scale'):
+                        self._calculate_and_set_scale(nodes)
 
         return nodes
 
 
+    def _report_status(self, temp_path, file_path):
+        """Shows the failure message for the status returned by the conversion.
+
+        :param temp_path: The path of the converted file or the status of the failed conversion.
+        :param file_path: The path of the file we try to open.
+        :return: The boolean value if the file got converted correctly.
+        """
+
+        # Checks if blender was needed, but no correct path to blender is set.
+        if temp_path == 'no_blender':
+            # Failure message already gets called at other place.
+            Logger.logException('e', 'Problems with path to blender!')
+        # Checks if file does not contain any objects.
+        elif temp_path == 'no_object':
+            Logger.logException('e', '%s does not contain any objects!', file_path)
+            message = Message(text=CuraBlender.catalog.i18nc('@info', '{}\ndoes not contain any objects.'.format(file_path)),
+                              title=CuraBlender.catalog.i18nc('@info:title', 'No object found'))
+            message.show()
+        # Checks if user has permission for path of current file.
+        elif temp_path == 'no_permission':
+            Logger.logException('e', '%s - write permission needed!', file_path)
+            message = Message(text=CuraBlender.catalog.i18nc('@info', 'Blender plugin needs write permission.\nPlease choose another scratch directory or give permission.\n\nPath: {}'.format(self._get_temp_directory())),
+                              title=CuraBlender.catalog.i18nc('@info:title', 'Not enough permission for this path'))
+            message.show()
+        # Checks if blender crashed or didn't report a result.
+        elif temp_path == 'blender_failed':
+            Logger.logException('e', 'Blender failed to convert %s!', file_path)
+            message = Message(text=CuraBlender.catalog.i18nc('@info', 'Blender failed to convert\n{}.\nPlease open the file in blender to check it.'.format(file_path)),
+                              title=CuraBlender.catalog.i18nc('@info:title', 'Blender failed'))
+            message.show()
+        # Checks if the installed blender is too old for the file.
+        elif temp_path == 'too_new':
+            Logger.logException('e', '%s needs at least blender %s!', file_path, self._min_version)
+            message = Message(text=CuraBlender.catalog.i18nc('@info', '{}\nneeds at least blender {}.{}. Please update your blender version.'.format(file_path, *self._min_version)),
+                              title=CuraBlender.catalog.i18nc('@info:title', 'File from newer blender version'))
+            message.show()
+        # Checks if the file is too complex for aimed file extension.
+        elif temp_path == 'complex_filetype':
+            self._complex_file_type()
+        # Checks if a newer reload of the changed file superseded the conversion. Its result follows soon.
+        elif temp_path == 'cancelled':
+            Logger.log('d', 'Conversion of %s got cancelled.', file_path)
+        else:
+            return True
+        return False
+
+
+    def _create_proxies(self, file_path):
+        """Creates a bounding box per object, if the file needs blender. Shown on the build plate until blender is done.
+
+        :param file_path: The path of the file we try to open.
+        :return: A dictionary of proxy nodes by object name or None if the file gets loaded directly.
+        """
+
+        if not Application.getInstance().getPreferences().getValue('cura_blender/progressive_loading') or '_curasplit_' in file_path:
+            return None
+        # Reloads replace the meshes of the nodes on the build plate, so they need the full meshes right away.
+        if SceneIndex.get_instance().get_nodes(file_path):
+            return None
+        # Cached files and plain meshes are fast enough without proxies.
+        cache = self._get_cache()
+        key = self._get_cache_key(cache, file_path)
+        if key and cache.get_objects(key, self._cache_extension) is not None:
+            return None
+        # Keeps the result, so the conversion doesn't read the file a second time.
+        self._native_meshes = (file_path, self._read_native_file(file_path))
+        if self._native_meshes[1] is not None:
+            return None
+        if not CuraBlender.CuraBlender.verify_blender_path(manual=False):
+            return None
+
+        try:
+            boxes = read_bounding_boxes(file_path)
+        except (OSError, BlendFileError) as error:
+            Logger.log('d', 'No proxies for %s: %s', file_path, error)
+            return None
+
+        proxies = {}
+        for (index, (name, minimum, maximum)) in enumerate(boxes):
+            # Named like the final nodes, so reloads and the scene index already work with the proxies.
+            if len(boxes) == 1:
+                file_name = file_path
+            else:
+                file_name = '{}_curasplit_{}.blend'.format(file_path[:-6], index + 1)
+            corners = numpy.array([minimum, maximum])
+            vertices = numpy.array([[corners[x, 0], corners[y, 1], corners[z, 2]] for x in (0, 1) for y in (0, 1) for z in (0, 1)])
+            proxies[name] = self._build_node(vertices, BOX_TRIANGLES, file_name)
+        return proxies or None
+
+
+    def _snapshot(self):
+        """Copies the reader together with the settings of the current read for a conversion in the background.
+
+        Reads of other files change the settings of this reader while the conversion runs. The copy shares the cache, the
+        format selector and the fingerprints, so it creates them before copying.
+
+        :return: The copy of the reader.
+        """
+
+        self._get_cache()
+        if self._auto_format:
+            self._get_format_selector()
+        snapshot = copy.copy(self)
+        # The results of the native reader belong to the copy now.
+        self._native_meshes = None
+        self._inspection = None
+        return snapshot
+
+
+    def convert_in_background(self, file_path, nodes, object_loaded = None):
+        """Converts the file for the proxies created by the read. Called by the progressive load job on a snapshot of the reader.
+
+        :param file_path: The path of the file we try to open.
+        :param nodes: A list of nodes on which we will append all nodes contained in the file.
+        :param object_loaded: Gets the name and the node of every object as soon as blender exported it.
+        :return: A temporary path of the converted file or the status of the failed conversion.
+        """
+
+        self._check = False
+        self._file_path = file_path
+        self._object_loaded = object_loaded
+        return self._convert_and_open_file(file_path, nodes)
+
+
+    def _progressive_object_loaded(self, job, name, node):
+        """On object loaded connection of the progressive load job. Swaps the mesh of a single proxy for the full mesh.
+
+        :param job: The running job with the proxies.
+        :param name: The name of the loaded object.
+        :param node: The node with the full mesh of the object.
+        """
+
+        proxy = job.proxies.get(name)
+        # Objects without a proxy get added once the job is finished.
+        if proxy is None:
+            return
+        changed_nodes = []
+        self._swap_proxy(job, proxy, node, changed_nodes, GroupedOperation())
+        Placement.place_changed_nodes(changed_nodes)
+
+
+    def _progressive_load_finished(self, job):
+        """On progressive load job finished connection. Swaps the meshes of the remaining proxies for the full meshes.
+
+        :param job: The finished job with the proxies and the converted nodes.
+        """
+
+        (temp_path, nodes) = job.getResult() or ('no_object', [])
+        file_path = job.getFileName()
+        scene_root = Application.getInstance().getController().getScene().getRoot()
+
+        # The file changed while converting. The reload of the changed file replaces the meshes of the proxies instead.
+        if temp_path == 'cancelled':
+            return
+
+        # The read didn't add the proxies to the scene yet, so their scale isn't final either.
+        if not job.added_proxies:
+            job.waiting_result = True
+            self._wait_for_proxies(job)
+            return
+
+        # Failed conversions don't leave any proxies behind. The snapshot knows the details of the failure.
+        if not job.reader._report_status(temp_path, file_path):
+            nodes = []
+        else:
+            self._change_watched_file(temp_path, file_path)
+
+        with Tracing.span('Swap proxies', file = file_path):
+            proxies = dict(job.proxies)
+            # Nodes added by blender get the scale of the proxies, which was calculated for the whole file.
+            scale = next(iter(job.proxies.values())).getScale()
+            changed_nodes = []
+            operation = GroupedOperation()
+            for node in nodes:
+                # The bounding boxes only cover visible meshes with vertices, so the position of a proxy can differ from its index.
+                source_key = get_source_key(node.getMeshData().getFileName())
+                proxy = proxies.pop(job.reader._object_names.get(source_key and source_key[1]), None)
+                if proxy is None:
+                    node.setScale(scale)
+                    operation.addOperation(AddSceneNodeOperation(node, scene_root))
+                    changed_nodes.append((node, None))
+                # Proxies of objects blender reported while converting already got their full mesh.
+                elif proxy not in job.swapped_proxies:
+                    self._swap_proxy(job, proxy, node, changed_nodes, operation)
+            # Proxies of objects blender didn't export.
+            for proxy in proxies.values():
+                self._swap_proxy(job, proxy, None, changed_nodes, operation)
+            if operation.getNumChildrenOperations():
+                operation.push()
+            with Tracing.span('Place'):
+                Placement.place_changed_nodes(changed_nodes)
+        Logger.log('i', 'Replaced the proxies of %s with %d full meshes.', file_path, len(nodes))
+
+
+    def _swap_proxy(self, job, proxy, node, changed_nodes, operation):
+        """Swaps the mesh of a proxy for the full mesh or removes the proxy. Waits for proxies, which the read didn't add to the scene yet.
+
+        :param job: The progressive load job of the proxy.
+        :param proxy: The proxy node.
+        :param node: The node with the full mesh or None to remove the proxy.
+        :param changed_nodes: A list on which the swapped proxy gets appended together with its old bounding box.
+        :param operation: The grouped operation which gets the removal of the proxy.
+        """
+
+        if proxy.getParent() is None:
+            # Proxies removed by the user stay removed.
+            if proxy not in job.added_proxies:
+                job.waiting_nodes[proxy] = node
+                self._wait_for_proxies(job)
+        elif node is None:
+            operation.addOperation(RemoveSceneNodeOperation(proxy))
+        else:
+            # Keeps position, scale and settings of the proxy.
+            old_box = proxy.getBoundingBox()
+            proxy.setMeshData(node.getMeshData())
+            job.swapped_proxies.add(proxy)
+            changed_nodes.append((proxy, old_box))
+
+
+    def _wait_for_proxies(self, job):
+        """Finishes the swaps of a job as soon as the read added its proxies to the scene.
+
+        :param job: The progressive load job with waiting swaps or a waiting result.
+        """
+
+        if job in self._waiting_loads:
+            return
+        if not self._waiting_loads:
+            Application.getInstance().getController().getScene().sceneChanged.connect(self._scene_changed)
+        self._waiting_loads.append(job)
+
+
+    def _scene_changed(self, source):
+        """On scene changed connection. Checks for added proxies after the change, e.g. after the read added all of them.
+
+        :param source: The node which changed.
+        """
+
+        # Swapping while the read still adds its nodes would interfere with it.
+        if self._waiting_timer is None:
+            self._waiting_timer = QTimer()
+            self._waiting_timer.setSingleShot(True)
+            self._waiting_timer.timeout.connect(self._swap_waiting_proxies)
+        self._waiting_timer.start(0)
+
+
+    def _swap_waiting_proxies(self):
+        """Swaps the waiting proxies, which the read has added to the scene by now. Jobs whose proxies are still missing keep waiting."""
+
+        jobs = self._waiting_loads
+        if not jobs:
+            return
+        self._waiting_loads = []
+        Application.getInstance().getController().getScene().sceneChanged.disconnect(self._scene_changed)
+
+        for job in jobs:
+            if not job.added_proxies:
+                self._wait_for_proxies(job)
+                continue
+
+            changed_nodes = []
+            operation = GroupedOperation()
+            waiting_nodes = job.waiting_nodes
+            job.waiting_nodes = {}
+            for (proxy, node) in waiting_nodes.items():
+                self._swap_proxy(job, proxy, node, changed_nodes, operation)
+            if operation.getNumChildrenOperations():
+                operation.push()
+            Placement.place_changed_nodes(changed_nodes)
+
+            if job.waiting_result:
+                job.waiting_result = False
+                self._progressive_load_finished(job)
+
+
     def _calculate_and_set_scale(self, nodes):
         """Calculates the needed scale factor based on equivalence classes and finally scales all nodes equally.
 
@@ -230,163 +563,656 @@ class BLENDReader(MeshReader):
         :return: A temporary path of the converted file.
         """
 
+        try:
+            return self._convert_and_read_file(file_path, nodes)
+        except BlenderWorker.CancelledError:
+            # The file changed again and a newer reload superseded this one.
+            del nodes[:]
+            return 'cancelled'
+        finally:
+            # Removes everything blender wrote for this file, even if the conversion failed halfway. Split objects use the original file.
+            ScratchDirectory.remove_files(self._build_temp_prefix((get_source_key(file_path) or (file_path,))[0]))
+            # Saves the times of all cache hits of this read at once.
+            cache = self._get_cache()
+            if cache:
+                cache.flush()
+            if self._auto_format:
+                self._get_format_selector().save()
+
+
+    def _convert_and_read_file(self, file_path, nodes, use_cache = True):
+        """Converts the original file in the scratch directory and reads the converted files or the cached ones.
+
+        :param file_path: The original path of the file we try to open.
+        :param nodes: A list of nodes on which we will append all nodes contained in the file.
+        :param use_cache: If false, converts the file even if the cache knows it, e.g. because cached files got evicted meanwhile.
+        :return: A temporary path of the converted file.
+        """
+
+        cache = self._get_cache()
+        first_node = len(nodes)
+
         # Checks, if file path contains the _curasplit_ flag (which indicates an already opened and split file -> important for reload).
         if '_curasplit_' not in file_path:
-            command = self._build_command('Count nodes', file_path)
-            objects = subprocess.run(command, shell = True, universal_newlines = True, stdout = subprocess.PIPE, check = False)
-            # Checks output of our spawned subprocess which calculated the number of objects contained in the file.
-            for nextline in objects.stdout.splitlines():
-                if nextline.isdigit():
-                    objects = int(nextline)
-                    break
+            # A cache hit skips blender entirely.
+            with Tracing.span('Cache lookup'):
+                key = self._get_cache_key(cache, file_path)
+                objects = cache.get_objects(key, self._cache_extension) if key and use_cache else None
+            converted = objects is None
+            if converted:
+                # Plain meshes get read directly from the file without blender.
+                with Tracing.span('Native read'):
+                    meshes = self._read_native_file(file_path)
+                if meshes is not None:
+                    if not meshes:
+                        return 'no_object'
+                    native_nodes = [self._build_native_node(mesh, file_path) for mesh in meshes]
+                    # Meshes which can't be built get converted by blender instead.
+                    if None not in native_nodes:
+                        for (index, node) in enumerate(native_nodes):
+                            if len(meshes) > 1:
+                                node.setMeshData(node.getMeshData().set(file_name='{}_curasplit_{}.blend'.format(file_path[:-6], index + 1)))
+                            nodes.append(node)
+                        self._fingerprints.pop(file_path, None)
+                        return file_path
+
+                # Rejects files without blender, which can't be loaded anyway.
+                with Tracing.span('Inspect file'):
+                    check = self._inspect_file(file_path)
+                if check:
+                    return check
+
+                # Only continues if correct path to blender is set.
+                if not CuraBlender.CuraBlender.verify_blender_path(manual=False):
+                    return 'no_blender'
+
+                # Objects which are still on the build plate and didn't change since the last conversion don't get exported again.
+                (known_fingerprints, unchanged) = self._get_unchanged_objects(file_path)
+
+                # Counts and exports all objects in a single blender process. Every object gets its own file with the index as suffix.
+                # The automatic mode lets blender choose the format of every object by its number of vertices.
+                temp_prefix = self._build_temp_prefix(file_path)
+                export_extension = self._get_format_selector().build_plan(self._file_extension) if self._auto_format else self._export_extension
+                self._object_names = {}
+                streamed = {}
+                output = BlenderWorker.run_program('All nodes', file_path, temp_prefix, export_extension, ';'.join(known_fingerprints),
+                                                  str(self._triangle_budget),
+                                                  on_line = self._build_line_reader(file_path, cache, key, streamed) if self._object_loaded else None)
+                # Checks output of our blender program which calculated the number of objects contained in the file.
+                objects = None
+                fingerprints = {}
+                exports = {}
+                for nextline in output.splitlines():
+                    if nextline.isdigit() and objects is None:
+                        objects = int(nextline)
+                    elif nextline.startswith('Object '):
+                        (index, name) = nextline.split(' ', 1)[1].split(':', 1)
+                        self._object_names[int(index)] = name
+                    elif nextline.startswith('Fingerprint '):
+                        (index, fingerprint) = nextline.split(' ', 1)[1].split(':', 1)
+                        fingerprints[int(index)] = fingerprint
+                    elif nextline.startswith('Export '):
+                        (index, file_extension, vertices, seconds) = nextline.split(' ', 1)[1].split(':')
+                        exports[int(index)] = (file_extension, int(vertices), float(seconds))
+                # Blender crashed or didn't get to count the objects.
+                if objects is None:
+                    return 'blender_failed'
+                self._object_vertices.setdefault(file_path, {}).update((index, vertices) for (index, (_, vertices, _)) in exports.items())
+                unchanged = {index: mesh_data for (index, mesh_data) in unchanged.items()
+                             if '{}:{}'.format(index, fingerprints.get(index)) in known_fingerprints}
+            else:
+                unchanged = {}
+                self._fingerprints.pop(file_path, None)
 
             # If file has no objects, returns None.
             if objects == 0:
                 temp_path = 'no_object'
-            # Routine for files with exactly one object.
-            elif objects == 1:
-                temp_path = self._build_temp_path(file_path)
-                import_file = self._import_file(temp_path)
-                command = self._build_command('Single node', file_path, import_file)
-                subprocess.run(command, shell = True, check = False)
-                node = self._open_file(temp_path)
-                # Checks if user has permission for path of current file.
-                if self._check:
-                    temp_path = self._check
-                    return temp_path
-                node.setMeshData(node.getMeshData().set(file_name = file_path))
-                nodes.append(node)
-            # Routine for files with multiple objects.
             else:
-                processes = []
-                temp_paths = []
-                # Gets all objects one by one in separate files with help of index. Does this parallely.
+                # Reads all newly created or cached files.
                 for index in range(objects):
-                    temp_path = self._build_temp_path(file_path, index)
-                    import_file = self._import_file(temp_path)
-
-                    command = self._build_command('Multiple nodes', file_path, import_file, str(index))
-                    process = subprocess.Popen(command, shell = True)
-                    processes.append(process)
-                    temp_paths.append(temp_path)
-
-                # Reads all newly created files.
-                for (index, process, temp_path) in zip(range(objects), processes, temp_paths):
-                    # Waits for possibly unfinished conversions.
-                    process.wait()
-                    node = self._open_file(temp_path)
-                    # Checks if user has permission for path of current file.
-                    if self._check:
-                        temp_path = self._check
+                    # Files with exactly one object keep the original file name.
+                    if objects == 1:
+                        file_name = file_path
                     else:
-                        node.setMeshData(node.getMeshData().set(file_name='{}_curasplit_{}.blend'.format(file_path[:-6], index + 1)))
+                        file_name = '{}_curasplit_{}.blend'.format(file_path[:-6], index + 1)
+
+                    if index + 1 in unchanged:
+                        # Keeps the current mesh data, so the reload doesn't need to replace it.
+                        mesh_data = unchanged[index + 1]
+                        node = CuraSceneNode()
+                        node.setMeshData(mesh_data if mesh_data.getFileName() == file_name else mesh_data.set(file_name = file_name))
                         nodes.append(node)
+                        temp_path = file_path
+                        continue
+                    if converted:
+                        (file_extension, vertices, seconds) = exports.get(index + 1, (self._file_extension if self._auto_format else self._export_extension, 0, None))
+                        temp_path = self._build_temp_path(file_path, index + 1, file_extension)
+                        if index + 1 in streamed:
+                            node = streamed[index + 1]
+                        else:
+                            node = self._open_exported_file(file_path, temp_path, cache, key, index + 1, vertices, seconds)
+                    else:
+                        temp_path = cache.get_path(key, self._cache_extension, index + 1)
+                        node = self._open_file(temp_path, remove = False) if temp_path else None
+                        if node is None:
+                            # The cache evicted the file since the lookup. Converts the whole file again instead.
+                            Logger.log('w', 'Object %d of %s is no longer cached. Converting the file again.', index + 1, file_path)
+                            self._check = False
+                            del nodes[first_node:]
+                            return self._convert_and_read_file(file_path, nodes, use_cache = False)
+                    # Checks if user has permission for path of current file. Keeps reading to remove all other converted files.
+                    if self._check:
+                        continue
+                    node.setMeshData(node.getMeshData().set(file_name = file_name))
+                    nodes.append(node)
+
+                if self._check:
+                    temp_path = self._check
+                elif converted:
+                    self._fingerprints[file_path] = (self._cache_extension, fingerprints)
+                    # Skipped objects are missing in the cache, so it only knows the file if all of them got exported.
+                    if key and not unchanged:
+                        cache.set_objects(key, self._cache_extension, objects)
         # If file was derived from another .blend file, instead checks the original file by index.
         else:
             self._curasplit = True
-            index = int(file_path[file_path.index('_curasplit_') + 11:][:-6]) - 1
-            file_path = '{}.blend'.format(file_path[:file_path.index('_curasplit_')])
+            (file_path, index) = get_source_key(file_path)
+            index -= 1
+
+            # The object gets replaced on its own, so its last fingerprint is outdated.
+            self._fingerprints.get(file_path, (None, {}))[1].pop(index + 1, None)
+
+            key = self._get_cache_key(cache, file_path)
+            temp_path = cache.get_path(key, self._cache_extension, index + 1) if key else None
+            node = None
+            if temp_path:
+                node = self._open_file(temp_path, remove = False)
+                if node is None:
+                    # The cache evicted the file since the lookup. Converts the object again instead.
+                    self._check = False
+                    temp_path = None
+            meshes = None if temp_path else self._read_native_file(file_path)
+            if not temp_path and meshes is not None and index < len(meshes):
+                node = self._build_native_node(meshes[index], file_path)
+                temp_path = file_path if node else None
+
+            # Neither cached nor readable without blender.
+            if not temp_path:
+                if not CuraBlender.CuraBlender.verify_blender_path(manual=False):
+                    return 'no_blender'
+                (file_extension, vertices) = self._choose_file_extension(file_path, index + 1)
+                temp_path = self._build_temp_path(file_path, index + 1, file_extension)
+                import_file = self._import_file(temp_path)
 
-            temp_path = self._build_temp_path(file_path, index + 1)
-            import_file = self._import_file(temp_path)
+                BlenderWorker.run_program('Multiple nodes', file_path, import_file, str(index), str(self._triangle_budget))
 
-            command = self._build_command('Multiple nodes', file_path, import_file, str(index))
-            subprocess.run(command, shell = True, check = False)
+                node = self._open_exported_file(file_path, temp_path, cache, key, index + 1, vertices)
 
-            node = self._open_file(temp_path)
-            node.setMeshData(node.getMeshData().set(file_name = '{}_curasplit_{}.blend'.format(file_path[:-6], index + 1)))
-            nodes.append(node)
+            if self._check:
+                temp_path = self._check
+            else:
+                node.setMeshData(node.getMeshData().set(file_name = '{}_curasplit_{}.blend'.format(file_path[:-6], index + 1)))
+                nodes.append(node)
 
         return temp_path
 
 
-    def _build_temp_path(self, file_path, index = None):
-        """Creates a temporary file with the random function to guarantee uniqueness. If multiple objects inside one file adds index.
+    def _build_line_reader(self, file_path, cache, key, streamed):
+        """Builds the reader for the output of blender, which reads every object as soon as blender exported it.
+
+        Runs while blender still exports the other objects and passes every object on to the progressive load job.
 
         :param file_path: The path of the original file.
-        :param index: If file contains multiple objects, it indicates the number of the current object.
-        :return: The path of the converted file.
+        :param cache: The cache for converted files or None.
+        :param key: The cache key of the original file or None.
+        :param streamed: A dictionary which gets the nodes of all read objects by their index (starting at 1).
+        :return: The function which gets every line of the output.
         """
 
-        if index:
-            temp_path = '{}/cura_temp_{}_{}.{}'.format(os.path.dirname(file_path), str(random.random())[2:], index, self._file_extension)
+        objects = []
+
+        def read_line(line):
+            if line.isdigit() and not objects:
+                objects.append(int(line))
+            elif line.startswith('Object '):
+                (index, name) = line.split(' ', 1)[1].split(':', 1)
+                self._object_names[int(index)] = name
+            elif line.startswith('Export ') and objects:
+                (index, file_extension, vertices, seconds) = line.split(' ', 1)[1].split(':')
+                index = int(index)
+                # Blender exports all objects again, if the worker crashed on the way.
+                if index in streamed:
+                    return
+                temp_path = self._build_temp_path(file_path, index, file_extension)
+                # Blender is still busy, so the automatic mode tries the other formats after it finished.
+                node = self._open_exported_file(file_path, temp_path, cache, key, index, int(vertices), float(seconds), export = False)
+                if node is None and self._auto_format:
+                    return
+                streamed[index] = node
+                if node is not None and not self._check:
+                    file_name = file_path if objects[0] == 1 else '{}_curasplit_{}.blend'.format(file_path[:-6], index)
+                    node.setMeshData(node.getMeshData().set(file_name = file_name))
+                    self._object_loaded(self._object_names.get(index), node)
+
+        return read_line
+
+
+    def _get_unchanged_objects(self, file_path):
+        """Gets all objects of the last conversion with blender, which are still on the build plate.
+
+        :param file_path: The path of the original file.
+        :return: The fingerprints of these objects ('index:fingerprint') for our BlenderAPI and their mesh data by index.
+        """
+
+        (cache_extension, fingerprints) = self._fingerprints.get(file_path, (None, {}))
+        if cache_extension != self._cache_extension or not fingerprints:
+            return ([], {})
+
+        unchanged = {}
+        for (index, node) in SceneIndex.get_instance().get_objects(file_path).items():
+            if index in fingerprints:
+                unchanged[index] = node.getMeshData()
+
+        known_fingerprints = ['{}:{}'.format(index, fingerprints[index]) for index in unchanged]
+        return (known_fingerprints, unchanged)
+
+
+    def _inspect_file(self, file_path):
+        """Inspects the original file without starting blender.
+
+        :param file_path: The path of the original file.
+        :return: 'no_object' if the file has no mesh objects, 'too_new' if the installed blender can't read it, None otherwise.
+        """
+
+        if self._inspection and self._inspection[0] == file_path:
+            (_, objects, self._min_version) = self._inspection
+            self._inspection = None
         else:
-            temp_path = '{}/cura_temp_{}.{}'.format(os.path.dirname(file_path), str(random.random())[2:], self._file_extension)
+            try:
+                with BlendFile(file_path) as blend_file:
+                    objects = blend_file.get_objects()
+                    self._min_version = blend_file.get_min_version()
+            except (OSError, BlendFileError):
+                # Blender itself will tell us later, if the file really can't be read.
+                Logger.logException('w', 'Could not inspect %s', file_path)
+                return None
 
-        return temp_path
+        # The visibility also depends on the collections, so only files without any mesh object get rejected here.
+        if not any(obj['type'] == 'MESH' for obj in objects):
+            return 'no_object'
+
+        blender_version = BlenderCapabilities.get_version() or BlenderWorker.BlenderWorker.version
+        if self._min_version and blender_version and blender_version[:2] < self._min_version:
+            return 'too_new'
+        return None
 
 
-    def _build_command(self, program, file_path, instruction = None, index = None):
-        """Builds the command used by subprocess. Program inside the command is based on which mode gets called.
+    def _build_temp_path(self, file_path, index, file_extension = None):
+        """Builds the path of a converted file inside the scratch directory.
 
-        :param program: Mode used by the BlenderAPI to determine which program to run (set of instructions).
         :param file_path: The path of the original file.
-        :param instruction: String with the instruction for converting the file.
-        :param index: If file contains multiple objects, it indicates the number of the current object.
-        :return: The complete command needed by subprocess.
+        :param index: The index of the object inside the original file (starting at 1).
+        :param file_extension: The format of the converted file. Uses the chosen export extension if none.
+        :return: The path of the converted file.
         """
 
-        self._plugin_path = CuraBlender.CuraBlender.get_plugin_path()
-        self._script_path = os.path.join(self._plugin_path, 'BlenderAPI.py')
-        self._blender_path = Application.getInstance().getPreferences().getValue('cura_blender/blender_path')
+        return '{}_{}.{}'.format(self._build_temp_prefix(file_path), index, file_extension or self._export_extension)
 
-        # Our BlenderAPI uses sys.argv and the order of all arguments given to it needs to be fixed.
-        if instruction:
-            if index:
-                command = '"{}" "{}" --background --python "{}" -- "{}" "{}" "{}"'.format(self._blender_path, file_path, self._script_path, instruction, index, program)
-            else:
-                command = '"{}" "{}" --background --python "{}" -- "{}" "{}"'.format(self._blender_path, file_path, self._script_path, instruction, program)
-        else:
-            command = '"{}" "{}" --background --python "{}" -- "{}"'.format(self._blender_path, file_path, self._script_path, program)
 
-        return command
+    def _build_temp_prefix(self, file_path):
+        """Builds the prefix of all converted files of the original file. Blender appends the index and the file extension.
+
+        The prefix only depends on the original file, the process and the thread, so the files can always be found again for cleaning up.
+
+        :param file_path: The path of the original file.
+        :return: The path prefix of the converted files.
+        """
+
+        return ScratchDirectory.build_prefix(self._get_temp_directory(), os.path.realpath(file_path))
+
+
+    @staticmethod
+    def _get_temp_directory():
+        """Gets the scratch directory for converted files. Nothing gets written next to the original file.
+
+        :return: The configured directory, a RAM backed one like /dev/shm or the temp directory.
+        """
+
+        return ScratchDirectory.get_directory(Application.getInstance().getPreferences().getValue('cura_blender/scratch_path'))
 
 
     def _import_file(self, file_path):
         """Converts the original file into a new file with prechosen file extension.
 
-        :param file_path: The original file path of the opened file.
+        :param file_path: The path of the converted file. Its extension decides about the exporter.
         :return: String with the instruction for converting the file.
         """
 
-        if self._file_extension in ('stl', 'ply'):
-            import_file = "bpy.ops.export_mesh.{}(filepath = '{}', check_existing = False)".format(self._file_extension, file_path)
-        elif self._file_extension in ('obj', 'x3d'):
-            import_file = "bpy.ops.export_scene.{}(filepath = '{}', check_existing = False)".format(self._file_extension, file_path)
+        file_extension = file_path.rsplit('.', 1)[-1]
+        if file_extension == 'raw':
+            # Only the requested object is left in the scene.
+            import_file = "export_raw(bpy.data.objects[0], '{}')".format(file_path)
+        elif file_extension in ('stl', 'obj', 'x3d', 'ply'):
+            # Our BlenderAPI chooses the fastest exporter of the installed blender version.
+            import_file = "export_file('{}')".format(file_path)
         else:
             # Unreachable statement, because allowed file extension got already verified.
             pass
         return import_file
 
 
-    def _open_file(self, temp_path):
+    def _choose_file_extension(self, file_path, index):
+        """Chooses the format for converting a single object. Blender chooses it itself when converting all objects at once.
+
+        :param file_path: The path of the original file.
+        :param index: The index of the object inside the original file (starting at 1).
+        :return: A tuple (file extension, number of vertices). The vertices as counted by blender on the last export, 0 if unknown.
+        """
+
+        if not self._auto_format:
+            return (self._export_extension, 0)
+        vertices = self._object_vertices.get(file_path, {}).get(index)
+        if vertices is None:
+            # Cura counts three vertices per triangle. Closed meshes in blender have about half as many vertices as triangles.
+            node = SceneIndex.get_instance().get_objects(file_path).get(index)
+            vertices = node.getMeshData().getVertexCount() // 6 if node and node.getMeshData() else 0
+        return (self._get_format_selector().choose(vertices, self._file_extension) or self._file_extension, vertices)
+
+
+    def _get_format_selector(self):
+        """Gets the measured costs of all formats for the automatic mode. Kept across sessions.
+
+        :return: The format selector.
+        """
+
+        if not self._format_selector:
+            self._format_selector = FormatSelector(os.path.join(Resources.getDataStoragePath(), 'cura_blender_formats.json'))
+        return self._format_selector
+
+
+    def _get_cache(self):
+        """Gets the cache for converted files based on the preferences.
+
+        :return: The cache or None if caching is deactivated or the cache directory is not usable.
+        """
+
+        preferences = Application.getInstance().getPreferences()
+        if not preferences.getValue('cura_blender/use_cache'):
+            return None
+
+        cache_path = preferences.getValue('cura_blender/cache_path') or os.path.join(Resources.getCacheStoragePath(), 'cura_blender')
+        max_size = int(preferences.getValue('cura_blender/cache_size')) * 1024 * 1024
+        if not self._cache or self._cache.cache_path != cache_path:
+            try:
+                self._cache = MeshCache(cache_path, max_size)
+            except OSError:
+                Logger.logException('e', 'Cannot use %s as cache directory!', cache_path)
+                self._cache = None
+                return None
+        self._cache.max_size = max_size
+        return self._cache
+
+
+    @staticmethod
+    def _get_cache_key(cache, file_path):
+        """Gets the cache key of the original file.
+
+        :param cache: The cache for converted files or None.
+        :param file_path: The path of the original file.
+        :return: The key or None if there is no cache or the file can't be read.
+        """
+
+        if not cache:
+            return None
+        try:
+            return cache.get_file_key(file_path)
+        except OSError:
+            Logger.logException('w', 'Cannot build cache key for %s', file_path)
+            return None
+
+
+    def _open_exported_file(self, file_path, temp_path, cache, key, index, vertices, seconds = None, export = True):
+        """Reads a file exported by blender. The automatic mode measures the format and falls back to the next one on failures.
+
+        :param file_path: The path of the original file.
+        :param temp_path: The converted file to read.
+        :param cache: The cache for converted files or None.
+        :param key: The cache key of the original file or None.
+        :param index: The index of the object inside the original file (starting at 1).
+        :param vertices: The number of vertices of the object, 0 if unknown.
+        :param seconds: The time blender needed for the export. Without it, only failures get recorded.
+        :param export: If false, doesn't export the object again in another format after a failure, e.g. while blender is busy.
+        :return: The node contained in the readed file.
+        """
+
+        if not self._auto_format:
+            return self._open_converted_file(temp_path, cache, key, index)
+
+        # Failures of other objects must not count as failures of this object.
+        previous_check = self._check
+        self._check = False
+        selector = self._get_format_selector()
+        failed_extensions = []
+        while True:
+            file_extension = temp_path.rsplit('.', 1)[-1]
+            start_time = time.perf_counter()
+            node = self._open_converted_file(temp_path, cache, key, index)
+            if node is not None and not self._check:
+                if seconds is not None:
+                    selector.record(file_extension, vertices, seconds + time.perf_counter() - start_time)
+                self._check = previous_check
+                return node
+
+            Logger.log('w', 'Could not read object %s of %s as %s, trying another format.', index, file_path, file_extension)
+            selector.record_failure(file_extension, vertices)
+            failed_extensions.append(file_extension)
+            if not export:
+                self._check = previous_check
+                return None
+            file_extension = selector.choose(vertices, self._file_extension, failed_extensions)
+            if not file_extension:
+                return node
+
+            # Exports the single object again. Includes the start of blender, so the time isn't comparable.
+            self._check = False
+            seconds = None
+            temp_path = self._build_temp_path(file_path, index, file_extension)
+            BlenderWorker.run_program('Multiple nodes', file_path, self._import_file(temp_path), str(index - 1), str(self._triangle_budget))
+
+
+    def _open_converted_file(self, temp_path, cache, key, index):
+        """Reads a newly converted file. Moves it into the cache first, if caching is activated.
+
+        :param temp_path: The converted file to read.
+        :param cache: The cache for converted files or None.
+        :param key: The cache key of the original file or None.
+        :param index: The index of the object inside the original file (starting at 1).
+        :return: The node contained in the readed file.
+        """
+
+        if not key or not os.path.isfile(temp_path):
+            return self._open_file(temp_path)
+
+        # Files of the automatic mode keep their format in the cache.
+        file_format = temp_path.rsplit('.', 1)[-1] if self._auto_format else None
+        with Tracing.span('Move into cache', index = index):
+            cached_path = cache.add(key, self._cache_extension, index, temp_path, file_format = file_format)
+        # Converting to .obj always creates a copy of it as .mtl (A library for used materials).
+        if os.path.isfile(temp_path[:-3] + 'mtl'):
+            os.remove(temp_path[:-3] + 'mtl')
+
+        node = self._open_file(cached_path, remove = False)
+        # Never keeps files in the cache which can't be read.
+        if node is None:
+            cache.remove(key, self._cache_extension, index, file_format = file_format)
+        return node
+
+
+    def _open_file(self, temp_path, remove = True):
         """Reads the converted file and removes it after that.
 
         :param temp_path: The converted file to read.
+        :param remove: If false, keeps the file (e.g. because it belongs to the cache).
         :return: The node contained in the readed file.
         """
 
-        reader = Application.getInstance().getMeshFileHandler().getReaderForFile(temp_path)
-        try:
-            if os.path.isfile(temp_path):
-                node = reader.read(temp_path)
-            else:
-                self._check = 'no_permission'
-        except:
-            self._check = 'complex_filetype'
-        finally:
-            # In case procedure runs into errors and doesn't set node.
-            if not 'node' in locals():
-                node = None
-
-            if os.path.isfile(temp_path):
-                os.remove(temp_path)
-            # Converting to .obj always creates a copy of it as .mtl (A library for used materials).
-            if os.path.isfile(temp_path[:-3] + 'mtl'):
-                os.remove(temp_path[:-3] + 'mtl')
+        with Tracing.span('Parse converted file', file = temp_path):
+            try:
+                if os.path.isfile(temp_path):
+                    if temp_path.endswith('.raw'):
+                        node = self._read_raw_file(temp_path)
+                    elif temp_path.endswith('.stl'):
+                        node = self._read_stl_file(temp_path)
+                    else:
+                        reader = Application.getInstance().getMeshFileHandler().getReaderForFile(temp_path)
+                        node = reader.read(temp_path)
+                else:
+                    self._check = 'no_permission'
+            except:
+                self._check = 'complex_filetype'
+            finally:
+                # In case procedure runs into errors and doesn't set node.
+                if not 'node' in locals():
+                    node = None
+
+                if remove:
+                    if os.path.isfile(temp_path):
+                        os.remove(temp_path)
+                    # Converting to .obj always creates a copy of it as .mtl (A library for used materials).
+                    if os.path.isfile(temp_path[:-3] + 'mtl'):
+                        os.remove(temp_path[:-3] + 'mtl')
         return node
 
 
+    @staticmethod
+    def _read_raw_file(temp_path):
+        """Reads a binary mesh file written by our BlenderAPI. Maps the file into memory and builds the mesh from its buffers.
+
+        :param temp_path: The binary mesh file to read.
+        :return: The node with the mesh data.
+        """
+
+        with open(temp_path, 'rb') as raw_file:
+            with mmap.mmap(raw_file.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+                (magic, vertex_count, triangle_count) = struct.unpack_from(RAW_HEADER, buffer)
+                if magic != RAW_MAGIC:
+                    raise ValueError('{} is no binary mesh file!'.format(temp_path))
+                offset = struct.calcsize(RAW_HEADER)
+                vertices = numpy.frombuffer(buffer, dtype = '<f4', count = vertex_count * 3, offset = offset).reshape(-1, 3)
+                offset += vertices.nbytes
+                indices = numpy.frombuffer(buffer, dtype = '<u4', count = triangle_count * 3, offset = offset).reshape(-1, 3)
+
+                mesh_vertices = numpy.array(vertices, dtype = numpy.float32)
+                mesh_indices = numpy.array(indices, dtype = numpy.int32)
+                # Releases the views, otherwise the memory map can't be closed.
+                del vertices, indices
+
+        return BLENDReader._build_node(mesh_vertices, mesh_indices, temp_path)
+
+
+    @staticmethod
+    def _read_stl_file(temp_path):
+        """Reads a binary stl file written by blender. Maps the file into memory instead of parsing it in python.
+
+        :param temp_path: The stl file to read.
+        :return: The node with the mesh data. Falls back to the stl reader of cura for ascii files.
+        """
+
+        with open(temp_path, 'rb') as stl_file:
+            size = os.fstat(stl_file.fileno()).st_size
+            triangle_count = struct.unpack('<I', stl_file.read(STL_HEADER_SIZE)[80:])[0] if size >= STL_HEADER_SIZE else -1
+            if size != STL_HEADER_SIZE + triangle_count * STL_TRIANGLE.itemsize:
+                reader = Application.getInstance().getMeshFileHandler().getReaderForFile(temp_path)
+                return reader.read(temp_path)
+            if triangle_count == 0:
+                raise ValueError('{} contains no triangles!'.format(temp_path))
+
+            with mmap.mmap(stl_file.fileno(), 0, access = mmap.ACCESS_READ) as buffer:
+                triangles = numpy.frombuffer(buffer, dtype = STL_TRIANGLE, count = triangle_count, offset = STL_HEADER_SIZE)
+                vertices = numpy.array(triangles['vertices'], dtype = numpy.float32).reshape(-1, 3)
+                # Releases the view, otherwise the memory map can't be closed.
+                del triangles
+
+        # Stl files don't share vertices between triangles, so the mesh doesn't need indices.
+        return BLENDReader._build_node(vertices, None, temp_path)
+
+
+    @staticmethod
+    def _build_node(vertices, triangles, file_name):
+        """Builds a node from vertices and triangle indices in blender coordinates.
+
+        :param vertices: The vertices (N x 3) with Z as up axis.
+        :param triangles: The vertex indices of all triangles (M x 3) or None if every three vertices form a triangle.
+        :param file_name: The file name of the mesh data.
+        :return: The node with the mesh data.
+        """
+
+        # Blender uses Z as up axis, cura uses Y. Same conversion as for the other file types.
+        mesh_vertices = numpy.empty(vertices.shape, dtype = numpy.float32)
+        mesh_vertices[:, 0] = vertices[:, 0]
+        mesh_vertices[:, 1] = vertices[:, 2]
+        mesh_vertices[:, 2] = -vertices[:, 1]
+
+        mesh_builder = MeshBuilder()
+        mesh_builder.setVertices(mesh_vertices)
+        # The fast calculation treats every three vertices as a triangle and ignores the indices.
+        if triangles is not None:
+            mesh_builder.setIndices(numpy.asarray(triangles, dtype = numpy.int32))
+            mesh_builder.calculateNormals()
+        else:
+            mesh_builder.calculateNormals(fast = True)
+        mesh_builder.setFileName(file_name)
+
+        node = CuraSceneNode()
+        node.setMeshData(mesh_builder.build())
+        return node
+
+
+    def _build_native_node(self, mesh, file_path):
+        """Builds a node from a mesh of the native reader.
+
+        :param mesh: A tuple (name, vertices, triangles) of the native reader.
+        :param file_path: The path of the original file.
+        :return: The node or None if the mesh is broken and blender has to convert it.
+        """
+
+        (_, vertices, triangles) = mesh
+        try:
+            return self._build_node(vertices, triangles, file_path)
+        except (ValueError, IndexError):
+            Logger.logException('w', 'Using blender for %s: Could not build the mesh.', file_path)
+            return None
+
+
+    def _read_native_file(self, file_path):
+        """Reads plain meshes directly from the original file, if activated and supported.
+
+        :param file_path: The path of the original file.
+        :return: A list of tuples (name, vertices, triangles) or None if blender is needed.
+        """
+
+        if self._native_meshes and self._native_meshes[0] == file_path:
+            (_, meshes) = self._native_meshes
+            self._native_meshes = None
+            return meshes
+        self._inspection = None
+        if not Application.getInstance().getPreferences().getValue('cura_blender/native_reader'):
+            return None
+        try:
+            with BlendFile(file_path) as blend_file:
+                # Keeps what the inspection needs, in case blender has to convert the file after all.
+                self._inspection = (file_path, blend_file.get_objects(), blend_file.get_min_version())
+                meshes = read_meshes(blend_file)
+        except (OSError, BlendFileError) as error:
+            Logger.log('d', 'Using blender for %s: %s', file_path, error)
+            return None
+        # Only blender can decimate the meshes.
+        if self._triangle_budget > 0 and sum(len(triangles) for (_, _, triangles) in meshes) > self._triangle_budget:
+            Logger.log('d', 'Using blender for %s: Exceeds the triangle budget.', file_path)
+            return None
+        return meshes
+
+
     def _complex_file_type(self):
         """Creates message for too complex files."""
 
@@ -2,11 +2,18 @@
 
 # Imports from the python standard library.
 import os
-import subprocess
+import struct
+import itertools
+import threading
+import collections
+
+# Imports from third party libraries.
+import numpy
 
 # Imports from Uranium.
 from UM.Mesh.MeshWriter import MeshWriter
 from UM.Logger import Logger
+from UM.Message import Message
 from UM.Application import Application
 
 # Imports from Cura.
@@ -14,13 +21,20 @@ from cura.Scene.CuraSceneNode import CuraSceneNode
 
 # Imports from own package.
 from CuraBlender import CuraBlender
-from CuraBlender.DeprecatedVersionCheck import DEPRECATED_VERSION
+from CuraBlender import Tracing
+from CuraBlender import ScratchDirectory
+from CuraBlender.BlendWriteJob import BlendWriteJob
+from CuraBlender.SceneIndex import get_source_key
+
+# Header of our binary scene files: Magic, number of meshes, number of nodes. Must match the one used by the BlenderAPI.
+SCENE_MAGIC = b'CBSCN001'
+SCENE_HEADER = '<8sII'
+
+# Converts cura coordinates (Y up) into blender coordinates (Z up). Inverse of the conversion used for reading.
+CURA_TO_BLENDER = numpy.array([[1, 0, 0, 0], [0, 0, -1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype = numpy.float64)
 
-# Imports from QT.
-if not DEPRECATED_VERSION:
-    from PyQt6.QtCore import QFileSystemWatcher
-else:
-    from PyQt5.QtCore import QFileSystemWatcher
+# Numbers of the scene files in the scratch directory. Blender may still read the scene of the last write.
+_scene_numbers = itertools.count(1)
 
 
 class BLENDWriter(MeshWriter):
@@ -29,17 +43,15 @@ class BLENDWriter(MeshWriter):
     def __init__(self):
         """The constructor, which calls the super-class-contructor (MeshWriter).
 
-        Adds a filewatcher to replace the saved file from the writer job by our own generated file.
+        Keeps track of the running and pending write jobs per file.
         """
 
         super().__init__(add_to_recent_files = False)
 
-        self._write_watcher = QFileSystemWatcher()
-        self._write_watcher.fileChanged.connect(self._write_changed)
-
-        self._plugin_path = None
-        self._script_path = None
-        self._blender_path = None
+        self._lock = threading.Lock()
+        self._write_jobs = {}
+        self._pending_writes = {}
+        self._write_messages = {}
 
 
     def write(self, stream, nodes, mode = MeshWriter.OutputMode.BinaryMode):
@@ -48,7 +60,7 @@ class BLENDWriter(MeshWriter):
         :param stream: Buffer containing new file name and more.
         :param nodes: All nodes on the current scene.
         :param mode: The mode we write our file in. Not important here.
-        :return: Always true, because the actual writing happens internal and not in this job.
+        :return: Always true, because the actual writing happens in our own write job.
         """
 
         # The return value: The status either successful or unsuccessful.
@@ -57,18 +69,21 @@ class BLENDWriter(MeshWriter):
         # Checks if path to blender is correct.
         if CuraBlender.CuraBlender.verify_blender_path(manual=False):
 
-            self._plugin_path = CuraBlender.CuraBlender.get_plugin_path()
-            self._script_path = os.path.join(self._plugin_path, 'BlenderAPI.py')
-
-            file_list = self._create_file_list(nodes)
-
-            (blender_files, execute_list) = self._create_execute_list(file_list)
+            # Blender saves the file after cura has closed the stream, so we don't wait for it.
+            with Tracing.span('Prepare write', file = stream.name):
+                if Application.getInstance().getPreferences().getValue('cura_blender/write_scene_meshes'):
+                    # Sends the meshes cura holds in memory together with their exact placement.
+                    with Tracing.span('Write scene file'):
+                        scene_path = self._write_scene_file(self._create_node_list(nodes))
+                    job = BlendWriteJob(stream, 'Write scene', scene_path, temp_paths = (scene_path,))
+                else:
+                    file_list = self._create_file_list(nodes)
 
-            command = self._build_command('Write', stream.name, blender_files, execute_list, temp_path = None)
+                    (blender_files, execute_list) = self._create_execute_list(file_list)
 
-            subprocess.Popen(command, shell = True)
+                    job = BlendWriteJob(stream, 'Write', execute_list, blender_files)
 
-            self._write_watcher.addPath(stream.name)
+            self._queue_write(job)
         else:
             # Failure message already gets called at other place.
             Logger.logException('e', 'Problems with path to blender!')
@@ -77,66 +92,162 @@ class BLENDWriter(MeshWriter):
         return success
 
 
+    def _queue_write(self, job):
+        """Starts a write job. Writes to the same file run one after another, a newer pending write supersedes an older one.
+
+        :param job: The new write job.
+        """
+
+        file_path = job.getFileName()
+        with self._lock:
+            if file_path not in self._write_jobs:
+                self._write_jobs[file_path] = job
+                superseded = None
+            else:
+                superseded = self._pending_writes.get(file_path)
+                self._pending_writes[file_path] = job
+                job = None
+
+        if superseded:
+            Logger.log('d', 'Superseding pending write of %s', file_path)
+            superseded.discard()
+        if job:
+            self._start_write(job)
+
+
+    def _start_write(self, job):
+        """Starts a write job and shows its progress.
+
+        :param job: The write job.
+        """
+
+        message = Message(text=CuraBlender.catalog.i18nc('@info', 'Saving {}'.format(os.path.basename(job.getFileName()))),
+                          title=CuraBlender.catalog.i18nc('@info:title', 'Writing BLEND file'), lifetime=0, dismissable=False, progress=-1)
+        message.show()
+        self._write_messages[job] = message
+        job.finished.connect(self._write_finished)
+        job.start()
+
+
+    def _write_finished(self, job):
+        """On finished connection of a write job. Reports the outcome and starts the pending write of the same file.
+
+        :param job: The finished write job.
+        """
+
+        self._write_messages.pop(job).hide()
+        file_name = os.path.basename(job.getFileName())
+        if job.getResult():
+            message = Message(text=CuraBlender.catalog.i18nc('@info', 'Saved {} in {:.1f} s.'.format(file_name, job.elapsed_time)),
+                              title=CuraBlender.catalog.i18nc('@info:title', 'BLEND file written'))
+        else:
+            message = Message(text=CuraBlender.catalog.i18nc('@info', 'Blender could not save {}.'.format(file_name)),
+                              title=CuraBlender.catalog.i18nc('@info:title', 'Writing BLEND file failed'))
+        message.show()
+
+        with self._lock:
+            pending = self._pending_writes.pop(job.getFileName(), None)
+            if pending:
+                self._write_jobs[job.getFileName()] = pending
+            else:
+                del self._write_jobs[job.getFileName()]
+        if pending:
+            self._start_write(pending)
+
+
     def _create_execute_list(self, file_list):
         """Creates a list (String) with instructions for every file in the file list.
 
+        Nodes sharing the same source are imported only once. Blender places the other ones as linked duplicates.
+
         :param file_list: File list with paths of nodes.
         :return: A list (String) with all files with the .blend extension.
         :return: A list (String) with all files with different file extensions.
         """
 
-        blender_files = set()
+        blender_files = {}
         execute_list = ''
         # Checks the file extension and builds the command based on it.
-        for file_path in file_list:
+        for (file_path, number) in collections.Counter(file_list).items():
             if file_path.endswith('.blend'):
-                if '_curasplit_' in file_path:
-                    file_path = '{}.blend'.format(file_path[:file_path.index('_curasplit_')])
-                blender_files.add(file_path)
-            elif file_path.endswith('.stl'):
-                execute_list = execute_list + "bpy.ops.import_mesh.stl(filepath = '{}');".format(file_path)
-            elif file_path.endswith('.ply'):
-                execute_list = execute_list + "bpy.ops.import_mesh.ply(filepath = '{}');".format(file_path)
-            elif file_path.endswith('.obj'):
-                execute_list = execute_list + "bpy.ops.import_scene.obj(filepath = '{}');".format(file_path)
-            elif file_path.endswith('.x3d'):
-                execute_list = execute_list + "bpy.ops.import_scene.x3d(filepath = '{}');".format(file_path)
+                # Counts the placed copies of every object by its index.
+                (file_path, index) = get_source_key(file_path)
+                blender_files.setdefault(file_path, {})[index] = number
+            # Our BlenderAPI chooses the fastest importer of the installed blender version.
+            elif file_path.endswith(('.stl', '.ply', '.obj', '.x3d')):
+                execute_list = execute_list + "{}*import_file('{}');".format(number, file_path)
             # Ignore objects with unsupported file extension.
             else:
                 Logger.logException('e', '%s\nhas unsupported file extension and was ignored!', file_path)
 
+        # The 'Write' program filters and appends the objects of all blender files itself.
         blend_list = ''
-        processes = []
-        for file_path in blender_files:
-            temp_path = '{}_curatemp_.blend'.format(file_path[:-6])
-            command = self._build_command('Write prepare', file_path, temp_path = temp_path)
-            with subprocess.Popen(command, shell = True) as process:
-                processes.append(process)
-            blend_list = '{}{}_curatemp_.blend;'.format(blend_list, file_path[:-6])
-
-        for process in processes:
-            process.wait()
+        for file_path in sorted(blender_files):
+            copies = ','.join('{}:{}'.format(index, number) for (index, number) in sorted(blender_files[file_path].items()) if number > 1)
+            blend_list = '{}{}*{};'.format(blend_list, copies, file_path)
 
         return (blend_list, execute_list)
 
 
-    def _build_command(self, program, file_name, blender_files = None, execute_list = None, temp_path = None):
-        """Builds the command used by subprocess. Calls the 'Write' program.
+    @staticmethod
+    def _create_node_list(nodes):
+        """Creates a list of all nodes with real mesh data.
 
-        :param program: Mode used by the BlenderAPI to determine which program to run (set of instructions).
-        :param file_name: The file name we selected when saving the file.
-        :param blender_files: A list (String) with all blender files.
-        :param execute_list: A list (String) with instructions for all other files.
-        :param temp_path: A temporary path for converting the blend file and preparing the 'Write' step.
-        :return: The complete command needed by subprocess.
+        :param nodes: All nodes on the current scene.
+        :return: List with all real nodes.
         """
 
-        self._blender_path = Application.getInstance().getPreferences().getValue('cura_blender/blender_path')
-        if program == 'Write prepare':
-            command = '"{}" "{}" --background --python "{}" -- "{}" "{}"'.format(self._blender_path, file_name, self._script_path, temp_path, program)
-        else:
-            command = '"{}" --background --python "{}" -- "{}" "{}" "{}" "{}"'.format(self._blender_path, self._script_path, file_name, execute_list, blender_files, program)
-        return command
+        node_list = []
+        for node in nodes:
+            for children in node.getAllChildren():
+                # Filters nodes without real meshdata.
+                if isinstance(children, CuraSceneNode) and not children.callDecoration("isGroup") and children.getMeshData():
+                    node_list.append(children)
+        return node_list
+
+
+    @staticmethod
+    def _write_scene_file(node_list):
+        """Writes the vertex and index buffers and the world transformations of all nodes into a binary file for our BlenderAPI.
+
+        Nodes sharing the same mesh data write it only once. Blender turns them into linked duplicates.
+
+        :param node_list: List with all real nodes.
+        :return: The path of the binary file. Blender removes it after reading.
+        """
+
+        meshes = []
+        mesh_indices = {}
+        for node in node_list:
+            if id(node.getMeshData()) not in mesh_indices:
+                mesh_indices[id(node.getMeshData())] = len(meshes)
+                meshes.append(node.getMeshData())
+
+        scratch_directory = ScratchDirectory.get_directory(Application.getInstance().getPreferences().getValue('cura_blender/scratch_path'))
+        scene_path = '{}_{}.scene'.format(ScratchDirectory.build_prefix(scratch_directory, 'scene'), next(_scene_numbers))
+        with open(scene_path, 'wb') as scene_file:
+            scene_file.write(struct.pack(SCENE_HEADER, SCENE_MAGIC, len(meshes), len(node_list)))
+            for mesh_data in meshes:
+                vertices = mesh_data.getVertices()
+                indices = mesh_data.getIndices()
+                if indices is None:
+                    indices = numpy.arange(len(vertices), dtype = numpy.uint32).reshape(-1, 3)
+                # Blender uses Z as up axis, cura uses Y.
+                blender_vertices = numpy.empty((len(vertices), 3), dtype = '<f4')
+                blender_vertices[:, 0] = vertices[:, 0]
+                blender_vertices[:, 1] = -vertices[:, 2]
+                blender_vertices[:, 2] = vertices[:, 1]
+                scene_file.write(struct.pack('<II', len(blender_vertices), len(indices)))
+                scene_file.write(blender_vertices.tobytes())
+                scene_file.write(numpy.asarray(indices, dtype = '<u4').tobytes())
+            for node in node_list:
+                transformation = CURA_TO_BLENDER @ node.getWorldTransformation().getData() @ CURA_TO_BLENDER.T
+                name = node.getName().encode('utf-8')
+                scene_file.write(struct.pack('<I', mesh_indices[id(node.getMeshData())]))
+                scene_file.write(numpy.asarray(transformation, dtype = '<f4').tobytes())
+                scene_file.write(struct.pack('<H', len(name)))
+                scene_file.write(name)
+        return scene_path
 
 
     @staticmethod
@@ -154,15 +265,3 @@ class BLENDWriter(MeshWriter):
                 if isinstance(children, CuraSceneNode) and not children.callDecoration("isGroup") and children.getMeshData().getFileName():
                     file_list.append(children.getMeshData().getFileName())
         return file_list
-
-
-    @staticmethod
-    def _write_changed(path):
-        """On file changed connection. Deletes the original saved file and replaces it with our own generated one.
-
-        :param path: The path of our file we try to save.
-        """
-
-        # Instead of overwriting files, blender saves the old one with .blend1 extension. This file is corrupted, so we delete it.
-        if os.path.isfile(path + '1'):
-            os.remove(path + '1')
@@ -0,0 +1,259 @@
+"""Headless batch conversion of .blend files into printable meshes. Runs without cura.
+
+Usage: python3 BatchConvert.py [-h] -o OUTPUT [-f {stl,obj,x3d,ply}] [-j JOBS] [-b BLENDER] [-r REPORT] PATH [PATH ...]
+
+Every object of a file gets its own output file. Files which didn't change since the last run are copied from the cache.
+Writes a json report with timings and failures and exits with 1 if any file failed.
+"""
+
+# Imports from the python standard library.
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import concurrent.futures
+
+# Imports from own package. Loaded as plain modules, because the package itself needs cura.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from MeshCache import MeshCache
+from BlendFile import BlendFile, BlendFileError
+import ScratchDirectory
+
+
+# The formats blender can export for printing.
+SUPPORTED_FORMATS = ('stl', 'obj', 'x3d', 'ply')
+
+
+def find_blend_files(paths):
+    """Collects all .blend files from the given files and directories. Directories get searched recursively.
+
+    :param paths: The paths of files and directories.
+    :return: A sorted list of tuples (path of the file, path relative to its root).
+    """
+
+    blend_files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for (directory, _, file_names) in os.walk(path):
+                for file_name in file_names:
+                    if file_name.endswith('.blend'):
+                        file_path = os.path.join(directory, file_name)
+                        blend_files.add((os.path.abspath(file_path), os.path.relpath(file_path, path)))
+        elif path.endswith('.blend'):
+            blend_files.add((os.path.abspath(path), os.path.basename(path)))
+    return sorted(blend_files)
+
+
+def build_command(blender_path, file_path, *arguments, program):
+    """Builds the command for a program of our BlenderAPI. Same order of arguments as inside cura.
+
+    :param blender_path: The path to blender.
+    :param file_path: The path of the file blender opens.
+    :param arguments: Further arguments for the program.
+    :param program: Mode used by the BlenderAPI to determine which program to run.
+    :return: The command as list for subprocess.
+    """
+
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BlenderAPI.py')
+    return [blender_path, file_path, '--background', '--python', script_path, '--'] + list(arguments) + [program]
+
+
+class BatchConverter:
+    """Converts .blend files with a bounded number of blender processes.
+
+    The mesh cache remembers the converted objects of every file by its content, so unchanged files never start blender.
+    """
+
+    def __init__(self, blender_path, output_path, file_extension, cache_path, cache_size, timeout):
+        """The constructor.
+
+        :param blender_path: The path to blender.
+        :param output_path: The directory for the converted files. Mirrors the directory structure of the input.
+        :param file_extension: The format of the converted files (stl, obj, x3d, ply).
+        :param cache_path: The directory of the mesh cache.
+        :param cache_size: The maximum size of the mesh cache in bytes.
+        :param timeout: The maximum time in seconds for a single file.
+        """
+
+        self.blender_path = blender_path
+        self.output_path = output_path
+        self.file_extension = file_extension
+        self.timeout = timeout
+        self.cache = MeshCache(cache_path, cache_size)
+
+
+    def convert_all(self, blend_files, jobs):
+        """Converts all files in parallel.
+
+        :param blend_files: Tuples (path of the file, path relative to its root).
+        :param jobs: The maximum number of blender processes at the same time.
+        :return: The results of all files in the order of the input.
+        """
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers = jobs) as executor:
+            results = list(executor.map(lambda blend_file: self.convert(*blend_file), blend_files))
+        # Saves the times of all cache hits at once.
+        self.cache.flush()
+        return results
+
+
+    def convert(self, file_path, relative_path):
+        """Converts a single file or copies its objects from the cache, if it didn't change.
+
+        :param file_path: The path of the .blend file.
+        :param relative_path: The path of the file relative to its root. Used for the names of the output files.
+        :return: A dictionary with 'path', 'status', 'objects', 'outputs', 'seconds' and 'error'.
+        """
+
+        start_time = time.monotonic()
+        result = {'path': file_path, 'status': 'failed', 'objects': 0, 'outputs': [], 'seconds': 0.0, 'error': None}
+        output_prefix = os.path.join(self.output_path, relative_path[:-6])
+        try:
+            key = self.cache.get_file_key(file_path)
+            objects = self.cache.get_objects(key, self.file_extension)
+            if objects is not None:
+                result['status'] = 'unchanged'
+            else:
+                objects = self._run_blender(file_path, key)
+                result['status'] = 'converted' if objects else 'no_object'
+
+            result['objects'] = objects
+            for index in range(objects):
+                # Files with exactly one object keep the original file name.
+                if objects == 1:
+                    output_file = '{}.{}'.format(output_prefix, self.file_extension)
+                else:
+                    output_file = '{}_{}.{}'.format(output_prefix, index + 1, self.file_extension)
+                self._copy_output(self.cache.get_path(key, self.file_extension, index + 1), output_file, result['status'] == 'unchanged')
+                result['outputs'].append(output_file)
+        except (OSError, ValueError, subprocess.SubprocessError) as error:
+            result['status'] = 'failed'
+            result['error'] = '{}: {}'.format(type(error).__name__, error)
+
+        result['seconds'] = round(time.monotonic() - start_time, 3)
+        return result
+
+
+    def _run_blender(self, file_path, key):
+        """Exports all objects of a file with blender and moves them into the cache.
+
+        :param file_path: The path of the .blend file.
+        :param key: The cache key of the file.
+        :return: The number of objects contained in the file.
+        """
+
+        # Files without any mesh object don't need blender at all. Blender itself decides about files we can't parse.
+        try:
+            with BlendFile(file_path) as blend_file:
+                if not any(obj['type'] == 'MESH' for obj in blend_file.get_objects()):
+                    return 0
+        except BlendFileError:
+            pass
+
+        with tempfile.TemporaryDirectory(prefix = ScratchDirectory.FILE_PREFIX, dir = ScratchDirectory.get_directory()) as temp_directory:
+            temp_prefix = os.path.join(temp_directory, 'cura_temp').replace('\\', '/')
+            command = build_command(self.blender_path, file_path, temp_prefix, self.file_extension, '', '0', program = 'All nodes')
+            process = subprocess.run(command, stdout = subprocess.PIPE, stderr = subprocess.STDOUT, timeout = self.timeout,
+                                     universal_newlines = True)
+
+            objects = next((int(line) for line in process.stdout.splitlines() if line.isdigit()), None)
+            if objects is None:
+                raise ValueError('Blender exited with {} and no result: {}'.format(process.returncode, process.stdout.strip()[-500:]))
+            for index in range(objects):
+                temp_path = '{}_{}.{}'.format(temp_prefix, index + 1, self.file_extension)
+                if not os.path.isfile(temp_path):
+                    raise ValueError('Blender did not export object {} of {}.'.format(index + 1, objects))
+                self.cache.add(key, self.file_extension, index + 1, temp_path)
+        self.cache.set_objects(key, self.file_extension, objects)
+        return objects
+
+
+    @staticmethod
+    def _copy_output(cached_path, output_file, unchanged):
+        """Copies a converted file from the cache to the output directory.
+
+        :param cached_path: The path of the cached file.
+        :param output_file: The path of the output file.
+        :param unchanged: If true, keeps an existing output file of the same size.
+        """
+
+        if cached_path is None:
+            raise ValueError('{} got evicted from the cache. Increase the cache size.'.format(output_file))
+        if unchanged and os.path.isfile(output_file) and os.path.getsize(output_file) == os.path.getsize(cached_path):
+            return
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok = True)
+        shutil.copyfile(cached_path, output_file)
+
+
+def parse_arguments(arguments = None):
+    """Parses the command line.
+
+    :param arguments: The arguments to parse. Uses sys.argv if none.
+    :return: The parsed arguments.
+    """
+
+    parser = argparse.ArgumentParser(description = 'Converts .blend files into printable meshes without cura.')
+    parser.add_argument('paths', nargs = '+', metavar = 'PATH', help = '.blend files or directories which get searched recursively.')
+    parser.add_argument('-o', '--output', required = True, help = 'Directory for the converted files.')
+    parser.add_argument('-f', '--format', default = 'stl', choices = SUPPORTED_FORMATS, help = 'Format of the converted files (default: stl).')
+    parser.add_argument('-j', '--jobs', type = int, default = os.cpu_count() or 1, help = 'Blender processes at the same time (default: number of cores).')
+    parser.add_argument('-b', '--blender', default = os.environ.get('BLENDER_PATH') or shutil.which('blender'),
+                        help = 'Path to blender (default: $BLENDER_PATH or blender on the PATH).')
+    parser.add_argument('-r', '--report', help = 'Path of the json report (default: report.json inside the output directory).')
+    parser.add_argument('--cache', help = 'Directory of the mesh cache (default: .cura_blender_cache inside the output directory).')
+    parser.add_argument('--cache-size', type = int, default = 4096, help = 'Maximum size of the mesh cache in MB (default: 4096).')
+    parser.add_argument('--timeout', type = float, default = 600, help = 'Maximum time in seconds for a single file (default: 600).')
+    return parser.parse_args(arguments)
+
+
+def main(arguments = None):
+    """Main program.
+
+    :param arguments: The command line arguments. Uses sys.argv if none.
+    :return: The exit code. 1 if any file failed, 2 if blender wasn't found.
+    """
+
+    arguments = parse_arguments(arguments)
+    if not arguments.blender or not os.path.isfile(arguments.blender):
+        print('Blender not found. Use --blender or set BLENDER_PATH.', file = sys.stderr)
+        return 2
+
+    output_path = os.path.abspath(arguments.output)
+    cache_path = arguments.cache or os.path.join(output_path, '.cura_blender_cache')
+    os.makedirs(output_path, exist_ok = True)
+    converter = BatchConverter(arguments.blender, output_path, arguments.format, cache_path, arguments.cache_size * 1024 * 1024,
+                               arguments.timeout)
+
+    blend_files = find_blend_files(arguments.paths)
+    started = time.strftime('%Y-%m-%dT%H:%M:%S')
+    start_time = time.monotonic()
+    results = converter.convert_all(blend_files, max(1, arguments.jobs))
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+        print('{:9} {:8.2f} s  {}{}'.format(result['status'], result['seconds'], result['path'],
+                                            '  ({})'.format(result['error']) if result['error'] else ''))
+    report = {
+        'started': started,
+        'blender': arguments.blender,
+        'format': arguments.format,
+        'jobs': arguments.jobs,
+        'seconds': round(time.monotonic() - start_time, 3),
+        'summary': summary,
+        'files': results
+    }
+    report_path = arguments.report or os.path.join(output_path, 'report.json')
+    with open(report_path, 'w') as report_file:
+        json.dump(report, report_file, indent = 4)
+    print('{} files in {:.2f} s: {}. Report: {}'.format(len(results), report['seconds'],
+                                                        ', '.join('{} {}'.format(count, status) for (status, count) in sorted(summary.items())), report_path))
+    return 1 if summary.get('failed') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""Read-only parser for .blend files. Only uses the python standard library, so it works outside of cura and blender too."""
+
+# Imports from the python standard library.
+import gzip
+import mmap
+import struct
+
+# Zstandard compression is used since blender 3.0, but the module is not always available.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Object types of blender (Object.type) we give a name.
+OBJECT_TYPES = {0: 'EMPTY', 1: 'MESH', 2: 'CURVE', 3: 'SURFACE', 4: 'FONT', 5: 'META', 10: 'LIGHT', 11: 'CAMERA', 12: 'SPEAKER',
+                13: 'LIGHT_PROBE', 22: 'LATTICE', 25: 'ARMATURE', 26: 'GPENCIL', 27: 'CURVES', 28: 'POINTCLOUD', 29: 'VOLUME', 30: 'GREASEPENCIL'}
+
+# Flag of Object.visibility_flag (Object.restrictflag before blender 2.90) for 'Disable in Viewports'.
+OB_HIDE_VIEWPORT = 1 << 0
+# Flag of Base.flag for 'Hide in Viewport' (eye icon).
+BASE_HIDDEN = 1 << 8
+
+# Formats for reading single values of basic types.
+TYPE_FORMATS = {'char': 'b', 'uchar': 'B', 'short': 'h', 'ushort': 'H', 'int': 'i', 'uint': 'I', 'float': 'f', 'double': 'd',
+                'int8_t': 'b', 'uint8_t': 'B', 'int16_t': 'h', 'uint16_t': 'H', 'int32_t': 'i', 'uint32_t': 'I',
+                'int64_t': 'q', 'uint64_t': 'Q', 'long': 'i', 'ulong': 'I'}
+
+
+class BlendFileError(Exception):
+    """Raised for files we can't parse. The caller should fall back to blender itself."""
+
+
+class BlendFile:
+    """Parses the file header, the blocks and the DNA1 block (SDNA) of a .blend file.
+
+    Uncompressed files get mapped into memory, compressed files (gzip, zstd) get decompressed into memory.
+    """
+
+    def __init__(self, file_path):
+        """The constructor. Reads the file header, all block headers and the SDNA.
+
+        :param file_path: The path of the .blend file.
+        """
+
+        self.file_path = file_path
+        self.version = None
+        self.pointer_size = None
+        self.endian = None
+        self.blocks = []
+        self.structs = {}
+
+        self._offset = 0
+        self._large_block_headers = False
+        self._data = self._load(file_path)
+        try:
+            self._parse_header()
+            self._parse_blocks()
+        except (struct.error, IndexError, ValueError) as error:
+            raise BlendFileError('{} is no valid .blend file: {}'.format(file_path, error))
+
+
+    def close(self):
+        """Releases the file content."""
+
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    @staticmethod
+    def _load(file_path):
+        """Loads the content of the file. Detects the compression by its magic bytes.
+
+        :param file_path: The path of the .blend file.
+        :return: The uncompressed content (bytes or a memory map).
+        """
+
+        with open(file_path, 'rb') as blend_file:
+            magic = blend_file.read(4)
+            blend_file.seek(0)
+            if magic[:2] == b'\x1f\x8b':
+                with gzip.GzipFile(fileobj = blend_file) as gzip_file:
+                    return gzip_file.read()
+            if magic == b'\x28\xb5\x2f\xfd':
+                if zstandard is None:
+                    raise BlendFileError('{} is compressed with zstd, but zstandard is not available.'.format(file_path))
+                with zstandard.ZstdDecompressor().stream_reader(blend_file, read_across_frames = True) as zstd_file:
+                    return zstd_file.read()
+            if magic != b'BLEN':
+                raise BlendFileError('{} is no .blend file.'.format(file_path))
+            return mmap.mmap(blend_file.fileno(), 0, access = mmap.ACCESS_READ)
+
+
+    def _parse_header(self):
+        """Parses the file header. Supports the 12 byte header and the longer one introduced with blender 5.0."""
+
+        if self._data[:7] != b'BLENDER':
+            raise BlendFileError('{} has no valid header.'.format(self.file_path))
+
+        if self._data[7:9].isdigit():
+            # 'BLENDER17-01v0500': header size, pointer size, file format version, endianness, version.
+            header_size = int(self._data[7:9])
+            self.pointer_size = 8
+            self.endian = '<' if self._data[12:13] == b'v' else '>'
+            version = int(self._data[13:header_size])
+            self._large_block_headers = True
+        else:
+            # 'BLENDER_v293': pointer size, endianness, version.
+            header_size = 12
+            self.pointer_size = 4 if self._data[7:8] == b'_' else 8
+            self.endian = '<' if self._data[8:9] == b'v' else '>'
+            version = int(self._data[9:12])
+            self._large_block_headers = False
+
+        self.version = (version // 100, version % 100)
+        self._offset = header_size
+
+
+    def _parse_blocks(self):
+        """Parses all block headers until the ENDB block and finally the SDNA inside the DNA1 block."""
+
+        pointer = 'Q' if self.pointer_size == 8 else 'I'
+        if self._large_block_headers:
+            block_header = struct.Struct(self.endian + '4si' + pointer + 'qq')
+        else:
+            block_header = struct.Struct(self.endian + '4si' + pointer + 'ii')
+
+        offset = self._offset
+        sdna = None
+        while offset + block_header.size <= len(self._data):
+            if self._large_block_headers:
+                (code, sdna_index, old_pointer, size, count) = block_header.unpack_from(self._data, offset)
+            else:
+                (code, size, old_pointer, sdna_index, count) = block_header.unpack_from(self._data, offset)
+            offset += block_header.size
+            code = code.rstrip(b'\x00')
+            if code == b'ENDB':
+                break
+            if code == b'DNA1':
+                sdna = offset
+            self.blocks.append(Block(code, sdna_index, old_pointer, count, offset, size))
+            offset += size
+
+        if sdna is None:
+            raise BlendFileError('{} has no DNA1 block.'.format(self.file_path))
+        self._parse_sdna(sdna)
+
+
+    def _parse_sdna(self, offset):
+        """Parses the SDNA, the description of all structs stored in the file.
+
+        :param offset: The offset of the content of the DNA1 block.
+        """
+
+        # All sections are aligned to 4 bytes relative to the start of the SDNA.
+        start = offset
+        def align(offset):
+            return start + ((offset - start + 3) & ~3)
+
+        def read_names(offset):
+            (count,) = struct.unpack_from(self.endian + 'i', self._data, offset + 4)
+            offset += 8
+            names = []
+            for _ in range(count):
+                end = self._data.find(b'\x00', offset)
+                names.append(self._data[offset:end].decode('utf-8', 'replace'))
+                offset = end + 1
+            return (names, align(offset))
+
+        (names, offset) = read_names(offset + 4)
+        (types, offset) = read_names(offset)
+
+        offset += 4
+        lengths = struct.unpack_from('{}{}h'.format(self.endian, len(types)), self._data, offset)
+        offset = align(offset + 2 * len(types))
+
+        (count,) = struct.unpack_from(self.endian + 'i', self._data, offset + 4)
+        offset += 8
+        for index in range(count):
+            (type_index, field_count) = struct.unpack_from(self.endian + 'hh', self._data, offset)
+            offset += 4
+            fields = {}
+            field_offset = 0
+            for _ in range(field_count):
+                (field_type, field_name) = struct.unpack_from(self.endian + 'hh', self._data, offset)
+                offset += 4
+                field = Field(names[field_name], types[field_type], field_offset, lengths[field_type], self.pointer_size)
+                fields[field.name] = field
+                field_offset += field.size
+            self.structs[types[type_index]] = Struct(types[type_index], index, lengths[type_index], fields)
+
+
+    def get_blocks(self, code = None, struct_name = None):
+        """Gets all blocks with the given code and/or the given struct.
+
+        :param code: The block code, e.g. b'OB' for objects.
+        :param struct_name: The name of the struct, e.g. 'Base'.
+        :return: A list of blocks.
+        """
+
+        blocks = self.blocks
+        if code is not None:
+            blocks = [block for block in blocks if block.code == code]
+        if struct_name is not None:
+            index = self.structs[struct_name].index if struct_name in self.structs else None
+            blocks = [block for block in blocks if block.sdna_index == index]
+        return blocks
+
+
+    def read_field(self, offset, struct_name, *path):
+        """Reads the value of a (nested) field of a struct.
+
+        :param offset: The offset of the struct inside the file.
+        :param struct_name: The name of the struct.
+        :param path: The names of the fields, e.g. ('id', 'name').
+        :return: The value. Strings for char arrays, tuples for other arrays, integers for pointers. None if the field doesn't exist.
+        """
+
+        field = None
+        for name in path:
+            if struct_name not in self.structs or name not in self.structs[struct_name].fields:
+                return None
+            field = self.structs[struct_name].fields[name]
+            offset += field.offset
+            struct_name = field.type
+
+        if field.pointer:
+            pointer = 'Q' if self.pointer_size == 8 else 'I'
+            values = struct.unpack_from('{}{}{}'.format(self.endian, field.array_length, pointer), self._data, offset)
+        elif field.type == 'char' and field.array_length > 1:
+            value = self._data[offset:offset + field.array_length]
+            return value.split(b'\x00', 1)[0].decode('utf-8', 'replace')
+        elif field.type in TYPE_FORMATS:
+            values = struct.unpack_from('{}{}{}'.format(self.endian, field.array_length, TYPE_FORMATS[field.type]), self._data, offset)
+        else:
+            return None
+        return values[0] if field.array_length == 1 else values
+
+
+    def read_bytes(self, offset, size):
+        """Reads raw bytes of the file.
+
+        :param offset: The offset inside the file.
+        :param size: The number of bytes.
+        :return: The bytes.
+        """
+
+        return self._data[offset:offset + size]
+
+
+    def get_min_version(self):
+        """Gets the minimum version of blender which is able to read this file.
+
+        :return: The minimum version as (major, minor) or None if not stored.
+        """
+
+        for block in self.get_blocks(b'GLOB'):
+            min_version = self.read_field(block.offset, 'FileGlobal', 'minversion')
+            if min_version:
+                return (min_version // 100, min_version % 100)
+        return None
+
+
+    def get_objects(self):
+        """Gets all objects with their names, types and visibility.
+
+        An object counts as hidden if 'Disable in Viewports' is set or it's hidden in every view layer.
+        It counts as excluded if it has no base in any view layer, e.g. because its collection is excluded.
+
+        :return: A list of dictionaries with 'name', 'type', 'hidden', 'excluded' and 'visible'.
+        """
+
+        # Collects the visibility of the object in all view layers.
+        bases = {}
+        for block in self.get_blocks(b'DATA', 'Base'):
+            size = self.structs['Base'].size
+            for index in range(block.count):
+                offset = block.offset + index * size
+                obj = self.read_field(offset, 'Base', 'object')
+                hidden = bool(self.read_field(offset, 'Base', 'flag') & BASE_HIDDEN)
+                bases[obj] = bases.get(obj, True) and hidden
+
+        objects = []
+        for block in self.get_blocks(b'OB'):
+            restrict = self.read_field(block.offset, 'Object', 'visibility_flag')
+            if restrict is None:
+                restrict = self.read_field(block.offset, 'Object', 'restrictflag') or 0
+            object_type = self.read_field(block.offset, 'Object', 'type')
+            hidden = bool(restrict & OB_HIDE_VIEWPORT) or bases.get(block.old_pointer, False)
+            excluded = block.old_pointer not in bases
+            objects.append({'name': self.read_field(block.offset, 'Object', 'id', 'name')[2:],
+                            'type': OBJECT_TYPES.get(object_type, str(object_type)),
+                            'hidden': hidden,
+                            'excluded': excluded,
+                            'visible': not hidden and not excluded})
+        return objects
+
+
+class Block:
+    """A block of a .blend file. The content starts at the offset."""
+
+    def __init__(self, code, sdna_index, old_pointer, count, offset, size):
+        self.code = code
+        self.sdna_index = sdna_index
+        self.old_pointer = old_pointer
+        self.count = count
+        self.offset = offset
+        self.size = size
+
+
+class Struct:
+    """A struct described by the SDNA."""
+
+    def __init__(self, name, index, size, fields):
+        self.name = name
+        self.index = index
+        self.size = size
+        self.fields = fields
+
+
+class Field:
+    """A field of a struct described by the SDNA. Computes name, size and array length from the SDNA name, e.g. '*mat[4][4]'."""
+
+    def __init__(self, sdna_name, field_type, offset, type_size, pointer_size):
+        self.type = field_type
+        self.offset = offset
+        self.pointer = sdna_name.startswith('*') or sdna_name.startswith('(*')
+
+        name = sdna_name
+        self.array_length = 1
+        if '[' in name:
+            for dimension in name[name.index('['):].strip('[]').split(']['):
+                self.array_length *= int(dimension)
+            name = name[:name.index('[')]
+        self.name = name.strip('*()')
+
+        if self.pointer:
+            self.size = pointer_size * self.array_length
+        else:
+            self.size = type_size * self.array_length
+
@@ -0,0 +1,277 @@
+"""Extracts plain meshes directly from .blend files without blender."""
+
+# Imports from third party libraries.
+import numpy
+
+# Imports from own package.
+from CuraBlender.BlendFile import BlendFile, BlendFileError
+
+
+# Flag of Collection.flag for 'Disable in Viewports'.
+COLLECTION_HIDE_VIEWPORT = 1 << 0
+# Flags of LayerCollection.flag for 'Exclude from View Layer' and 'Hide in Viewport'.
+LAYER_COLLECTION_EXCLUDE = 1 << 4
+LAYER_COLLECTION_HIDE = 1 << 7
+
+
+class UnsupportedBlendFile(BlendFileError):
+    """Raised for files which need blender itself, e.g. because of modifiers or unknown mesh layouts."""
+
+
+def read_meshes(blend_file):
+    """Reads all mesh objects of a .blend file in the same order as our BlenderAPI exports them.
+
+    Only supports plain meshes. Modifiers, shape keys, linked data, other geometry types and anything hidden
+    need blender to be evaluated correctly and raise UnsupportedBlendFile.
+
+    :param blend_file: The parsed .blend file. The caller may still inspect it, if blender is needed.
+    :return: A list of tuples (name, vertices, triangles). Vertices are float32 in world space (Z up), triangles are int32 indices.
+    """
+
+    try:
+        return _read_meshes(blend_file)
+    except (KeyError, ValueError, IndexError) as error:
+        raise UnsupportedBlendFile('{} has an unknown layout: {}'.format(blend_file.file_path, error))
+
+
+def read_bounding_boxes(file_path):
+    """Reads the bounding boxes of all visible mesh objects from their base meshes.
+
+    Ignores modifiers and shape keys, so the boxes are only approximations, e.g. for proxies shown until blender is done.
+
+    :param file_path: The path of the .blend file.
+    :return: A list of tuples (name, minimum, maximum). Both corners are in world space (Z up).
+    """
+
+    with BlendFile(file_path) as blend_file:
+        try:
+            blocks = {block.old_pointer: block for block in blend_file.blocks}
+            boxes = []
+            for (obj, block) in zip(blend_file.get_objects(), blend_file.get_blocks(b'OB')):
+                if obj['type'] != 'MESH' or not obj['visible']:
+                    continue
+                mesh_block = blocks.get(blend_file.read_field(block.offset, 'Object', 'data'))
+                if mesh_block is None or mesh_block.code != b'ME':
+                    raise UnsupportedBlendFile('{} has no mesh data for {}.'.format(file_path, obj['name']))
+                (vertices, _) = _read_mesh(blend_file, blocks, mesh_block)
+                if not len(vertices):
+                    continue
+                matrix = _read_matrix(blend_file, block)
+                vertices = vertices @ matrix[:3, :3] + matrix[3, :3]
+                boxes.append((obj['name'], vertices.min(axis = 0), vertices.max(axis = 0)))
+            return boxes
+        except (KeyError, ValueError, IndexError) as error:
+            raise UnsupportedBlendFile('{} has an unknown layout: {}'.format(file_path, error))
+
+
+def _read_meshes(blend_file):
+    """Reads all mesh objects of a parsed .blend file.
+
+    :param blend_file: The parsed .blend file.
+    :return: A list of tuples (name, vertices, triangles).
+    """
+
+    file_path = blend_file.file_path
+    _check_collections(blend_file)
+    blocks = {block.old_pointer: block for block in blend_file.blocks}
+
+    meshes = []
+    for (obj, block) in zip(blend_file.get_objects(), blend_file.get_blocks(b'OB')):
+        if obj['type'] != 'MESH':
+            # Everything but meshes (Camera, Light, ...) gets removed by our BlenderAPI as well.
+            if obj['type'] in ('CAMERA', 'LIGHT', 'EMPTY', 'SPEAKER', 'LIGHT_PROBE'):
+                continue
+            raise UnsupportedBlendFile('{} contains {} objects.'.format(file_path, obj['type']))
+        if not obj['visible']:
+            raise UnsupportedBlendFile('{} contains hidden objects.'.format(file_path))
+        if blend_file.read_field(block.offset, 'Object', 'id', 'lib'):
+            raise UnsupportedBlendFile('{} contains linked objects.'.format(file_path))
+        if blend_file.read_field(block.offset, 'Object', 'modifiers', 'first'):
+            raise UnsupportedBlendFile('{} contains modifiers.'.format(file_path))
+
+        matrix = _read_matrix(blend_file, block)
+        mesh_block = blocks.get(blend_file.read_field(block.offset, 'Object', 'data'))
+        if mesh_block is None or mesh_block.code != b'ME':
+            raise UnsupportedBlendFile('{} has no mesh data for {}.'.format(file_path, obj['name']))
+        if blend_file.read_field(mesh_block.offset, 'Mesh', 'key'):
+            raise UnsupportedBlendFile('{} contains shape keys.'.format(file_path))
+
+        (vertices, triangles) = _read_mesh(blend_file, blocks, mesh_block)
+        vertices = vertices @ matrix[:3, :3] + matrix[3, :3]
+        meshes.append((obj['name'], vertices.astype(numpy.float32), triangles))
+    return meshes
+
+
+def _check_collections(blend_file):
+    """Checks that no collection hides its objects. Blender evaluates those flags for the visibility of the objects.
+
+    :param blend_file: The parsed .blend file.
+    """
+
+    for block in blend_file.get_blocks(b'GR'):
+        if (blend_file.read_field(block.offset, 'Collection', 'flag') or 0) & COLLECTION_HIDE_VIEWPORT:
+            raise UnsupportedBlendFile('{} contains hidden collections.'.format(blend_file.file_path))
+    if 'LayerCollection' in blend_file.structs:
+        size = blend_file.structs['LayerCollection'].size
+        for block in blend_file.get_blocks(b'DATA', 'LayerCollection'):
+            for index in range(block.count):
+                flag = blend_file.read_field(block.offset + index * size, 'LayerCollection', 'flag') or 0
+                if flag & (LAYER_COLLECTION_EXCLUDE | LAYER_COLLECTION_HIDE):
+                    raise UnsupportedBlendFile('{} contains hidden collections.'.format(blend_file.file_path))
+
+
+def _read_matrix(blend_file, block):
+    """Reads the world matrix of an object. Renamed from 'obmat' to 'object_to_world' in blender 4.0.
+
+    :param blend_file: The parsed .blend file.
+    :param block: The block of the object.
+    :return: The 4x4 matrix. Row 3 holds the translation.
+    """
+
+    for name in ('obmat', 'object_to_world'):
+        values = blend_file.read_field(block.offset, 'Object', name)
+        if values:
+            return numpy.array(values, dtype = numpy.float64).reshape(4, 4)
+    raise UnsupportedBlendFile('{} has no known object matrix.'.format(blend_file.file_path))
+
+
+def _read_mesh(blend_file, blocks, mesh_block):
+    """Reads vertices and triangulated faces of a mesh. Supports the legacy layout (MVert, MPoly, MLoop) and generic attributes.
+
+    :param blend_file: The parsed .blend file.
+    :param blocks: All blocks by their old pointer.
+    :param mesh_block: The block of the mesh.
+    :return: The vertices (N x 3) and the triangles (M x 3).
+    """
+
+    offset = mesh_block.offset
+    vertex_count = _read_first(blend_file, offset, 'totvert', 'verts_num')
+    loop_count = _read_first(blend_file, offset, 'totloop', 'corners_num')
+
+    if blend_file.read_field(offset, 'Mesh', 'mvert'):
+        # Legacy layout (until blender 3.4/3.5).
+        vertices = _read_array(blend_file, blocks, blend_file.read_field(offset, 'Mesh', 'mvert'), 'MVert', 'co', vertex_count)
+        corner_vertices = _read_array(blend_file, blocks, blend_file.read_field(offset, 'Mesh', 'mloop'), 'MLoop', 'v', loop_count)
+        face_count = _read_first(blend_file, offset, 'totpoly')
+        loop_starts = _read_array(blend_file, blocks, blend_file.read_field(offset, 'Mesh', 'mpoly'), 'MPoly', 'loopstart', face_count)
+        face_offsets = numpy.append(loop_starts, loop_count)
+    else:
+        # Generic attributes (since blender 3.4/3.6).
+        vertices = _read_layer(blend_file, blocks, offset, 'vdata', 'position', numpy.float32, vertex_count * 3).reshape(-1, 3)
+        corner_vertices = _read_layer(blend_file, blocks, offset, 'ldata', '.corner_vert', numpy.int32, loop_count)
+        face_count = _read_first(blend_file, offset, 'totpoly', 'faces_num')
+        pointer = blend_file.read_field(offset, 'Mesh', 'poly_offset_indices') or blend_file.read_field(offset, 'Mesh', 'face_offset_indices')
+        face_offsets = _read_data(blend_file, blocks, pointer, numpy.int32, face_count + 1)
+
+    return (vertices.astype(numpy.float64), _triangulate(face_offsets, corner_vertices.astype(numpy.int32)))
+
+
+def _read_first(blend_file, offset, *names):
+    """Reads the first existing field of a mesh. Blender renamed some of them.
+
+    :param blend_file: The parsed .blend file.
+    :param offset: The offset of the mesh.
+    :param names: All known names of the field.
+    :return: The value.
+    """
+
+    for name in names:
+        value = blend_file.read_field(offset, 'Mesh', name)
+        if value is not None:
+            return value
+    raise UnsupportedBlendFile('{} has an unknown mesh layout.'.format(blend_file.file_path))
+
+
+def _get_block(blend_file, blocks, pointer):
+    """Gets the block a pointer points to.
+
+    :param blend_file: The parsed .blend file.
+    :param blocks: All blocks by their old pointer.
+    :param pointer: The old pointer.
+    :return: The block.
+    """
+
+    block = blocks.get(pointer)
+    if not pointer or block is None:
+        raise UnsupportedBlendFile('{} has missing mesh data.'.format(blend_file.file_path))
+    return block
+
+
+def _read_array(blend_file, blocks, pointer, struct_name, field_name, count):
+    """Reads one field of every element of a struct array as numpy array without copying each element.
+
+    :param blend_file: The parsed .blend file.
+    :param blocks: All blocks by their old pointer.
+    :param pointer: The old pointer of the array.
+    :param struct_name: The name of the struct of an element.
+    :param field_name: The name of the field to read.
+    :param count: The number of elements.
+    :return: The values of the field.
+    """
+
+    block = _get_block(blend_file, blocks, pointer)
+    struct_type = blend_file.structs[struct_name]
+    field = struct_type.fields[field_name]
+    base_format = {'float': 'f4', 'int': 'i4', 'uint': 'u4'}[field.type]
+    element_format = (blend_file.endian + base_format, (field.array_length,)) if field.array_length > 1 else blend_file.endian + base_format
+    dtype = numpy.dtype({'names': [field_name], 'formats': [element_format], 'offsets': [field.offset], 'itemsize': struct_type.size})
+    data = blend_file.read_bytes(block.offset, struct_type.size * count)
+    return numpy.frombuffer(data, dtype = dtype, count = count)[field_name]
+
+
+def _read_layer(blend_file, blocks, offset, custom_data, name, dtype, count):
+    """Reads a named layer of the custom data of a mesh, e.g. the 'position' attribute.
+
+    :param blend_file: The parsed .blend file.
+    :param blocks: All blocks by their old pointer.
+    :param offset: The offset of the mesh.
+    :param custom_data: The name of the custom data field of the mesh, e.g. 'vdata'.
+    :param name: The name of the layer.
+    :param dtype: The numpy type of the values.
+    :param count: The number of values.
+    :return: The values of the layer.
+    """
+
+    layers_offset = offset + blend_file.structs['Mesh'].fields[custom_data].offset
+    layer_count = blend_file.read_field(layers_offset, 'CustomData', 'totlayer')
+    layers = _get_block(blend_file, blocks, blend_file.read_field(layers_offset, 'CustomData', 'layers'))
+    size = blend_file.structs['CustomDataLayer'].size
+    for index in range(layer_count):
+        layer_offset = layers.offset + index * size
+        if blend_file.read_field(layer_offset, 'CustomDataLayer', 'name') == name:
+            return _read_data(blend_file, blocks, blend_file.read_field(layer_offset, 'CustomDataLayer', 'data'), dtype, count)
+    raise UnsupportedBlendFile('{} has no {} layer.'.format(blend_file.file_path, name))
+
+
+def _read_data(blend_file, blocks, pointer, dtype, count):
+    """Reads a plain array of values.
+
+    :param blend_file: The parsed .blend file.
+    :param blocks: All blocks by their old pointer.
+    :param pointer: The old pointer of the array.
+    :param dtype: The numpy type of the values.
+    :param count: The number of values.
+    :return: The values.
+    """
+
+    block = _get_block(blend_file, blocks, pointer)
+    dtype = numpy.dtype(dtype).newbyteorder(blend_file.endian)
+    if block.size < dtype.itemsize * count:
+        raise UnsupportedBlendFile('{} has truncated mesh data.'.format(blend_file.file_path))
+    return numpy.frombuffer(blend_file.read_bytes(block.offset, dtype.itemsize * count), dtype = dtype, count = count)
+
+
+def _triangulate(face_offsets, corner_vertices):
+    """Triangulates all faces as fans. Vectorized over all faces at once.
+
+    :param face_offsets: The index of the first corner of every face plus the total number of corners.
+    :param corner_vertices: The vertex index of every corner.
+    :return: The triangles (M x 3).
+    """
+
+    sizes = numpy.diff(face_offsets)
+    triangle_counts = numpy.maximum(sizes - 2, 0)
+    first = numpy.repeat(face_offsets[:-1], triangle_counts)
+    # The position of the second corner of every triangle inside its face (1 .. size - 2).
+    local = numpy.arange(triangle_counts.sum()) - numpy.repeat(numpy.cumsum(triangle_counts) - triangle_counts, triangle_counts) + 1
+    return numpy.stack([corner_vertices[first], corner_vertices[first + local], corner_vertices[first + local + 1]], axis = 1)
@@ -0,0 +1,94 @@
+"""Job which lets blender write a .blend file and reports the outcome."""
+
+# Imports from the python standard library.
+import os
+import time
+
+# Imports from Uranium.
+from UM.Job import Job
+from UM.Logger import Logger
+
+# Imports from own package.
+from CuraBlender import BlenderWorker
+from CuraBlender import Tracing
+
+
+# Seconds to wait for cura to close the stream of the file, before blender overwrites it anyway.
+STREAM_TIMEOUT = 60
+
+
+class BlendWriteJob(Job):
+    """Runs a write program of our BlenderAPI in the background. The result is the boolean value if the file was written.
+
+    Waits until cura has closed its stream of the file, so blender never races with it.
+    """
+
+    def __init__(self, stream, program, *arguments, temp_paths = ()):
+        """The constructor.
+
+        :param stream: The stream cura opened for the file. Blender writes to its path.
+        :param program: The write program of our BlenderAPI ('Write' or 'Write scene').
+        :param arguments: Further arguments for the program after the path of the file.
+        :param temp_paths: Temporary files for the program, which get removed if the job never runs.
+        """
+
+        super().__init__()
+        self.elapsed_time = None
+
+        self._stream = stream
+        self._file_path = stream.name
+        self._program = program
+        self._arguments = arguments
+        self._temp_paths = temp_paths
+
+
+    def getFileName(self):
+        """Gets the path of the written file.
+
+        :return: The path of the written file.
+        """
+
+        return self._file_path
+
+
+    def discard(self):
+        """Removes the temporary files of a job which got superseded before it ran."""
+
+        for temp_path in self._temp_paths:
+            if os.path.isfile(temp_path):
+                os.remove(temp_path)
+
+
+    def run(self):
+        """Writes the file with blender. Runs inside the job queue, not on the main thread."""
+
+        with Tracing.span('Write file', file = self._file_path, program = self._program):
+            self._write()
+
+
+    def _write(self):
+        """Waits for the stream of cura, lets blender write the file and checks the outcome."""
+
+        # Cura writes (nothing) to its stream after our writer returned, so blender has to wait for it.
+        with Tracing.span('Wait for stream'):
+            deadline = time.monotonic() + STREAM_TIMEOUT
+            while not self._stream.closed and time.monotonic() < deadline:
+                time.sleep(0.05)
+
+        start_time = time.monotonic()
+        BlenderWorker.run_program(self._program, None, self._file_path, *self._arguments)
+        self.discard()
+
+        self.elapsed_time = time.monotonic() - start_time
+        # Cura leaves an empty file behind after closing its stream. Only blender fills it.
+        try:
+            success = os.path.getsize(self._file_path) > 0
+        except OSError:
+            success = False
+
+        # Instead of overwriting files, blender saves the old one with .blend1 extension. This file is corrupted, so we delete it.
+        if os.path.isfile(self._file_path + '1'):
+            os.remove(self._file_path + '1')
+
+        Logger.log('i' if success else 'e', 'Writing %s %s after %.2f s', self._file_path, 'finished' if success else 'failed', self.elapsed_time)
+        self.setResult(success)
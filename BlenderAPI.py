@@ -3,9 +3,66 @@
 # Imports from the python standard library.
 import sys
 import os
+import io
+import json
+import time
+import struct
+import cProfile
+import hashlib
+import contextlib
+import traceback
 
 # Imports from the blender python library.
 import bpy
+import mathutils
+import numpy
+
+
+# Prefix of all messages sent by the worker. Must match the one used by the plugin.
+WORKER_MESSAGE = 'CURABLENDER_WORKER:'
+
+# Header of our binary mesh files: Magic, number of vertices, number of triangles. Must match the one used by the plugin.
+RAW_MAGIC = b'CBRAW001'
+RAW_HEADER = '<8sII'
+
+# Header of our binary scene files: Magic, number of meshes, number of nodes. Must match the one used by the plugin.
+SCENE_MAGIC = b'CBSCN001'
+SCENE_HEADER = '<8sII'
+
+# Prefix of the line with our trace events. Must match the one used by the plugin.
+TRACE_MESSAGE = 'Trace '
+
+# Native C++ operators and the blender version which introduced them. Several times faster than the python add-ons.
+NATIVE_EXPORTERS = {'obj': ((3, 2, 0), 'wm.obj_export'), 'ply': ((3, 6, 0), 'wm.ply_export'), 'stl': ((4, 1, 0), 'wm.stl_export')}
+NATIVE_IMPORTERS = {'obj': ((3, 2, 0), 'wm.obj_import'), 'ply': ((3, 6, 0), 'wm.ply_import'), 'stl': ((3, 6, 0), 'wm.stl_import')}
+# Operators of the python add-ons. Newer blender versions removed some of them.
+LEGACY_EXPORTERS = {'stl': 'export_mesh.stl', 'ply': 'export_mesh.ply', 'obj': 'export_scene.obj', 'x3d': 'export_scene.x3d'}
+LEGACY_IMPORTERS = {'stl': 'import_mesh.stl', 'ply': 'import_mesh.ply', 'obj': 'import_scene.obj', 'x3d': 'import_scene.x3d'}
+
+# Prefix of a plan with one export format per group of objects instead of a single file extension. Must match the one used by the plugin.
+PLAN_PREFIX = 'auto:'
+
+# Trace events of the running program in Chrome trace format. None if the plugin doesn't trace.
+trace_events = None
+
+
+@contextlib.contextmanager
+def trace_span(name, **args):
+    """Records the time spent inside the block as trace event, if the plugin traces.
+
+    :param name: The name of the span.
+    :param args: Further information shown with the span.
+    """
+
+    if trace_events is None:
+        yield
+        return
+    start = time.time_ns() // 1000
+    try:
+        yield
+    finally:
+        trace_events.append({'name': name, 'cat': 'blender', 'ph': 'X', 'ts': start, 'dur': time.time_ns() // 1000 - start,
+                             'pid': os.getpid(), 'tid': 0, 'args': args})
 
 
 def remove_scene():
@@ -18,16 +75,28 @@ def remove_scene():
         objects -= 1
 
 
-def load_library(file_path):
-    """Loads the given .blend file as a library.
+def load_visible_objects(file_path):
+    """Appends the scenes of the given .blend file and collects their visible mesh objects. Removes the appended scenes again.
+
+    Works like opening the file and removing decorators and inactive objects, but without leaving the current file.
 
     :param file_path: The path of the .blend file.
-    :return: All real objects without any decorators.
+    :return: All visible mesh objects.
     """
 
     with bpy.data.libraries.load(file_path) as (src, dst):
-        dst.objects = src.objects
-    return dst.objects
+        dst.scenes = src.scenes
+
+    objects = []
+    for scene in dst.scenes:
+        view_layer = scene.view_layers[0]
+        for obj in scene.objects:
+            if obj.type == "MESH" and obj.visible_get(view_layer = view_layer) and obj not in objects:
+                objects.append(obj)
+    for scene in dst.scenes:
+        bpy.data.scenes.remove(scene)
+    # Same order as bpy.data.objects, so the indices match the ones used for reading.
+    return sorted(objects, key = lambda obj: obj.name)
 
 
 def remove_decorators(objects):
@@ -76,6 +145,18 @@ def link_and_rename_objects(objects, file_path):
         bpy.context.collection.objects.link(objects[node])
 
 
+def add_linked_duplicates(obj, copies):
+    """Adds linked duplicates of an object to the scene. They share the mesh data instead of storing it again.
+
+    :param obj: The object to duplicate.
+    :param copies: The number of duplicates.
+    """
+
+    for _ in range(copies):
+        duplicate = obj.copy()
+        bpy.context.collection.objects.link(duplicate)
+
+
 def find_index_and_remove_other_objects(objects, index):
     """Finds the object with the given index and removes all other objects from the scene.
 
@@ -94,6 +175,274 @@ def find_index_and_remove_other_objects(objects, index):
             node += 1
 
 
+def select_only(obj):
+    """Selects the given object and makes it the active one. Every other object gets deselected.
+
+    :param obj: The object to select.
+    """
+
+    for other in bpy.context.view_layer.objects:
+        other.select_set(False)
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+
+
+def export_selected(file_path):
+    """Exports the selected objects to the given file path. The exporter is chosen by the file extension.
+
+    :param file_path: The path of the exported file.
+    """
+
+    if file_path.endswith('.raw'):
+        export_raw(bpy.context.view_layer.objects.active, file_path)
+    else:
+        export_file(file_path, selected_only = True)
+
+
+def export_file(file_path, selected_only = False):
+    """Exports the objects to the given file path with the fastest exporter of this blender version.
+
+    :param file_path: The path of the exported file. The exporter is chosen by the file extension.
+    :param selected_only: If true, only exports the selected objects.
+    """
+
+    operator = get_operator(file_path.rsplit('.', 1)[-1], NATIVE_EXPORTERS, LEGACY_EXPORTERS)
+    properties = operator.get_rna_type().properties.keys()
+    options = {'filepath': file_path, 'check_existing': False}
+    # The native exporters name the selection flag differently. Older exporters (e.g. ply) have none and only export the active object.
+    for flag in ('export_selected_objects', 'use_selection'):
+        if selected_only and flag in properties:
+            options[flag] = True
+            break
+    # Cura doesn't use materials, so writing them only costs time.
+    for flag in ('export_materials', 'use_materials'):
+        if flag in properties:
+            options[flag] = False
+    operator(**options)
+
+
+def import_file(file_path):
+    """Imports a file with the fastest importer of this blender version.
+
+    :param file_path: The path of the imported file. The importer is chosen by the file extension.
+    """
+
+    operator = get_operator(file_path.rsplit('.', 1)[-1], NATIVE_IMPORTERS, LEGACY_IMPORTERS)
+    operator(filepath = file_path)
+
+
+def get_operator(file_extension, native_operators, legacy_operators):
+    """Chooses the operator for a file extension by the version of this blender. Prefers the native operators.
+
+    :param file_extension: The file extension (stl, obj, x3d, ply).
+    :param native_operators: The native operators with the version which introduced them by file extension.
+    :param legacy_operators: The operators of the python add-ons by file extension.
+    :return: The operator.
+    """
+
+    names = []
+    (version, native_name) = native_operators.get(file_extension, (None, None))
+    if version and bpy.app.version >= version:
+        names.append(native_name)
+    if file_extension in legacy_operators:
+        names.append(legacy_operators[file_extension])
+    # Operators of disabled or removed add-ons still resolve, but are missing in the list of their module.
+    for name in names:
+        (module_name, operator_name) = name.split('.')
+        module = getattr(bpy.ops, module_name)
+        if operator_name in dir(module):
+            return getattr(module, operator_name)
+    raise ValueError('Blender {} has no operator for {} files!'.format(bpy.app.version_string, file_extension))
+
+
+def choose_file_extension(file_extension, vertices):
+    """Chooses the export format of an object from the plan of the plugin.
+
+    :param file_extension: A single file extension or a plan with one format per group of objects, e.g. 'auto:stl,stl,ply'.
+    :param vertices: The number of vertices of the evaluated object. Objects get grouped in steps of factor 4.
+    :return: The file extension for this object.
+    """
+
+    if not file_extension.startswith(PLAN_PREFIX):
+        return file_extension
+    plan = file_extension[len(PLAN_PREFIX):].split(',')
+    return plan[min(vertices.bit_length() // 2, len(plan) - 1)]
+
+
+def export_raw(obj, file_path):
+    """Exports the evaluated mesh of an object as raw binary data. Avoids encoding and decoding any file format.
+
+    Writes the header followed by float32 vertices (x, y, z in world space) and uint32 triangle indices.
+
+    :param obj: The object to export.
+    :param file_path: The path of the exported file.
+    """
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    evaluated = obj.evaluated_get(depsgraph)
+    mesh = evaluated.to_mesh()
+    try:
+        mesh.transform(obj.matrix_world)
+        mesh.calc_loop_triangles()
+
+        vertices = numpy.empty(len(mesh.vertices) * 3, dtype = numpy.float32)
+        mesh.vertices.foreach_get('co', vertices)
+        indices = numpy.empty(len(mesh.loop_triangles) * 3, dtype = numpy.int32)
+        mesh.loop_triangles.foreach_get('vertices', indices)
+    finally:
+        evaluated.to_mesh_clear()
+
+    with open(file_path, 'wb') as raw_file:
+        raw_file.write(struct.pack(RAW_HEADER, RAW_MAGIC, len(vertices) // 3, len(indices) // 3))
+        raw_file.write(vertices.astype('<f4', copy = False).tobytes())
+        raw_file.write(indices.astype('<u4', copy = False).tobytes())
+
+
+def count_triangles(obj, depsgraph):
+    """Counts the triangles of the evaluated mesh of an object without triangulating it.
+
+    :param obj: The object to count.
+    :param depsgraph: The evaluated dependency graph of the scene.
+    :return: The number of triangles.
+    """
+
+    mesh = obj.evaluated_get(depsgraph).data
+    sizes = numpy.empty(len(mesh.polygons), dtype = numpy.int32)
+    mesh.polygons.foreach_get('loop_total', sizes)
+    return int(numpy.maximum(sizes - 2, 0).sum())
+
+
+def apply_triangle_budget(objects, budget):
+    """Adds a decimate modifier to all objects, so all of them together stay within the triangle budget.
+
+    Every object gets reduced by the same ratio. The original file stays untouched, because it never gets saved.
+
+    :param objects: All objects which get exported.
+    :param budget: The maximum number of triangles of all objects together. No limit if 0.
+    """
+
+    if budget <= 0:
+        return
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    triangles = sum(count_triangles(obj, depsgraph) for obj in objects)
+    if triangles <= budget:
+        return
+    ratio = budget / triangles
+    for obj in objects:
+        modifier = obj.modifiers.new('CuraBlender triangle budget', 'DECIMATE')
+        modifier.ratio = ratio
+
+
+def get_fingerprint(obj, depsgraph):
+    """Calculates a cheap fingerprint of an object. Changes whenever the exported mesh would change.
+
+    Covers the name, the world matrix, the mesh data, all modifier settings and the evaluated vertex count.
+
+    :param obj: The object to fingerprint.
+    :param depsgraph: The evaluated dependency graph of the scene.
+    :return: The fingerprint as hex string.
+    """
+
+    fingerprint = hashlib.blake2b(digest_size = 8)
+    fingerprint.update(obj.name.encode())
+    fingerprint.update(numpy.array(obj.matrix_world, dtype = numpy.float32).tobytes())
+
+    mesh = obj.data
+    coordinates = numpy.empty(len(mesh.vertices) * 3, dtype = numpy.float32)
+    mesh.vertices.foreach_get('co', coordinates)
+    fingerprint.update(coordinates.tobytes())
+    corners = numpy.empty(len(mesh.loops), dtype = numpy.int32)
+    mesh.loops.foreach_get('vertex_index', corners)
+    fingerprint.update(corners.tobytes())
+    sizes = numpy.empty(len(mesh.polygons), dtype = numpy.int32)
+    mesh.polygons.foreach_get('loop_total', sizes)
+    fingerprint.update(sizes.tobytes())
+
+    for modifier in obj.modifiers:
+        for prop in modifier.bl_rna.properties:
+            if prop.identifier != 'rna_type':
+                fingerprint.update('{}={!r};'.format(prop.identifier, getattr(modifier, prop.identifier)).encode())
+
+    # Catches changes of other objects used by modifiers (e.g. boolean operands).
+    fingerprint.update(str(len(obj.evaluated_get(depsgraph).data.vertices)).encode())
+    return fingerprint.hexdigest()
+
+
+def get_capabilities():
+    """Collects everything the plugin wants to know about this blender without probing it again.
+
+    :return: A dictionary with the exact version and whether the plugin supports it.
+    """
+
+    return {'version': list(bpy.app.version),
+            'compatible': bpy.app.version >= (2, 80, 0)}
+
+
+def build_mesh(name, vertices, indices):
+    """Builds a triangle mesh directly from buffers.
+
+    :param name: The name of the mesh.
+    :param vertices: The vertices (float32, x, y, z).
+    :param indices: The vertex indices of all triangles (uint32).
+    :return: The new mesh.
+    """
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(vertices) // 3)
+    mesh.vertices.foreach_set('co', vertices)
+    mesh.loops.add(len(indices))
+    mesh.loops.foreach_set('vertex_index', indices.astype(numpy.int32))
+    mesh.polygons.add(len(indices) // 3)
+    mesh.polygons.foreach_set('loop_start', numpy.arange(0, len(indices), 3, dtype = numpy.int32))
+    try:
+        mesh.polygons.foreach_set('loop_total', numpy.full(len(indices) // 3, 3, dtype = numpy.int32))
+    except (AttributeError, TypeError):
+        # Read-only since blender 4.0, derived from the loop starts.
+        pass
+    mesh.update()
+    mesh.validate()
+    return mesh
+
+
+def load_scene_file(file_path):
+    """Builds objects from a binary scene file written by the plugin. Nodes sharing a mesh become linked duplicates.
+
+    :param file_path: The path of the binary scene file.
+    """
+
+    with open(file_path, 'rb') as scene_file:
+        data = scene_file.read()
+    (magic, mesh_count, node_count) = struct.unpack_from(SCENE_HEADER, data)
+    if magic != SCENE_MAGIC:
+        raise ValueError('{} is no scene file!'.format(file_path))
+    offset = struct.calcsize(SCENE_HEADER)
+
+    meshes = []
+    for index in range(mesh_count):
+        (vertex_count, triangle_count) = struct.unpack_from('<II', data, offset)
+        offset += 8
+        vertices = numpy.frombuffer(data, dtype = '<f4', count = vertex_count * 3, offset = offset)
+        offset += vertices.nbytes
+        indices = numpy.frombuffer(data, dtype = '<u4', count = triangle_count * 3, offset = offset)
+        offset += indices.nbytes
+        meshes.append(build_mesh('Mesh_{}'.format(index + 1), vertices, indices))
+
+    for _ in range(node_count):
+        (mesh_index,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        matrix = numpy.frombuffer(data, dtype = '<f4', count = 16, offset = offset).reshape(4, 4)
+        offset += 64
+        (name_length,) = struct.unpack_from('<H', data, offset)
+        offset += 2
+        name = data[offset:offset + name_length].decode('utf-8')
+        offset += name_length
+
+        obj = bpy.data.objects.new(name, meshes[mesh_index])
+        # Sequences get assigned column by column, but the plugin writes the matrix row by row.
+        obj.matrix_world = mathutils.Matrix(matrix.tolist())
+        bpy.context.collection.objects.link(obj)
+
+
 def reposition_objects():
     """Repositions all objects in the blender file along the x-axis. Used in 'Write' mode."""
 
@@ -118,13 +467,24 @@ def reposition_objects():
             length += bpy.context.collection.objects[node].dimensions[0] + distance
 
 
-def main():
-    """Main program."""
+def run_program(arguments):
+    """Runs the program given as last argument.
+
+    :param arguments: All arguments for the program. The order of them is fixed and the program is always the last one.
+    """
 
-    program = sys.argv[-1]
+    program = arguments[-1]
+
+    # Program for checking the version of blender.
+    if program == 'Version':
+        print(bpy.app.version >= (2, 80, 0))
+
+    # Program for collecting the capabilities of blender. Printed as JSON on a single line.
+    elif program == 'Capabilities':
+        print('Capabilities {}'.format(json.dumps(get_capabilities())))
 
     # Program for counting nodes inside a file.
-    if program == 'Count nodes':
+    elif program == 'Count nodes':
         remove_inactive_objects(bpy.data.objects)
         nodes = 0
         for node, _ in enumerate(bpy.data.objects):
@@ -136,57 +496,231 @@ def main():
     elif program == 'Single node':
         remove_decorators(bpy.data.objects)
         remove_inactive_objects(bpy.data.objects)
-        exec(sys.argv[-2])
+        exec(arguments[-2])
 
     # Program for loading files with multiple nodes.
     elif program == 'Multiple nodes':
-        index = int(sys.argv[-2])
+        index = int(arguments[-3])
 
         remove_decorators(bpy.data.objects)
         remove_inactive_objects(bpy.data.objects)
 
+        # The budget applies to all objects of the file, so every object gets the same ratio as on the first import.
+        apply_triangle_budget(list(bpy.data.objects), int(arguments[-2]))
         find_index_and_remove_other_objects(bpy.data.objects, index)
 
-        exec(sys.argv[-3])
-
-    # Program for preparing the 'Write' step.
-    elif program == 'Write prepare':
-        remove_decorators(bpy.data.objects)
-        remove_inactive_objects(bpy.data.objects)
-        bpy.ops.wm.save_as_mainfile(filepath = '{}'.format(sys.argv[-2]))
+        with trace_span('Export', index = index + 1):
+            exec(arguments[-4])
+
+    # Program for loading all nodes of a file at once. Prints the number of nodes and exports every node to its own file.
+    # Prints the name and fingerprint of every node and skips nodes whose fingerprint is already known by the plugin.
+    elif program == 'All nodes':
+        temp_prefix = arguments[-5]
+        file_extension = arguments[-4]
+        known_fingerprints = set(filter(None, arguments[-3].split(';')))
+
+        with trace_span('Filter objects'):
+            remove_decorators(bpy.data.objects)
+            remove_inactive_objects(bpy.data.objects)
+
+        objects = list(bpy.data.objects)
+        print(len(objects))
+        with trace_span('Triangle budget'):
+            apply_triangle_budget(objects, int(arguments[-2]))
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+        for index, obj in enumerate(objects):
+            # Lets the plugin match the objects with the proxies, which only exist for visible meshes.
+            print('Object {}:{}'.format(index + 1, obj.name))
+            with trace_span('Fingerprint', object = obj.name):
+                fingerprint = '{}:{}'.format(index + 1, get_fingerprint(obj, depsgraph))
+            print('Fingerprint {}'.format(fingerprint))
+            if fingerprint not in known_fingerprints:
+                vertices = len(getattr(obj.evaluated_get(depsgraph).data, 'vertices', ()))
+                object_extension = choose_file_extension(file_extension, vertices)
+                start_time = time.perf_counter()
+                with trace_span('Export', object = obj.name, format = object_extension):
+                    select_only(obj)
+                    export_selected('{}_{}.{}'.format(temp_prefix, index + 1, object_extension))
+                # Lets the plugin measure the costs of every format. Flushed, so the plugin can read the object while the others get exported.
+                print('Export {}:{}:{}:{:.6f}'.format(index + 1, object_extension, vertices, time.perf_counter() - start_time), flush = True)
+
+    # Program for executing a given instruction, e.g. converting foreign files.
+    elif program == 'Execute':
+        exec(arguments[-2])
 
     # Program for creating a file.
     elif program == 'Write':
         remove_scene()
 
-        blender_files = sys.argv[-2]
+        # Every entry has the form 'copies*path'. Copies are 'index:number' pairs of objects which are placed more than once.
+        blender_files = arguments[-2]
         blender_files = blender_files.split(';')
-        # Processes blender files.
-        for file_path in list(filter(None, blender_files)):
-            objects = load_library(file_path)
-            link_and_rename_objects(objects, file_path)
-            os.remove(file_path)
-
-        execute_list = sys.argv[-3]
+        # Processes blender files. Filters and appends their objects directly, so no prepared copies are needed.
+        for entry in list(filter(None, blender_files)):
+            (copies, file_path) = entry.split('*', 1)
+            with trace_span('Append objects', file = file_path):
+                objects = load_visible_objects(file_path)
+                link_and_rename_objects(objects, file_path)
+            for pair in list(filter(None, copies.split(','))):
+                (index, number) = pair.split(':')
+                if int(index) <= len(objects):
+                    add_linked_duplicates(objects[int(index) - 1], int(number) - 1)
+
+        # Every entry has the form 'number*instruction'. Each foreign file gets imported once and duplicated as linked copies.
+        execute_list = arguments[-3]
         execute_list = execute_list.split(';')
         # Processes foreign files.
-        for execute in list(filter(None, execute_list)):
-            exec(execute)
-            for node in bpy.context.collection.objects:
-                if not node.name.endswith('_NEW'):
-                    file_name = os.path.basename(execute[execute.index('filepath = ') + 12:][:-2])
+        for entry in list(filter(None, execute_list)):
+            (number, execute) = entry.split('*', 1)
+            with trace_span('Import foreign file'):
+                exec(execute)
+            for node in list(bpy.context.collection.objects):
+                if '_NEW' not in node.name:
+                    # The path is the last quoted argument of the instruction.
+                    file_name = os.path.basename(execute.rsplit("'", 2)[-2])
                     node.name = '{}_{}_NEW'.format(file_name.rsplit('.', 1)[0], file_name.rsplit('.', 1)[-1])
+                    add_linked_duplicates(node, int(number) - 1)
 
         # Repositions all objects.
         reposition_objects()
 
         # Saves the file on given filepath.
-        bpy.ops.wm.save_as_mainfile(filepath = '{}'.format(sys.argv[-4]))
+        with trace_span('Save file'):
+            bpy.ops.wm.save_as_mainfile(filepath = '{}'.format(arguments[-4]))
+
+    # Program for creating a file from the meshes cura holds in memory. Keeps the placement of every node.
+    elif program == 'Write scene':
+        remove_scene()
+
+        scene_path = arguments[-2]
+        with trace_span('Build meshes'):
+            load_scene_file(scene_path)
+        os.remove(scene_path)
+
+        # Saves the file on given filepath.
+        with trace_span('Save file'):
+            bpy.ops.wm.save_as_mainfile(filepath = '{}'.format(arguments[-3]))
 
     # Wrong program call.
     else:
         pass
 
 
+def run_traced_program(arguments, profile_path = None):
+    """Runs a program and reports its trace events afterwards, if the plugin traces.
+
+    :param arguments: All arguments for the program. The program is always the last one.
+    :param profile_path: If set, runs the program under cProfile and saves the statistics to this path.
+    """
+
+    global trace_events
+    try:
+        with trace_span(arguments[-1], profile = profile_path):
+            if profile_path:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.runcall(run_program, arguments)
+                finally:
+                    profiler.dump_stats(profile_path)
+            else:
+                run_program(arguments)
+    finally:
+        if trace_events is not None:
+            print('{}{}'.format(TRACE_MESSAGE, json.dumps(trace_events)))
+        trace_events = None
+
+
+def run_worker():
+    """Runs as long-lived worker. Reads one request per line from stdin and answers each on stdout.
+
+    Every request resets blender to a clean state by opening the requested file (or the startup file), so the programs
+    behave the same as in a freshly started blender. After answering, the file gets unloaded again, so idle workers only
+    need the memory of an empty blender. Requests which ask for a stream also get every line of the output as its own message,
+    while the program still runs. The worker stops as soon as stdin gets closed by the plugin.
+    """
+
+    global trace_events
+    send_message({'version': list(bpy.app.version)})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        output = StreamedOutput() if request.get('stream') else io.StringIO()
+        success = True
+        trace_events = [] if request.get('trace') else None
+        try:
+            with trace_span('Load file', file = request['file_path']):
+                if request['file_path']:
+                    bpy.ops.wm.open_mainfile(filepath = request['file_path'], load_ui = False)
+                else:
+                    bpy.ops.wm.read_homefile(load_ui = False)
+            with contextlib.redirect_stdout(output):
+                run_traced_program(request['arguments'], request.get('profile'))
+        except Exception:
+            success = False
+            output.write(traceback.format_exc())
+        send_message({'success': success, 'output': output.getvalue()})
+
+        if request['file_path']:
+            unload_file()
+
+
+def unload_file():
+    """Replaces the loaded file with an empty scene, so it doesn't take up memory while the worker waits."""
+
+    try:
+        bpy.ops.wm.read_homefile(use_empty = True, load_ui = False)
+    except TypeError:
+        # Blender versions before 2.90 don't know the empty scene.
+        bpy.ops.wm.read_homefile(load_ui = False)
+
+
+class StreamedOutput(io.StringIO):
+    """Collects the output of a program and additionally sends every complete line to the plugin as soon as it gets printed."""
+
+    def __init__(self):
+        """The constructor."""
+
+        super().__init__()
+        self._line = ''
+
+
+    def write(self, text):
+        """Writes the text and sends all lines it completes.
+
+        :param text: The printed text.
+        :return: The number of written characters.
+        """
+
+        lines = (self._line + text).split('\n')
+        self._line = lines.pop()
+        for line in lines:
+            send_message({'line': line})
+        return super().write(text)
+
+
+def send_message(message):
+    """Sends a message to the plugin. Blender prints on the same stream, so every message is prefixed and on its own line.
+
+    :param message: A dictionary which gets sent as JSON.
+    """
+
+    sys.__stdout__.write('\n{}{}\n'.format(WORKER_MESSAGE, json.dumps(message)))
+    sys.__stdout__.flush()
+
+
+def main():
+    """Main program."""
+
+    global trace_events
+    if sys.argv[-1] == 'Worker':
+        run_worker()
+    else:
+        # Blender already loaded the file. The plugin measures this time from the outside.
+        trace_events = [] if os.environ.get('CURA_BLENDER_TRACE') else None
+        run_traced_program(sys.argv, os.environ.get('CURA_BLENDER_PROFILE'))
+
+
 if __name__ == "__main__":
     main()
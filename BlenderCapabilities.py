@@ -0,0 +1,131 @@
+"""Persistent record of what the configured blender binary can do. Probes blender only once per binary."""
+
+# Imports from the python standard library.
+import os
+import json
+import threading
+
+# Imports from Uranium.
+from UM.Logger import Logger
+from UM.Application import Application
+from UM.Resources import Resources
+
+# Imports from own package.
+from CuraBlender import BlenderWorker
+
+
+# Name of the file next to the preferences, which holds the records of all known blender binaries.
+CAPABILITIES_FILE = 'cura_blender_capabilities.json'
+
+_lock = threading.Lock()
+_records = None
+
+
+def get_capabilities(blender_path = None, probe = True):
+    """Gets the capabilities of a blender binary. Only starts blender if the binary is unknown or has changed.
+
+    :param blender_path: The path to blender. Uses the preference if none.
+    :param probe: If false, never starts blender and only answers from the record.
+    :return: A dictionary with 'version' and 'compatible' or None if unknown.
+    """
+
+    if blender_path is None:
+        blender_path = Application.getInstance().getPreferences().getValue('cura_blender/blender_path')
+    key = _get_binary_key(blender_path)
+    if not key:
+        return None
+
+    with _lock:
+        records = _load_records()
+        if key in records:
+            return records[key]
+    if not probe:
+        return None
+
+    capabilities = None
+    output = BlenderWorker.run_program('Capabilities')
+    for nextline in output.splitlines():
+        if nextline.startswith('Capabilities '):
+            try:
+                capabilities = json.loads(nextline[len('Capabilities '):])
+            except ValueError:
+                Logger.logException('w', 'Could not read the capabilities of %s', blender_path)
+            break
+    if capabilities is None:
+        return None
+
+    with _lock:
+        records = _load_records()
+        # Forgets older versions of the same binary.
+        prefix = key.rsplit('|', 2)[0] + '|'
+        for old_key in [old_key for old_key in records if old_key.startswith(prefix)]:
+            del records[old_key]
+        records[key] = capabilities
+        _save_records(records)
+    return capabilities
+
+
+def get_version(blender_path = None):
+    """Gets the version of blender without starting it.
+
+    :param blender_path: The path to blender. Uses the preference if none.
+    :return: The version as tuple or None if the binary wasn't probed yet.
+    """
+
+    capabilities = get_capabilities(blender_path, probe = False)
+    return tuple(capabilities['version']) if capabilities else None
+
+
+def _get_binary_key(blender_path):
+    """Gets the key of a blender binary. Changes whenever the binary gets replaced or updated.
+
+    :param blender_path: The path to blender.
+    :return: The key or None if the binary doesn't exist.
+    """
+
+    try:
+        stat = os.stat(blender_path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return '{}|{}|{}'.format(os.path.realpath(blender_path), stat.st_size, stat.st_mtime_ns)
+
+
+def _get_records_path():
+    """Gets the path of the records file next to the preferences.
+
+    :return: The path of the records file.
+    """
+
+    return os.path.join(Resources.getStoragePath(Resources.Preferences), CAPABILITIES_FILE)
+
+
+def _load_records():
+    """Loads all records once per session.
+
+    :return: The records of all known blender binaries by their key.
+    """
+
+    global _records
+    if _records is None:
+        try:
+            with open(_get_records_path(), 'r') as records_file:
+                _records = json.load(records_file)
+        except (OSError, ValueError):
+            _records = {}
+    return _records
+
+
+def _save_records(records):
+    """Saves all records atomically.
+
+    :param records: The records of all known blender binaries by their key.
+    """
+
+    records_path = _get_records_path()
+    temp_path = '{}.{}'.format(records_path, os.getpid())
+    try:
+        with open(temp_path, 'w') as records_file:
+            json.dump(records, records_file, indent = 4)
+        os.replace(temp_path, records_path)
+    except OSError:
+        Logger.logException('w', 'Could not save the capabilities of blender!')
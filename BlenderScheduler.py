@@ -0,0 +1,177 @@
+"""Limits the number of blender processes running at the same time by cores and memory."""
+
+# Imports from the python standard library.
+import os
+import sys
+import ctypes
+import threading
+import contextlib
+import collections
+
+# Imports from Uranium.
+from UM.Logger import Logger
+from UM.Application import Application
+
+
+# Memory of a blender process without any file loaded (bytes).
+BLENDER_BASE_MEMORY = 256 << 20
+# Blender needs a multiple of the file size to hold the scene in memory (uncompressed and with evaluated meshes).
+FILE_MEMORY_FACTOR = 8
+# Share of the physical memory which all blender processes together may use.
+MEMORY_SHARE = 0.5
+
+
+class BlenderScheduler:
+    """A queue for all blender processes. Starts the next one only if a core and enough memory are free.
+
+    Requests get served in order. One process always runs, even if it exceeds the memory budget on its own.
+    Idle workers count against the memory budget with the memory of an empty blender.
+    """
+
+    _instance = None
+
+    def __init__(self):
+        """The constructor. Determines the memory budget once."""
+
+        self.memory_budget = get_memory_budget()
+
+        self._condition = threading.Condition()
+        self._queue = collections.deque()
+        self._running = 0
+        self._memory = 0
+        self._idle_processes = 0
+
+
+    @classmethod
+    def get_instance(cls):
+        """Gets the scheduler shared by the reader, writer and main module.
+
+        :return: The shared scheduler.
+        """
+
+        if cls._instance is None:
+            cls._instance = BlenderScheduler()
+        return cls._instance
+
+
+    @contextlib.contextmanager
+    def slot(self, file_path = None):
+        """Waits until a blender process for the file may run and keeps its slot until the block ends.
+
+        :param file_path: The path of the file blender opens. Only the startup file if none.
+        """
+
+        memory = estimate_memory(file_path)
+        ticket = object()
+
+        with self._condition:
+            self._queue.append(ticket)
+            while self._queue[0] is not ticket or not self._fits(memory):
+                self._condition.wait()
+            self._queue.popleft()
+            self._running += 1
+            self._memory += memory
+            # The next request in the queue may fit as well.
+            self._condition.notify_all()
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._memory -= memory
+                self._condition.notify_all()
+
+
+    def set_idle_processes(self, idle_processes):
+        """Sets the number of idle workers which keep their blender process running.
+
+        :param idle_processes: The number of idle processes.
+        """
+
+        with self._condition:
+            self._idle_processes = idle_processes
+            self._condition.notify_all()
+
+
+    def fits_idle_process(self):
+        """Checks if another idle worker may keep its blender process running.
+
+        Gets called while the worker still holds its slot, so its own memory is already part of the running processes.
+
+        :return: The boolean value if the idle process fits into the memory budget next to the running processes.
+        """
+
+        with self._condition:
+            idle_memory = self._idle_processes * BLENDER_BASE_MEMORY
+            return self.memory_budget is None or self._memory + idle_memory <= self.memory_budget
+
+
+    def _fits(self, memory):
+        """Checks if another blender process may run now.
+
+        :param memory: The estimated memory of the new process.
+        :return: The boolean value if the process fits into the limits.
+        """
+
+        if self._running == 0:
+            return True
+        if self._running >= get_max_processes():
+            return False
+        # The new process may take over one of the idle workers.
+        idle_memory = max(self._idle_processes - 1, 0) * BLENDER_BASE_MEMORY
+        return self.memory_budget is None or self._memory + memory + idle_memory <= self.memory_budget
+
+
+def get_max_processes():
+    """Gets the maximum number of blender processes at the same time. Defaults to the number of cores.
+
+    :return: The maximum number of processes (at least 1).
+    """
+
+    max_processes = Application.getInstance().getPreferences().getValue('cura_blender/max_blender_processes')
+    try:
+        return max(1, int(max_processes))
+    except (TypeError, ValueError):
+        return os.cpu_count() or 1
+
+
+def estimate_memory(file_path = None):
+    """Estimates the memory a blender process needs for a file.
+
+    :param file_path: The path of the file blender opens. Only the startup file if none.
+    :return: The estimated memory in bytes.
+    """
+
+    try:
+        file_size = os.path.getsize(file_path) if file_path else 0
+    except OSError:
+        file_size = 0
+    return BLENDER_BASE_MEMORY + FILE_MEMORY_FACTOR * file_size
+
+
+def get_memory_budget():
+    """Gets the memory all blender processes together may use.
+
+    :return: The budget in bytes or None if the physical memory is unknown.
+    """
+
+    try:
+        if sys.platform == 'win32':
+            class MemoryStatus(ctypes.Structure):
+                _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                            ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                            ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                            ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                            ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+            status = MemoryStatus()
+            status.dwLength = ctypes.sizeof(MemoryStatus)
+            if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return None
+            physical_memory = status.ullTotalPhys
+        else:
+            physical_memory = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        Logger.log('w', 'Could not determine the physical memory. Blender processes are only limited by cores.')
+        return None
+    return int(physical_memory * MEMORY_SHARE)
@@ -0,0 +1,456 @@
+"""Runs the programs of our BlenderAPI, preferably inside a long-lived blender process."""
+
+# Imports from the python standard library.
+import os
+import sys
+import json
+import queue
+import signal
+import threading
+import contextlib
+import subprocess
+
+# Imports from Uranium.
+from UM.Logger import Logger
+from UM.Application import Application
+
+# Imports from own package.
+from CuraBlender import CuraBlender
+from CuraBlender import Tracing
+from CuraBlender.BlenderScheduler import BlenderScheduler
+
+
+# Prefix of all messages sent by the worker. Must match the one used by the BlenderAPI.
+WORKER_MESSAGE = 'CURABLENDER_WORKER:'
+
+# Seconds to wait for a freshly started worker to report back. Protects us against binaries which aren't blender.
+START_TIMEOUT = 60
+
+# Running program calls by the path of their file. Used to cancel calls whose file changed again.
+_running_calls = {}
+_running_calls_lock = threading.Lock()
+
+
+class CancelledError(Exception):
+    """Raised by run_program, if the call got cancelled because a newer call for the same file superseded it."""
+
+
+class BlenderWorker:
+    """A blender process running in the background, which handles one program call after the other.
+
+    Saves the start up time of blender for every call. Restarts itself if blender crashes and shuts down after being idle.
+    Workers are pooled, so the scheduler can run several of them side by side.
+    """
+
+    # The version of blender as reported by the last started worker. None until a worker got started once.
+    version = None
+
+    _workers = []
+    _idle_workers = []
+    _pool_lock = threading.Lock()
+
+    def __init__(self):
+        """The constructor. The blender process itself only gets started on the first request."""
+
+        self._lock = threading.RLock()
+        self._process = None
+        self._messages = None
+        self._blender_path = None
+        self._idle_timer = None
+        self._cancelled = False
+
+
+    @classmethod
+    def acquire(cls):
+        """Takes an idle worker out of the pool or creates a new one. The scheduler limits how many exist.
+
+        :return: A worker for exclusive use until it gets released.
+        """
+
+        with cls._pool_lock:
+            if cls._idle_workers:
+                worker = cls._idle_workers.pop()
+            else:
+                worker = BlenderWorker()
+                cls._workers.append(worker)
+            # Cancellations arriving after the last program finished don't concern the next one.
+            worker._cancelled = False
+        cls._update_idle_processes()
+        return worker
+
+
+    @classmethod
+    def release(cls, worker):
+        """Puts a worker back into the pool. Shuts its blender process down, if it doesn't fit into the memory budget while idle.
+
+        :param worker: The worker taken by acquire.
+        """
+
+        if not BlenderScheduler.get_instance().fits_idle_process():
+            worker.shutdown()
+        with cls._pool_lock:
+            cls._idle_workers.append(worker)
+        cls._update_idle_processes()
+
+
+    @classmethod
+    def shutdown_all(cls):
+        """Shuts all workers of the pool down."""
+
+        with cls._pool_lock:
+            workers = list(cls._workers)
+        for worker in workers:
+            worker.shutdown()
+
+
+    @classmethod
+    def _update_idle_processes(cls):
+        """Tells the scheduler how many idle workers keep their blender process running."""
+
+        with cls._pool_lock:
+            idle_processes = sum(1 for worker in cls._idle_workers if worker._process)
+        BlenderScheduler.get_instance().set_idle_processes(idle_processes)
+
+
+    def run(self, program, file_path = None, *arguments, profile_path = None, on_line = None):
+        """Runs a program of our BlenderAPI inside the worker. Restarts the worker once if it crashed on the way.
+
+        :param program: Mode used by the BlenderAPI to determine which program to run (set of instructions).
+        :param file_path: The path of the file to open before running the program. Opens the startup file if none.
+        :param arguments: Further arguments for the program.
+        :param profile_path: If set, blender runs the program under cProfile and saves the statistics to this path.
+        :param on_line: If set, gets called with every line of the output as soon as blender prints it.
+        :return: The output of the program or None if the worker failed.
+        """
+
+        request = json.dumps({'file_path': file_path, 'arguments': list(arguments) + [program],
+                              'trace': bool(Tracing.get_trace_path()), 'profile': profile_path, 'stream': on_line is not None})
+
+        with self._lock:
+            self._stop_idle_timer()
+            for _ in range(2):
+                if self._cancelled or not self._start():
+                    break
+                try:
+                    self._process.stdin.write(request + '\n')
+                    self._process.stdin.flush()
+                    response = self._receive(timeout = None)
+                    # Streamed lines arrive before the response. A restarted program sends its lines again.
+                    while response is not None and 'line' in response:
+                        on_line(response['line'])
+                        response = self._receive(timeout = None)
+                except (OSError, ValueError):
+                    response = None
+
+                if response is not None:
+                    self._start_idle_timer()
+                    if not response['success']:
+                        Logger.log('e', 'Blender worker failed on %s:\n%s', program, response['output'])
+                    return response['output']
+
+                if not self._cancelled:
+                    Logger.log('w', 'Blender worker crashed on %s. Restarting it.', program)
+                self._stop()
+        return None
+
+
+    def cancel(self):
+        """Cancels the running program by killing blender. Doesn't wait for the lock, which the running program holds."""
+
+        self._cancelled = True
+        process = self._process
+        if process:
+            process.kill()
+
+
+    def shutdown(self):
+        """Shuts the worker down. A new one gets started on the next request."""
+
+        with self._lock:
+            self._stop_idle_timer()
+            self._stop()
+        BlenderWorker._update_idle_processes()
+
+
+    def _start(self):
+        """Starts the blender process if it isn't running yet or the path to blender has changed.
+
+        :return: The boolean value if the worker is ready.
+        """
+
+        blender_path = Application.getInstance().getPreferences().getValue('cura_blender/blender_path')
+        if self._process and (self._process.poll() is not None or self._blender_path != blender_path):
+            self._stop()
+
+        if not self._process:
+            script_path = os.path.join(CuraBlender.CuraBlender.get_plugin_path(), 'BlenderAPI.py')
+            try:
+                self._process = subprocess.Popen([blender_path, '--background', '--python', script_path, '--', 'Worker'],
+                                                 stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = subprocess.DEVNULL,
+                                                 universal_newlines = True, bufsize = 1)
+            except OSError:
+                Logger.logException('e', 'Could not start blender worker!')
+                return False
+            self._blender_path = blender_path
+            self._messages = queue.Queue()
+            threading.Thread(target = self._read_messages, args = (self._process, self._messages), daemon = True).start()
+
+            # The worker introduces itself with its version before accepting requests.
+            message = self._receive(timeout = START_TIMEOUT)
+            if message is None:
+                Logger.log('e', 'Blender worker did not start correctly!')
+                self._stop()
+                return False
+            BlenderWorker.version = tuple(message['version'])
+        return True
+
+
+    def _stop(self):
+        """Stops the blender process. Closing stdin ends the request loop, a hanging process gets killed."""
+
+        process = self._process
+        self._process = None
+        self._messages = None
+        if process:
+            try:
+                process.stdin.close()
+                process.wait(timeout = 5)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                process.kill()
+
+
+    def _receive(self, timeout):
+        """Waits for the next message of the worker.
+
+        :param timeout: Seconds to wait at most or None to wait until the worker answers or ends.
+        :return: The decoded message or None if the worker ended or didn't answer in time.
+        """
+
+        try:
+            return self._messages.get(timeout = timeout)
+        except queue.Empty:
+            return None
+
+
+    @staticmethod
+    def _read_messages(process, messages):
+        """Reads the output of the worker and passes our own messages on. Everything else is printed by blender itself.
+
+        :param process: The blender process to read from.
+        :param messages: The queue for the decoded messages. Receives None when the process ends.
+        """
+
+        for line in process.stdout:
+            if WORKER_MESSAGE in line:
+                messages.put(json.loads(line[line.index(WORKER_MESSAGE) + len(WORKER_MESSAGE):]))
+        messages.put(None)
+
+
+    def _start_idle_timer(self):
+        """Shuts the worker down after the preferred idle time."""
+
+        idle_timeout = Application.getInstance().getPreferences().getValue('cura_blender/worker_idle_timeout')
+        timer = threading.Timer(float(idle_timeout), lambda: self._idle_timeout(timer))
+        timer.daemon = True
+        self._idle_timer = timer
+        timer.start()
+
+
+    def _idle_timeout(self, timer):
+        """Shuts the worker down once its idle timer fired. Runs in the thread of the timer.
+
+        The timer may fire while a request holds the lock. The request stops it and starts a new one afterwards, so only
+        the current timer may shut the worker down.
+
+        :param timer: The timer which fired.
+        """
+
+        with self._lock:
+            if timer is not self._idle_timer:
+                return
+            self._idle_timer = None
+            self._stop()
+        BlenderWorker._update_idle_processes()
+
+
+    def _stop_idle_timer(self):
+        """Stops a running idle timer."""
+
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+
+def build_command(program, file_path = None, *arguments):
+    """Builds the command used by subprocess to run a program of our BlenderAPI in a new blender process.
+
+    :param program: Mode used by the BlenderAPI to determine which program to run (set of instructions).
+    :param file_path: The path of the file blender opens. Opens the startup file if none.
+    :param arguments: Further arguments for the program.
+    :return: The complete command needed by subprocess.
+    """
+
+    blender_path = Application.getInstance().getPreferences().getValue('cura_blender/blender_path')
+    script_path = os.path.join(CuraBlender.CuraBlender.get_plugin_path(), 'BlenderAPI.py')
+
+    # Our BlenderAPI uses sys.argv and the order of all arguments given to it needs to be fixed. The program is always the last one.
+    if file_path:
+        command = '"{}" "{}" --background --python "{}" --'.format(blender_path, file_path, script_path)
+    else:
+        command = '"{}" --background --python "{}" --'.format(blender_path, script_path)
+    for argument in arguments + (program,):
+        command = '{} "{}"'.format(command, argument)
+
+    return command
+
+
+def run_program(program, file_path = None, *arguments, on_line = None):
+    """Runs a program of our BlenderAPI. Uses a worker if activated, otherwise (or if the worker fails) a new blender process.
+
+    Waits in the queue of the scheduler until a core and enough memory are free.
+
+    :param program: Mode used by the BlenderAPI to determine which program to run (set of instructions).
+    :param file_path: The path of the file blender opens. Opens the startup file if none.
+    :param arguments: Further arguments for the program.
+    :param on_line: If set, gets called on this thread with every line of the output as soon as blender prints it. Lines repeat, if blender runs the program again.
+    :return: The output of the program.
+    """
+
+    use_worker = Application.getInstance().getPreferences().getValue('cura_blender/use_blender_worker')
+    profile_path = Tracing.get_profile_path()
+    call = _Call()
+    with _running_calls_lock:
+        _running_calls.setdefault(file_path, []).append(call)
+
+    try:
+        with Tracing.span('Blender {}'.format(program), file = file_path, worker = bool(use_worker), profile = profile_path):
+            with contextlib.ExitStack() as stack:
+                with Tracing.span('Wait for blender'):
+                    stack.enter_context(BlenderScheduler.get_instance().slot(file_path))
+
+                if use_worker and not call.cancelled:
+                    worker = BlenderWorker.acquire()
+                    call.start(worker)
+                    try:
+                        output = worker.run(program, file_path, *arguments, profile_path = profile_path, on_line = on_line)
+                    finally:
+                        call.finish()
+                        BlenderWorker.release(worker)
+                    if output is not None and not call.cancelled:
+                        return Tracing.add_blender_events(output)
+
+                if not call.cancelled:
+                    # Blender inherits the environment, so the trace settings get passed on this way.
+                    environment = dict(os.environ)
+                    environment[Tracing.TRACE_ENVIRONMENT] = '1' if Tracing.get_trace_path() else ''
+                    environment[Tracing.PROFILE_ENVIRONMENT] = profile_path or ''
+                    command = build_command(program, file_path, *arguments)
+                    # Blender gets its own process group, so cancelling kills it and not only the shell.
+                    process = subprocess.Popen(command, shell = True, universal_newlines = True, stdout = subprocess.PIPE, env = environment,
+                                               start_new_session = True)
+                    call.start(process)
+                    if on_line is None:
+                        (output, _) = process.communicate()
+                    else:
+                        lines = []
+                        for line in process.stdout:
+                            lines.append(line)
+                            on_line(line.rstrip('\n'))
+                        process.wait()
+                        output = ''.join(lines)
+                    if not call.cancelled:
+                        return Tracing.add_blender_events(output)
+    finally:
+        with _running_calls_lock:
+            _running_calls[file_path].remove(call)
+            if not _running_calls[file_path]:
+                del _running_calls[file_path]
+
+    Logger.log('d', 'Cancelled %s of %s.', program, file_path)
+    raise CancelledError(file_path)
+
+
+def cancel_programs(file_path):
+    """Cancels all running and waiting program calls for a file. They raise a CancelledError instead of returning.
+
+    :param file_path: The path of the file, which changed again.
+    """
+
+    with _running_calls_lock:
+        calls = list(_running_calls.get(file_path, ()))
+    for call in calls:
+        call.cancel()
+
+
+class _Call:
+    """A call of run_program, which can be cancelled from another thread."""
+
+    def __init__(self):
+        """The constructor."""
+
+        self.cancelled = False
+
+        self._lock = threading.Lock()
+        self._runner = None
+
+
+    def start(self, runner):
+        """Sets what runs the program. Stops it right away, if the call already got cancelled.
+
+        :param runner: The worker or the blender process. Both can be killed.
+        """
+
+        with self._lock:
+            self._runner = runner
+            if self.cancelled:
+                self._kill()
+
+
+    def finish(self):
+        """Forgets the runner, so late cancellations don't stop the next program of a pooled worker."""
+
+        with self._lock:
+            self._runner = None
+
+
+    def cancel(self):
+        """Cancels the call and stops the running program."""
+
+        with self._lock:
+            self.cancelled = True
+            self._kill()
+
+
+    def _kill(self):
+        """Stops the running program. Needs the lock."""
+
+        if isinstance(self._runner, BlenderWorker):
+            self._runner.cancel()
+        elif self._runner is not None:
+            _kill_process_tree(self._runner)
+
+
+def _kill_process_tree(process):
+    """Kills a blender process started through the shell together with the shell.
+
+    :param process: The shell process.
+    """
+
+    try:
+        if sys.platform == 'win32':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL, check = False)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+
+
+def run_program_in_background(program, file_path = None, *arguments):
+    """Runs a program of our BlenderAPI without waiting for it to finish.
+
+    :param program: Mode used by the BlenderAPI to determine which program to run (set of instructions).
+    :param file_path: The path of the file blender opens. Opens the startup file if none.
+    :param arguments: Further arguments for the program.
+    """
+
+    threading.Thread(target = run_program, args = (program, file_path) + arguments, daemon = True).start()
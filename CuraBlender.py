@@ -3,7 +3,6 @@
 # Imports from the python standard library.
 import os
 import glob
-import time  # Small fix for changes to live_reload during runtime.
 import subprocess
 
 # Imports from Uranium.
@@ -14,14 +13,18 @@ from UM.Extension import Extension  # The PluginObject we're going to extend.
 from UM.PluginRegistry import PluginRegistry
 from UM.Mesh.ReadMeshJob import ReadMeshJob  # To reload a mesh when its file was changed.
 from UM.Application import Application
-from UM.Scene.Iterator.DepthFirstIterator import DepthFirstIterator
 from UM.Scene.Selection import Selection
 from UM.i18n import i18nCatalog
 
-# Imports from Cura.
-from cura.Scene.CuraSceneNode import CuraSceneNode
-
 # Imports from own package.
+from CuraBlender import BlenderWorker
+from CuraBlender import BlenderCapabilities
+from CuraBlender import Placement
+from CuraBlender import Tracing
+from CuraBlender import ScratchDirectory
+from CuraBlender.SceneIndex import SceneIndex, get_source_key
+from CuraBlender.ReloadQueue import ReloadQueue
+from CuraBlender.ForeignExportJob import ForeignExportJob
 from CuraBlender.DeprecatedVersionCheck import DEPRECATED_VERSION
 
 # Imports from QT.
@@ -66,16 +69,27 @@ class CuraBlender(Extension):
         # Loads and sets all settings from settings file.
         self._load_and_set_settings()
 
+        # Removes converted files, which crashed sessions left in the scratch directory.
+        ScratchDirectory.remove_stale_files(ScratchDirectory.get_directory(self._preferences.getValue('cura_blender/scratch_path')))
+
+        # Creates the scene index on the main thread, before reads in the background need it.
+        SceneIndex.get_instance()
+
         self._supported_extensions = ['.blend']
         self._supported_foreign_extensions = ['stl', 'obj', 'x3d', 'ply']
 
         # Adds filewatcher and it's connection for blender files.
         fs_watcher = QFileSystemWatcher()
         fs_watcher.fileChanged.connect(self._file_changed)
+        # Collects bursts of change events into a single reload per file.
+        self._reload_queue = ReloadQueue(self._reload_file)
 
         # Adds filewatcher and it's connection for foreign files.
         self._foreign_file_watcher = QFileSystemWatcher()
         self._foreign_file_watcher.fileChanged.connect(self._foreign_file_changed)
+        self._foreign_reload_queue = ReloadQueue(self._reload_foreign_file)
+        # Progress messages of running foreign file reloads by job.
+        self._reload_messages = {}
 
         # Builds the extension menu.
         self.setMenuName(catalog.i18nc('@item:inmenu', 'CuraBlender'))
@@ -83,6 +97,11 @@ class CuraBlender(Extension):
         self.addMenuItem(catalog.i18nc('@item:inmenu', 'Settings'), self._open_settings_window)
         self.addMenuItem(catalog.i18nc('@item:inmenu', 'Debug Blenderpath'), self._show_blender_path)
 
+        # Shuts the background blender worker down together with cura.
+        Application.getInstance().applicationShuttingDown.connect(BlenderWorker.BlenderWorker.shutdown_all)
+        # Writes the spans which ended since the last time the trace file was written.
+        Application.getInstance().applicationShuttingDown.connect(Tracing.flush)
+
         self._console_window = None
         self._blender_path = None
         self._foreign_file_extension = None
@@ -140,6 +159,15 @@ class CuraBlender(Extension):
         # Loads and sets the 'auto_arrange_on_reload' setting.
         if not self._preferences.getValue('cura_blender/auto_arrange_on_reload'):
             self._preferences.addPreference('cura_blender/auto_arrange_on_reload', True)
+        # Loads and sets the 'incremental_arrange_on_reload' setting. Only places changed nodes again instead of the complete build plate.
+        if not self._preferences.getValue('cura_blender/incremental_arrange_on_reload'):
+            self._preferences.addPreference('cura_blender/incremental_arrange_on_reload', True)
+        # Loads and sets the triangle budget of an import. Objects get decimated to stay within it. 0 means no limit.
+        if not self._preferences.getValue('cura_blender/triangle_budget'):
+            self._preferences.addPreference('cura_blender/triangle_budget', 0)
+        # Loads and sets the 'progressive_loading' setting. Shows bounding boxes until blender has converted the file.
+        if not self._preferences.getValue('cura_blender/progressive_loading'):
+            self._preferences.addPreference('cura_blender/progressive_loading', True)
         # Loads and sets the 'auto_scale_on_read' setting.
         if not self._preferences.getValue('cura_blender/auto_scale_on_read'):
             self._preferences.addPreference('cura_blender/auto_scale_on_read', True)
@@ -152,6 +180,48 @@ class CuraBlender(Extension):
         # Loads and sets the 'warn_before_closing_other_blender_instances' setting. !!! Caution !!!
         if not self._preferences.getValue('cura_blender/warn_before_closing_other_blender_instances'):
             self._preferences.addPreference('cura_blender/warn_before_closing_other_blender_instances', True)
+        # Loads and sets the 'use_blender_worker' setting. Keeps one blender running in the background for all conversions.
+        if not self._preferences.getValue('cura_blender/use_blender_worker'):
+            self._preferences.addPreference('cura_blender/use_blender_worker', True)
+        # Loads and sets the idle time in seconds after which the background blender worker shuts down.
+        if not self._preferences.getValue('cura_blender/worker_idle_timeout'):
+            self._preferences.addPreference('cura_blender/worker_idle_timeout', 300)
+        # Loads and sets the 'binary_transfer' setting. Transfers meshes as raw buffers instead of the chosen file extension.
+        if not self._preferences.getValue('cura_blender/binary_transfer'):
+            self._preferences.addPreference('cura_blender/binary_transfer', True)
+        # Loads and sets the 'use_cache' setting. Keeps converted files to skip blender when reading an unchanged file again.
+        if not self._preferences.getValue('cura_blender/use_cache'):
+            self._preferences.addPreference('cura_blender/use_cache', True)
+        # Loads and sets the cache directory. Empty means the cache directory of cura.
+        if not self._preferences.getValue('cura_blender/cache_path'):
+            self._preferences.addPreference('cura_blender/cache_path', '')
+        # Loads and sets the scratch directory for converted files. Empty means /dev/shm if available, otherwise the temp directory.
+        if not self._preferences.getValue('cura_blender/scratch_path'):
+            self._preferences.addPreference('cura_blender/scratch_path', '')
+        # Loads and sets the maximum size of the cache in megabytes.
+        if not self._preferences.getValue('cura_blender/cache_size'):
+            self._preferences.addPreference('cura_blender/cache_size', 1024)
+        # Loads and sets the 'auto_file_extension' setting. Chooses the fastest format per object instead of always using the selected one.
+        if not self._preferences.getValue('cura_blender/auto_file_extension'):
+            self._preferences.addPreference('cura_blender/auto_file_extension', False)
+        # Loads and sets the 'native_reader' setting. Reads plain meshes directly from the file without blender.
+        if not self._preferences.getValue('cura_blender/native_reader'):
+            self._preferences.addPreference('cura_blender/native_reader', True)
+        # Loads and sets the 'write_scene_meshes' setting. Writes the meshes cura holds in memory with their placement instead of reimporting the source files.
+        if not self._preferences.getValue('cura_blender/write_scene_meshes'):
+            self._preferences.addPreference('cura_blender/write_scene_meshes', False)
+        # Loads and sets the quiet period in milliseconds. A file gets reloaded once no further change arrived during this time.
+        if not self._preferences.getValue('cura_blender/reload_quiet_period'):
+            self._preferences.addPreference('cura_blender/reload_quiet_period', 500)
+        # Loads and sets the maximum number of blender processes running at the same time. Defaults to the number of cores.
+        if not self._preferences.getValue('cura_blender/max_blender_processes'):
+            self._preferences.addPreference('cura_blender/max_blender_processes', os.cpu_count() or 1)
+        # Loads and sets the path of the trace file. Empty turns tracing off. The environment variable CURA_BLENDER_TRACE overrides it.
+        if not self._preferences.getValue('cura_blender/trace_path'):
+            self._preferences.addPreference('cura_blender/trace_path', '')
+        # Loads and sets the 'trace_profile' setting. Lets blender write cProfile statistics next to the trace file.
+        if not self._preferences.getValue('cura_blender/trace_profile'):
+            self._preferences.addPreference('cura_blender/trace_profile', False)
         # Loads and sets the path to blender.
         if not self._preferences.getValue('cura_blender/blender_path'):
             self._preferences.addPreference('cura_blender/blender_path', '')
@@ -214,17 +284,10 @@ class CuraBlender(Extension):
 
         # Only continues if correct path to blender is set.
         if verified_blender_path and not self._check_grouped():
+            scene_index = SceneIndex.get_instance()
             # If no object is selected, check if the objects belong to more than one file.
             if len(Selection.getAllSelectedObjects()) == 0:
-                open_files = set()
-                for node in DepthFirstIterator(Application.getInstance().getController().getScene().getRoot()):
-                    if isinstance(node, CuraSceneNode) and node.getMeshData().getFileName():
-                        if '_curasplit_' in node.getMeshData().getFileName():
-                            file_path = node.getMeshData().getFileName()
-                            file_path = '{}.blend'.format(file_path[:file_path.index('_curasplit_')])
-                        else:
-                            file_path = node.getMeshData().getFileName()
-                        open_files.add(file_path)
+                open_files = scene_index.get_sources()
                 # Opens the objects in blender, if they belong to only one file.
                 if len(open_files) == 1:
                     self._build_command_for_blender(open_files.pop())
@@ -235,21 +298,19 @@ class CuraBlender(Extension):
             # If one object is selected, opens it's file reference (file name).
             elif len(Selection.getAllSelectedObjects()) == 1:
                 for selection in Selection.getAllSelectedObjects():
-                    file_path = selection.getMeshData().getFileName()
-                    if '_curasplit_' in file_path:
-                        file_path = '{}.blend'.format(file_path[:file_path.index('_curasplit_')])
-                    self._build_command_for_blender(file_path)
+                    source = scene_index.get_source(selection)
+                    if source:
+                        self._build_command_for_blender(source[0])
             # If multiple objects are selected, checks if they belong to more than one file.
             else:
                 files = set()
                 for selection in Selection.getAllSelectedObjects():
-                    file_path = selection.getMeshData().getFileName()
-                    if '_curasplit_' in file_path:
-                        file_path = '{}.blend'.format(file_path[:file_path.index('_curasplit_')])
-                    files.add(file_path)
+                    source = scene_index.get_source(selection)
+                    if source:
+                        files.add(source[0])
                 # Opens the objects in blender, if they belong to only one file.
                 if len(files) == 1:
-                    self._build_command_for_blender(file_path)
+                    self._build_command_for_blender(files.pop())
                 else:
                     message = Message(text=catalog.i18nc('@info','Please rethink your selection.'),
                                       title=catalog.i18nc('@info:title', 'Select only objects from same file'))
@@ -276,18 +337,13 @@ class CuraBlender(Extension):
         # Procedure for non-blender files.
         elif current_file_extension in self._supported_foreign_extensions:
             execute_list = "bpy.data.objects.remove(bpy.data.objects['Cube']);"
-            if current_file_extension in ('stl', 'ply'):
-                execute_list = execute_list + "bpy.ops.import_mesh.{}(filepath = '{}');".format(current_file_extension, file_path)
-            elif current_file_extension in ('obj', 'x3d'):
-                execute_list = execute_list + "bpy.ops.import_scene.{}(filepath = '{}');".format(current_file_extension, file_path)
-            else:
-                pass
+            # Our BlenderAPI chooses the fastest importer of the installed blender version.
+            execute_list = execute_list + "import_file('{}');".format(file_path)
 
             export_file = '{}/{}_cura_temp.blend'.format(os.path.dirname(file_path), os.path.basename(file_path).rsplit('.', 1)[0]).replace('//', '/')
             execute_list = execute_list + "bpy.ops.wm.save_as_mainfile(filepath = '{}')".format(export_file)
 
-            command = '"{}" --background --python-expr "import bpy; import sys; exec(sys.argv[-1])" -- "{}"'.format(self._blender_path, execute_list)
-            subprocess.run(command, shell = True, check = False)
+            BlenderWorker.run_program('Execute', None, execute_list)
 
             command = '"{}" "{}"'.format(self._blender_path, export_file)
 
@@ -300,61 +356,105 @@ class CuraBlender(Extension):
 
 
     def _foreign_file_changed(self, path):
-        """On file changed connection. Rereads the changed file and updates it.
+        """On file changed connection. Queues the changed file for a reload after a quiet period.
 
-        This happens automatically and can be set on/off in the settings.
         Explicit for foreign file types (stl, obj, x3d, ply).
 
         :param path: The path to the changed foreign file.
         """
 
-        export_path = '{}.{}'.format(path[:-6], self._foreign_file_extension)
-        execute_list = "bpy.ops.export_mesh.{}(filepath = '{}', check_existing = False)".format(self._foreign_file_extension, export_path)
+        self._foreign_reload_queue.add(path)
 
-        command = '"{}" "{}" --background --python-expr "import bpy; import sys; exec(sys.argv[-1])" -- "{}"'.format(self._blender_path, path, execute_list)
-        subprocess.run(command, shell = True, check = False)
 
-        if self._preferences.getValue('cura_blender/live_reload') and os.path.isfile(export_path):
-            job = ReadMeshJob(export_path)
-            job.finished.connect(self._read_mesh_finished)
+    def _reload_foreign_file(self, path):
+        """Rereads the changed file and updates it. Gets called by the reload queue once saving has finished.
+
+        This happens automatically and can be set on/off in the settings.
+        Runs as chain of jobs (export, read, swap), so cura stays responsive while blender exports the file.
+
+        :param path: The path to the changed foreign file.
+        :return: The started export job or None.
+        """
+
+        job = None
+        if self._preferences.getValue('cura_blender/live_reload') and os.path.isfile(path):
+            message = Message(text=catalog.i18nc('@info', 'Reloading {}'.format(os.path.basename(path)[:-16])),
+                              title=catalog.i18nc('@info:title', 'Live Reload'), lifetime=0, dismissable=False, progress=-1)
+            message.show()
+            job = ForeignExportJob(path, self._foreign_file_extension)
+            self._reload_messages[job] = message
+            job.finished.connect(self._foreign_export_finished)
             job.start()
-            # Give process time while waiting for the job to finish.
-            while not job.isFinished():
-                job.yieldThread()
-            # Remove temporary export file. Original foreign file, was not overwritten and the node still got it's reference in case of an undo.
-            os.remove(export_path)
 
         if os.path.isfile(path + '1'):
             # Instead of overwriting files, blender saves the old one with .blend1 extension. We don't want this file at all, but need the original one for the file watcher.
             os.remove(path + '1')
 
         # Adds new filewatcher reference, because cura removes filewatcher automatically for other file types after reading.
-        self._foreign_file_watcher.addPath(path)
+        if path not in self._foreign_file_watcher.files() and os.path.isfile(path):
+            self._foreign_file_watcher.addPath(path)
+
+        return job
+
+
+    def _foreign_export_finished(self, job):
+        """On finished connection of the export job. Reads the exported file in the next job.
+
+        :param job: The finished export job.
+        """
+
+        message = self._reload_messages.pop(job, None)
+        export_path = job.getResult()
+
+        # A newer reload of the same file superseded this one or blender failed.
+        if not self._foreign_reload_queue.finish(job) or not export_path:
+            if message:
+                message.hide()
+            if export_path and os.path.isfile(export_path):
+                os.remove(export_path)
+            return
+
+        read_job = ReadMeshJob(export_path)
+        self._reload_messages[read_job] = message
+        read_job.finished.connect(self._read_mesh_finished)
+        read_job.start()
 
 
     def _file_changed(self, path):
-        """On file changed connection. Rereads the changed file and updates it.
+        """On file changed connection. Queues the changed file for a reload after a quiet period.
+
+        :param path: The path to the changed blender file.
+        """
+
+        self._reload_queue.add(path)
+
+
+    def _reload_file(self, path):
+        """Rereads the changed file and updates it. Gets called by the reload queue once saving has finished.
 
         This happens automatically and can be set on/off in the settings.
 
         :param path: The path to the changed blender file.
+        :return: The started reload job or None.
         """
 
+        job = None
         # Checks auto reload flag in settings file.
-        if self._preferences.getValue('cura_blender/live_reload'):
+        if self._preferences.getValue('cura_blender/live_reload') and os.path.isfile(path):
             job = ReadMeshJob(path)
             job.finished.connect(self._read_mesh_finished)
             job.start()
-        # Refreshes file in file watcher in case the auto reload flag gets changed during runtime.
-        else:
-            time.sleep(1)
-            fs_watcher.removePath(path)
+
+        # Refreshes file in file watcher, because blender replaces the file while saving. Also in case the auto reload flag gets changed during runtime.
+        if path not in fs_watcher.files() and os.path.isfile(path):
             fs_watcher.addPath(path)
 
         if os.path.isfile(path + '1'):
             # Instead of overwriting files, blender saves the old one with .blend1 extension. We don't want this file at all, but need the original one for the file watcher.
             os.remove(path + '1')
 
+        return job
+
 
     def _read_mesh_finished(self, job):
         """On file changed connection. Rereads the changed file and updates it.
@@ -364,52 +464,56 @@ class CuraBlender(Extension):
         :param path: The path to the changed file.
         """
 
-        job._nodes = []
-        temp_flag = False
-        # Gets all files from all objects on the build plate.
-        for node in DepthFirstIterator(Application.getInstance().getController().getScene().getRoot()):
-            if isinstance(node, CuraSceneNode) and node.getMeshData():
-                file_path = node.getMeshData().getFileName()
-                try:
-                    # Gets the original file name of _curasplit_ objects.
-                    if '_curasplit_' in file_path:
-                        file_path = '{}.blend'.format(file_path[:file_path.index('_curasplit_')])
-
-                    # Checks if foreign file gets reloaded.
-                    if '_cura_temp' in job.getFileName():
-                        temp_path = '{}/{}.{}'.format(os.path.dirname(job.getFileName()),                          \
-                                                    os.path.basename(job.getFileName()).rsplit('.', 1)[0][:-10], \
-                                                    os.path.basename(job.getFileName()).rsplit('.', 1)[-1]).replace('//', '/')
-                        if file_path == temp_path:
-                            job._nodes.append(node)
-                            temp_flag = True
+        # A newer reload of the same file superseded this one.
+        if not self._reload_queue.finish(job):
+            return
+
+        # Checks if foreign file gets reloaded. The reloaded nodes belong to the original foreign file.
+        temp_path = None
+        if '_cura_temp' in job.getFileName():
+            temp_path = '{}/{}.{}'.format(os.path.dirname(job.getFileName()),                          \
+                                        os.path.basename(job.getFileName()).rsplit('.', 1)[0][:-10], \
+                                        os.path.basename(job.getFileName()).rsplit('.', 1)[-1]).replace('//', '/')
+
+        with Tracing.span('Apply reload', file = job.getFileName()):
+            # Important for reloading blender files with multiple objects. Gets the correctly changed objects by their index.
+            scene_index = SceneIndex.get_instance()
+            changed_nodes = []
+            for node in job.getResult():
+                mesh_data = node.getMeshData()
+                if temp_path:
+                    # Sets the file name of the original foreign file.
+                    mesh_data = mesh_data.set(file_name=temp_path)
+                    key = (temp_path, 1)
+                else:
+                    key = get_source_key(mesh_data.getFileName())
+                if not key:
+                    Logger.log('e', 'Cannot find file path to object!')
+                    continue
+                for scene_node in scene_index.get_nodes(*key):
+                    # Unchanged objects keep their mesh data during a reload and don't need to be replaced.
+                    if mesh_data is scene_node.getMeshData():
+                        continue
+                    changed_nodes.append((scene_node, scene_node.getBoundingBox()))
+                    scene_node.setMeshData(mesh_data)
+
+            # Checks auto arrange flag in settings file.
+            if changed_nodes and self._preferences.getValue('cura_blender/auto_arrange_on_reload'):
+                with Tracing.span('Arrange', nodes = len(changed_nodes)):
+                    # Only places nodes again which grew or collide now. Can be set on/off in the settings.
+                    if self._preferences.getValue('cura_blender/incremental_arrange_on_reload'):
+                        Placement.place_changed_nodes(changed_nodes)
+                    # Arranges the complete build plate after reloading a file. Can be set on/off in the settings.
                     else:
-                        if file_path == job.getFileName():
-                            job._nodes.append(node)
-                except TypeError:
-                    Logger.logException('e', 'Cannot find file path to object!')
-
-        # Important for reloading blender files with multiple objects. Gets the correctly changed object by it's index.
-        job_result = job.getResult()
-        index = 0
-        dif = len(job_result) - len(job._nodes)
-        for number in range(dif):
-            job._nodes.insert(number, '')
-
-        for (node, job._node) in zip(job_result, job._nodes):
-            if index < dif:
-                index += 1
-                continue
-            mesh_data = node.getMeshData()
-            job._node.setMeshData(mesh_data)
-            # Checks if foreign file is reloaded and sets the correct file name.
-            if temp_flag:
-                mesh_data.set(file_name=temp_path)
-
-        # Checks auto arrange flag in settings file.
-        if self._preferences.getValue('cura_blender/auto_arrange_on_reload'):
-            # Arranges the complete build plate after reloading a file. Can be set on/off in the settings.
-            Application.getInstance().arrangeAll()
+                        Application.getInstance().arrangeAll()
+
+        # Finishes the reload of a foreign file.
+        message = self._reload_messages.pop(job, None)
+        if message:
+            message.hide()
+            # Remove temporary export file. Original foreign file, was not overwritten and the node still got it's reference in case of an undo.
+            if os.path.isfile(job.getFileName()):
+                os.remove(job.getFileName())
 
 
     @classmethod
@@ -438,14 +542,12 @@ class CuraBlender(Extension):
                 blender_path = Application.getInstance().getPreferences().getValue('cura_blender/blender_path')
                 # Checks if blender path is set and the path really exists.
                 if os.path.exists(blender_path):
-                    command = '"{}" --background --python-expr "import bpy; print(bpy.app.version >= (2, 80, 0))"'.format(blender_path)
-                    # Calls blender in the background and jumps to the exception if it's not blender and therefor returns false.
-                    # Also checks if the version of blender is compatible.
-                    version = subprocess.run(command, shell = True, universal_newlines = True, stdout = subprocess.PIPE, check = False)
-                    for nextline in version.stdout.splitlines():
-                        if nextline == 'True':
+                    # Checks if the version of blender is compatible. Blender only gets started if this binary wasn't probed before.
+                    capabilities = BlenderCapabilities.get_capabilities(blender_path)
+                    if capabilities:
+                        if capabilities['compatible']:
                             verified_blender_path = True
-                        elif nextline == 'False':
+                        else:
                             if not outdated_blender_version:
                                 outdated_blender_version = True
                                 Logger.logException('e', 'Your version of blender is outdated. Blender version 2.80 or higher is required!')
@@ -457,8 +559,6 @@ class CuraBlender(Extension):
                                                 button_style=Message.ActionButtonStyle.SECONDARY, button_align=Message.ActionButtonAlignment.ALIGN_RIGHT)
                                 message.actionTriggered.connect(cls._download_blender_trigger)
                                 message.show()
-                        else:
-                            pass
                 # Checks if path to blender is finally verified.
                 if manual and not verified_blender_path:
                     message = Message(text=catalog.i18nc('@info', 'Could not verify your path.'),
@@ -25,7 +25,7 @@ UM.Dialog
     width: minimumWidth
     minimumWidth: 350
     height: minimumHeight
-    minimumHeight: 250
+    minimumHeight: 450
 
     // Main component. Contains functions and smaller components like buttons and checkboxes.
     Item
@@ -81,6 +81,8 @@ UM.Dialog
         Button
         {
             id: stlButton
+            // Binary transfer ignores the import type, unless the automatic import type is chosen.
+            enabled: !binaryTransferCheckbox.checked || autoFileExtensionCheckbox.checked
 
             anchors.left: parent.left
             anchors.top: importTypeLabel.bottom
@@ -105,6 +107,8 @@ UM.Dialog
         Button
         {
             id: objButton
+            // Binary transfer ignores the import type, unless the automatic import type is chosen.
+            enabled: !binaryTransferCheckbox.checked || autoFileExtensionCheckbox.checked
 
             anchors.left: stlButton.right
             anchors.leftMargin: UM.Theme.getSize("default_margin").width
@@ -130,6 +134,8 @@ UM.Dialog
         Button
         {
             id: x3dButton
+            // Binary transfer ignores the import type, unless the automatic import type is chosen.
+            enabled: !binaryTransferCheckbox.checked || autoFileExtensionCheckbox.checked
 
             anchors.left: objButton.right
             anchors.leftMargin: UM.Theme.getSize("default_margin").width
@@ -155,6 +161,8 @@ UM.Dialog
         Button
         {
             id: plyButton
+            // Binary transfer ignores the import type, unless the automatic import type is chosen.
+            enabled: !binaryTransferCheckbox.checked || autoFileExtensionCheckbox.checked
 
             anchors.left: x3dButton.right
             anchors.leftMargin: UM.Theme.getSize("default_margin").width
@@ -297,6 +305,161 @@ UM.Dialog
             onClicked: UM.Preferences.setValue("cura_blender/warn_before_closing_other_blender_instances", checked)
         }
 
+        // Label for the maximum number of blender processes.
+        Label
+        {
+            id: maxBlenderProcessesLabel
+            anchors.left: parent.left
+            anchors.top: showCloseBlenderInstancesWarning.bottom
+            anchors.topMargin: UM.Theme.getSize("default_margin").width
+
+            // The text for this label.
+            text: catalog.i18nc("@label", "Blender processes at the same time:")
+
+            font: UM.Theme.getFont("default")
+            color: UM.Theme.getColor("text")
+        }
+
+        // Spinbox for the maximum number of blender processes. Conversions beyond this limit wait in a queue.
+        SpinBox
+        {
+            id: maxBlenderProcessesSpinBox
+            anchors.left: maxBlenderProcessesLabel.right
+            anchors.leftMargin: UM.Theme.getSize("default_margin").width
+            anchors.verticalCenter: maxBlenderProcessesLabel.verticalCenter
+
+            // At least one process, at most a reasonable number for workstations.
+            minimumValue: 1
+            maximumValue: 64
+
+            // Loads the entry state for the maximum number of blender processes.
+            value: UM.Preferences.getValue("cura_blender/max_blender_processes")
+
+            // Sets the new state for the maximum number of blender processes.
+            onEditingFinished: UM.Preferences.setValue("cura_blender/max_blender_processes", value)
+        }
+
+        // Checkbox for writing the meshes from cura.
+        Cura.CheckBoxWithTooltip
+        {
+            id: writeSceneMeshesCheckbox
+            anchors.left: parent.left
+            anchors.top: maxBlenderProcessesSpinBox.bottom
+            anchors.topMargin: UM.Theme.getSize("default_margin").width
+
+            // The text for this checkbox.
+            text: catalog.i18nc("@action:checkbox","Write meshes and placement from Cura")
+
+            // The tooltip for this checkbox.
+            tooltip: catalog.i18nc("@checkbox:description", "Writes the meshes as shown in cura instead of reimporting their source files.")
+
+            // Loads the entry state for write scene meshes attribute.
+            checked: UM.Preferences.getValue("cura_blender/write_scene_meshes")
+
+            // Sets the new state for write scene meshes attribute.
+            onClicked: UM.Preferences.setValue("cura_blender/write_scene_meshes", checked)
+        }
+
+        // Label for the triangle budget.
+        Label
+        {
+            id: triangleBudgetLabel
+            anchors.left: parent.left
+            anchors.top: writeSceneMeshesCheckbox.bottom
+            anchors.topMargin: UM.Theme.getSize("default_margin").width
+
+            // The text for this label.
+            text: catalog.i18nc("@label", "Triangle budget per import (0 = no limit):")
+
+            font: UM.Theme.getFont("default")
+            color: UM.Theme.getColor("text")
+        }
+
+        // Spinbox for the triangle budget. Larger objects get decimated by blender, the original file stays untouched.
+        SpinBox
+        {
+            id: triangleBudgetSpinBox
+            anchors.left: triangleBudgetLabel.right
+            anchors.leftMargin: UM.Theme.getSize("default_margin").width
+            anchors.verticalCenter: triangleBudgetLabel.verticalCenter
+
+            minimumValue: 0
+            maximumValue: 100000000
+            stepSize: 100000
+
+            // Loads the entry state for the triangle budget.
+            value: UM.Preferences.getValue("cura_blender/triangle_budget")
+
+            // Sets the new state for the triangle budget.
+            onEditingFinished: UM.Preferences.setValue("cura_blender/triangle_budget", value)
+        }
+
+        // Checkbox for progressive loading.
+        Cura.CheckBoxWithTooltip
+        {
+            id: progressiveLoadingCheckbox
+            anchors.left: parent.left
+            anchors.top: triangleBudgetSpinBox.bottom
+            anchors.topMargin: UM.Theme.getSize("default_margin").width
+
+            // The text for this checkbox.
+            text: catalog.i18nc("@action:checkbox","Show bounding boxes until blender is done")
+
+            // The tooltip for this checkbox.
+            tooltip: catalog.i18nc("@checkbox:description", "Files which need blender first appear as boxes and get replaced by their full meshes in the background.")
+
+            // Loads the entry state for progressive loading attribute.
+            checked: UM.Preferences.getValue("cura_blender/progressive_loading")
+
+            // Sets the new state for progressive loading attribute.
+            onClicked: UM.Preferences.setValue("cura_blender/progressive_loading", checked)
+        }
+
+        // Checkbox for automatic import type.
+        Cura.CheckBoxWithTooltip
+        {
+            id: autoFileExtensionCheckbox
+            anchors.left: parent.left
+            anchors.top: progressiveLoadingCheckbox.bottom
+            anchors.topMargin: UM.Theme.getSize("default_margin").width
+
+            // The text for this checkbox.
+            text: catalog.i18nc("@action:checkbox","Choose the fastest import type per object")
+
+            // The tooltip for this checkbox.
+            tooltip: catalog.i18nc("@checkbox:description", "Measures the conversion time of every import type and uses the fastest one which works for the size of the object. Starts with the selected import type.")
+
+            // Loads the entry state for automatic import type attribute.
+            checked: UM.Preferences.getValue("cura_blender/auto_file_extension")
+
+            // Sets the new state for automatic import type attribute.
+            onClicked: UM.Preferences.setValue("cura_blender/auto_file_extension", checked)
+        }
+
+        // Checkbox for binary transfer.
+        Cura.CheckBoxWithTooltip
+        {
+            id: binaryTransferCheckbox
+            anchors.left: parent.left
+            anchors.top: autoFileExtensionCheckbox.bottom
+            anchors.topMargin: UM.Theme.getSize("default_margin").width
+
+            // The automatic import type takes priority.
+            enabled: !autoFileExtensionCheckbox.checked
+
+            // The text for this checkbox.
+            text: catalog.i18nc("@action:checkbox","Transfer meshes as raw buffers")
+
+            // The tooltip for this checkbox.
+            tooltip: catalog.i18nc("@checkbox:description", "Skips the import type and transfers the meshes from blender as raw buffers, which is the fastest way. The selected import type is only used while this is off. The automatic import type takes priority over it.")
+
+            // Loads the entry state for binary transfer attribute.
+            checked: UM.Preferences.getValue("cura_blender/binary_transfer")
+
+            // Sets the new state for binary transfer attribute.
+            onClicked: UM.Preferences.setValue("cura_blender/binary_transfer", checked)
+        }
+
         // Help button.
         Cura.SecondaryButton
         {
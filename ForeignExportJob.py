@@ -0,0 +1,52 @@
+"""Job which exports a foreign file (stl, obj, x3d, ply) from its temporary .blend file in the background."""
+
+# Imports from the python standard library.
+import os
+
+# Imports from Uranium.
+from UM.Job import Job
+
+# Imports from own package.
+from CuraBlender import BlenderWorker
+
+
+class ForeignExportJob(Job):
+    """First step of a foreign file reload. The result is the path of the exported file or None if blender failed.
+
+    Reading the exported file and swapping the mesh data follows once the finished signal arrives.
+    """
+
+    def __init__(self, file_path, file_extension):
+        """The constructor.
+
+        :param file_path: The path of the temporary .blend file which was changed in blender.
+        :param file_extension: The file extension of the original foreign file.
+        """
+
+        super().__init__()
+        self._file_path = file_path
+        self._export_path = '{}.{}'.format(file_path[:-6], file_extension)
+        self._file_extension = file_extension
+
+
+    def getFileName(self):
+        """Gets the path of the changed file, like a ReadMeshJob does.
+
+        :return: The path of the temporary .blend file.
+        """
+
+        return self._file_path
+
+
+    def run(self):
+        """Exports the foreign file with blender. Runs inside the job queue, not on the main thread."""
+
+        # Our BlenderAPI chooses the fastest exporter of the installed blender version.
+        execute_list = "export_file('{}')".format(self._export_path)
+        try:
+            BlenderWorker.run_program('Execute', self._file_path, execute_list)
+        except BlenderWorker.CancelledError:
+            # A newer reload of the same file superseded this one.
+            pass
+
+        self.setResult(self._export_path if os.path.isfile(self._export_path) else None)
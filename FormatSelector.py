@@ -0,0 +1,164 @@
+"""Chooses the export format per object by measured conversion costs. Only uses the python standard library, so it works outside of cura too."""
+
+# Imports from the python standard library.
+import os
+import json
+import time
+import threading
+
+
+# The formats blender exports for us. Binary transfer isn't part of it, because it always wins.
+FORMATS = ('stl', 'obj', 'x3d', 'ply')
+# Objects get grouped by their number of vertices in steps of factor 4. The last group takes all bigger objects.
+BUCKET_COUNT = 16
+# Weight of a new measurement. Older measurements fade out, so the costs follow updates of blender and cura.
+SMOOTHING = 0.3
+# Seconds until a failed format gets tried again. Updates of blender or cura may have fixed it.
+FAILURE_EXPIRY = 7 * 24 * 3600
+# Prefix of the plan for our BlenderAPI instead of a single file extension. Must match the one used by the BlenderAPI.
+PLAN_PREFIX = 'auto:'
+
+
+def get_bucket(vertices):
+    """Gets the group of objects with a similar number of vertices.
+
+    :param vertices: The number of vertices of the object.
+    :return: The index of the group. Same calculation as inside our BlenderAPI.
+    """
+
+    return min(max(int(vertices), 0).bit_length() // 2, BUCKET_COUNT - 1)
+
+
+def is_failed(stats, now):
+    """Checks if a format still counts as failed for a group.
+
+    :param stats: The measurements of the format for the group.
+    :param now: The current time.
+    :return: The boolean value if the last failure didn't expire yet. Failures of older versions without time have expired.
+    """
+
+    failed = stats['failed']
+    return not isinstance(failed, bool) and failed is not None and now - failed < FAILURE_EXPIRY
+
+
+class FormatSelector:
+    """Keeps the time per vertex needed to export and read every format, separately for objects of different size.
+
+    Every format gets measured once per size before the fastest one is used. Formats which failed for a size are skipped for it,
+    until the failure expires.
+    """
+
+    def __init__(self, file_path):
+        """The constructor. Loads the measurements of earlier sessions.
+
+        :param file_path: The json file with the measurements.
+        """
+
+        self.file_path = file_path
+
+        self._lock = threading.Lock()
+        # Per format and group: The cost in seconds per vertex, the number of measurements and the time of the last failure.
+        self._stats = {}
+        try:
+            with open(file_path, 'r') as stats_file:
+                self._stats = json.load(stats_file)
+        except (OSError, ValueError):
+            pass
+
+
+    def choose(self, vertices, preferred, excluded = ()):
+        """Chooses the format for an object.
+
+        :param vertices: The number of vertices of the object. Unknown sizes use the first group.
+        :param preferred: The format selected by the user. Gets measured first.
+        :param excluded: Formats which already failed for this object.
+        :return: The format or None if all formats failed.
+        """
+
+        return self._choose_for_bucket(get_bucket(vertices or 0), preferred, excluded)
+
+
+    def build_plan(self, preferred):
+        """Builds the plan for our BlenderAPI, which chooses the format per object by its evaluated number of vertices.
+
+        :param preferred: The format selected by the user.
+        :return: The plan, e.g. 'auto:stl,stl,ply,...' with one format per group.
+        """
+
+        return PLAN_PREFIX + ','.join(self._choose_for_bucket(bucket, preferred) or preferred for bucket in range(BUCKET_COUNT))
+
+
+    def record(self, file_format, vertices, seconds):
+        """Records the time needed to export and read an object.
+
+        :param file_format: The format of the object.
+        :param vertices: The number of vertices of the object.
+        :param seconds: The time needed to export and read the object.
+        """
+
+        with self._lock:
+            stats = self._get_stats(file_format, get_bucket(vertices))
+            cost = seconds / max(vertices, 1)
+            stats['cost'] = cost if not stats['samples'] else stats['cost'] + SMOOTHING * (cost - stats['cost'])
+            stats['samples'] += 1
+            stats['failed'] = None
+
+
+    def record_failure(self, file_format, vertices):
+        """Records that an object couldn't be exported or read in a format.
+
+        :param file_format: The format of the object.
+        :param vertices: The number of vertices of the object.
+        """
+
+        with self._lock:
+            self._get_stats(file_format, get_bucket(vertices or 0))['failed'] = time.time()
+
+
+    def save(self):
+        """Saves the measurements atomically, so a crash never leaves a broken file behind."""
+
+        temp_path = '{}.{}'.format(self.file_path, os.getpid())
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok = True)
+                with open(temp_path, 'w') as stats_file:
+                    json.dump(self._stats, stats_file)
+                os.replace(temp_path, self.file_path)
+            except OSError:
+                pass
+
+
+    def _choose_for_bucket(self, bucket, preferred, excluded = ()):
+        """Chooses the format for a group of objects.
+
+        :param bucket: The index of the group.
+        :param preferred: The format selected by the user. Gets measured first.
+        :param excluded: Formats which must not be used.
+        :return: The format or None if all formats failed.
+        """
+
+        formats = [preferred] + [file_format for file_format in FORMATS if file_format != preferred]
+        with self._lock:
+            candidates = [(file_format, self._get_stats(file_format, bucket)) for file_format in formats if file_format not in excluded]
+            now = time.time()
+            candidates = [(file_format, stats) for (file_format, stats) in candidates if not is_failed(stats, now)]
+            if not candidates:
+                return None
+            # Every format gets measured once, before the fastest one is used.
+            for (file_format, stats) in candidates:
+                if not stats['samples']:
+                    return file_format
+            return min(candidates, key = lambda candidate: candidate[1]['cost'])[0]
+
+
+    def _get_stats(self, file_format, bucket):
+        """Gets the measurements of a format for a group. Needs the lock.
+
+        :param file_format: The format.
+        :param bucket: The index of the group.
+        :return: A dictionary with 'cost', 'samples' and 'failed'.
+        """
+
+        return self._stats.setdefault(file_format, {}).setdefault(str(bucket), {'cost': 0.0, 'samples': 0, 'failed': None})
+
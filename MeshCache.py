@@ -0,0 +1,260 @@
+"""Content-addressed cache for converted meshes. Only uses the python standard library, so it works outside of cura too."""
+
+# Imports from the python standard library.
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+
+class MeshCache:
+    """Keeps converted files keyed by the content of the source file, the file extension and the index of the object.
+
+    A hit skips blender entirely. The cache directory has a budget in bytes, least recently used entries get evicted first.
+    Hits only mark the index as changed. It gets saved together with the next change or by flush.
+    """
+
+    # Name of the file with all bookkeeping information inside the cache directory.
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_path, max_size):
+        """The constructor. Loads the index of an existing cache directory.
+
+        :param cache_path: The directory which contains all cached files.
+        :param max_size: The maximum size of all cached files in bytes.
+        """
+
+        self.cache_path = cache_path
+        self.max_size = max_size
+
+        self._lock = threading.RLock()
+        self._index_path = os.path.join(cache_path, self.INDEX_FILE)
+        self._index = {'files': {}, 'objects': {}, 'entries': {}, 'formats': {}}
+        self._dirty = False
+
+        os.makedirs(cache_path, exist_ok = True)
+        try:
+            with open(self._index_path, 'r') as index_file:
+                self._index.update(json.load(index_file))
+        except (OSError, ValueError):
+            pass
+
+
+    def get_file_key(self, file_path):
+        """Gets the key of a source file. Size, mtime and inode are a fast check before hashing the whole content.
+
+        :param file_path: The path of the source file.
+        :return: The hash of the content of the file.
+        """
+
+        stat = os.stat(file_path)
+        stat_key = '{}|{}|{}|{}'.format(os.path.realpath(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+        with self._lock:
+            if stat_key in self._index['files']:
+                return self._index['files'][stat_key]
+
+        content_hash = hashlib.sha256()
+        with open(file_path, 'rb') as source_file:
+            for chunk in iter(lambda: source_file.read(1 << 20), b''):
+                content_hash.update(chunk)
+        key = content_hash.hexdigest()
+
+        with self._lock:
+            # Forgets older versions of the same file.
+            prefix = stat_key.rsplit('|', 3)[0] + '|'
+            for old_key in [old_key for old_key in self._index['files'] if old_key.startswith(prefix)]:
+                del self._index['files'][old_key]
+            self._index['files'][stat_key] = key
+            self._save_index()
+        return key
+
+
+    def get_objects(self, key, file_extension):
+        """Gets the number of objects of a cached source file.
+
+        :param key: The key of the source file.
+        :param file_extension: The file extension of the converted files.
+        :return: The number of objects or None if not all of them are cached.
+        """
+
+        with self._lock:
+            objects = self._index['objects'].get('{}.{}'.format(key, file_extension))
+            if objects is None:
+                return None
+            for index in range(objects):
+                if not self._find_entry(key, file_extension, index + 1):
+                    return None
+            return objects
+
+
+    def set_objects(self, key, file_extension, objects):
+        """Sets the number of objects of a source file. Call this after all converted files were added.
+
+        :param key: The key of the source file.
+        :param file_extension: The file extension of the converted files.
+        :param objects: The number of objects contained in the source file.
+        """
+
+        with self._lock:
+            self._index['objects']['{}.{}'.format(key, file_extension)] = objects
+            self._save_index()
+
+
+    def get_path(self, key, file_extension, index):
+        """Gets the path of a cached converted file and marks it as recently used.
+
+        :param key: The key of the source file.
+        :param file_extension: The file extension of the converted file.
+        :param index: The index of the object inside the source file (starting at 1).
+        :return: The path of the cached file or None if not cached.
+        """
+
+        with self._lock:
+            name = self._find_entry(key, file_extension, index)
+            if not name:
+                return None
+            self._index['entries'][name]['used'] = time.time()
+            self._dirty = True
+        return os.path.join(self.cache_path, name)
+
+
+    def add(self, key, file_extension, index, temp_path, file_format = None):
+        """Moves a converted file into the cache. Evicts least recently used files if the budget is exceeded.
+
+        :param key: The key of the source file.
+        :param file_extension: The file extension of the converted file.
+        :param index: The index of the object inside the source file (starting at 1).
+        :param temp_path: The path of the converted file. The file gets moved.
+        :param file_format: The format of a file of mixed formats, e.g. 'stl' for the file extension 'auto'. None otherwise.
+        :return: The path of the cached file.
+        """
+
+        name = self._entry_name(key, file_extension, index, file_format)
+        cached_path = os.path.join(self.cache_path, name)
+        shutil.move(temp_path, cached_path)
+
+        with self._lock:
+            self._index['entries'][name] = {'size': os.path.getsize(cached_path), 'used': time.time()}
+            if file_format:
+                self._index['formats'][self._entry_name(key, file_extension, index)] = file_format
+            self._evict(keep = name)
+            self._save_index()
+        return cached_path
+
+
+    def remove(self, key, file_extension, index, file_format = None):
+        """Removes a cached file, e.g. because it couldn't be read.
+
+        :param key: The key of the source file.
+        :param file_extension: The file extension of the converted file.
+        :param index: The index of the object inside the source file (starting at 1).
+        :param file_format: The format of a file of mixed formats. None otherwise.
+        """
+
+        with self._lock:
+            self._remove_entry(self._entry_name(key, file_extension, index, file_format))
+            self._save_index()
+
+
+    def flush(self):
+        """Saves the index, if hits changed it since it was saved last. Call this once a read is done."""
+
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+
+    @staticmethod
+    def _entry_name(key, file_extension, index, file_format = None):
+        """Builds the file name of a cached file. Files of mixed formats carry their format as further extension.
+
+        :param key: The key of the source file.
+        :param file_extension: The file extension of the converted file.
+        :param index: The index of the object inside the source file.
+        :param file_format: The format of a file of mixed formats or None.
+        :return: The file name inside the cache directory.
+        """
+
+        name = '{}_{}.{}'.format(key, index, file_extension)
+        return '{}.{}'.format(name, file_format) if file_format else name
+
+
+    def _find_entry(self, key, file_extension, index):
+        """Finds a cached file. Files of mixed formats get found by the format stored for them, e.g. 'auto.stl' for 'auto'.
+
+        :param key: The key of the source file.
+        :param file_extension: The file extension of the converted file.
+        :param index: The index of the object inside the source file.
+        :return: The file name inside the cache directory or None if not cached.
+        """
+
+        name = self._entry_name(key, file_extension, index)
+        if self._has_entry(name):
+            return name
+        file_format = self._index['formats'].get(name)
+        if file_format and self._has_entry(self._entry_name(key, file_extension, index, file_format)):
+            return self._entry_name(key, file_extension, index, file_format)
+        return None
+
+
+    def _has_entry(self, name):
+        """Checks if a file is known and still exists in the cache directory.
+
+        :param name: The file name inside the cache directory.
+        :return: The boolean value if the file is cached.
+        """
+
+        if name not in self._index['entries']:
+            return False
+        if not os.path.isfile(os.path.join(self.cache_path, name)):
+            del self._index['entries'][name]
+            return False
+        return True
+
+
+    def _remove_entry(self, name):
+        """Removes a file from the cache directory and the index.
+
+        :param name: The file name inside the cache directory.
+        """
+
+        self._index['entries'].pop(name, None)
+        (base_name, file_format) = name.rsplit('.', 1)
+        if self._index['formats'].get(base_name) == file_format:
+            del self._index['formats'][base_name]
+        path = os.path.join(self.cache_path, name)
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+    def _evict(self, keep = None):
+        """Removes least recently used files until the cache fits into its budget.
+
+        :param keep: A file name which must not be removed.
+        """
+
+        entries = self._index['entries']
+        size = sum(entry['size'] for entry in entries.values())
+        for name in sorted(entries, key = lambda name: entries[name]['used']):
+            if size <= self.max_size:
+                break
+            if name == keep:
+                continue
+            size -= entries[name]['size']
+            self._remove_entry(name)
+
+
+    def _save_index(self):
+        """Saves the index atomically, so a crash never leaves a broken index behind."""
+
+        temp_path = '{}.{}'.format(self._index_path, os.getpid())
+        try:
+            with open(temp_path, 'w') as index_file:
+                json.dump(self._index, index_file)
+            os.replace(temp_path, self._index_path)
+            self._dirty = False
+        except OSError:
+            pass
@@ -0,0 +1,99 @@
+"""Incremental placement of reloaded nodes. Only moves nodes which grew or collide, everything else stays where it is."""
+
+# Imports from Uranium.
+from UM.Logger import Logger
+from UM.Application import Application
+
+
+def place_changed_nodes(changed_nodes):
+    """Places reloaded nodes again, if their footprint grew or if they now collide with other nodes.
+
+    Costs grow with the number of changed nodes, not with the number of nodes on the build plate.
+
+    :param changed_nodes: Tuples (node, bounding box before the reload) of all nodes with new mesh data.
+    :return: The nodes which got placed again.
+    """
+
+    scene_root = Application.getInstance().getController().getScene().getRoot()
+    top_level_nodes = [node for node in scene_root.getChildren() if _is_placeable(node)]
+
+    nodes_to_place = []
+    for (node, old_box) in changed_nodes:
+        # Nodes inside a group get placed together with their group.
+        while node.getParent() and node.getParent() is not scene_root:
+            node = node.getParent()
+        if node in nodes_to_place or not _is_placeable(node):
+            continue
+        if old_box is None or _footprint_grew(old_box, node.getBoundingBox()) or _collides(node, top_level_nodes):
+            nodes_to_place.append(node)
+
+    if nodes_to_place:
+        fixed_nodes = [node for node in top_level_nodes if node not in nodes_to_place]
+        _arrange(nodes_to_place, fixed_nodes)
+    return nodes_to_place
+
+
+def _is_placeable(node):
+    """Checks if a node takes up space on the build plate.
+
+    :param node: The node to check.
+    :return: The boolean value if the node is a printable object or a group.
+    """
+
+    return bool(node.callDecoration('isSliceable') or node.callDecoration('isGroup')) and node.getBoundingBox() is not None
+
+
+def _footprint_grew(old_box, new_box):
+    """Checks if the footprint on the build plate (X and Z in cura) got larger.
+
+    :param old_box: The bounding box before the reload.
+    :param new_box: The bounding box after the reload.
+    :return: The boolean value if the footprint grew in any direction.
+    """
+
+    return new_box.left < old_box.left or new_box.right > old_box.right or new_box.back < old_box.back or new_box.front > old_box.front
+
+
+def _collides(node, other_nodes):
+    """Checks if the footprint of a node overlaps with the footprint of any other node.
+
+    :param node: The node to check.
+    :param other_nodes: All other nodes on the build plate.
+    :return: The boolean value if the node collides.
+    """
+
+    box = node.getBoundingBox()
+    for other in other_nodes:
+        if other is node:
+            continue
+        other_box = other.getBoundingBox()
+        if box.left < other_box.right and other_box.left < box.right and box.back < other_box.front and other_box.back < box.front:
+            return True
+    return False
+
+
+def _arrange(nodes, fixed_nodes):
+    """Arranges the given nodes around the fixed ones with the arranger of cura. Falls back to arranging everything.
+
+    :param nodes: The nodes to place again.
+    :param fixed_nodes: The nodes which must not move.
+    """
+
+    build_volume = Application.getInstance().getBuildVolume()
+    try:
+        # Cura 5.5 and newer.
+        from cura.Arranging.Nest2DArrange import Nest2DArrange
+        Nest2DArrange(nodes, build_volume, fixed_nodes).arrange()
+        return
+    except ImportError:
+        pass
+    try:
+        # Cura 4.9 up to 5.4.
+        from cura.Arranging.Nest2DArrange import arrange
+        arrange(nodes, build_volume, fixed_nodes)
+        return
+    except ImportError:
+        pass
+    # Older versions of cura can only arrange the complete build plate.
+    Logger.log('d', 'Incremental placement not supported by this version of cura. Arranging the complete build plate.')
+    Application.getInstance().arrangeAll()
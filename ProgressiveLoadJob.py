@@ -0,0 +1,80 @@
+"""Job which converts a .blend file in the background, while proxies are already shown on the build plate."""
+
+# Imports from Uranium.
+from UM.Job import Job
+from UM.Signal import Signal
+
+# Imports from own package.
+from CuraBlender import Tracing
+
+
+class ProgressiveLoadJob(Job):
+    """Runs the full conversion of the reader. The result is a tuple (temporary path or status, nodes with full meshes).
+
+    Every object gets passed on as soon as blender exported it, so the reader swaps the mesh of its proxy right away.
+    The reader swaps the remaining proxies once the finished signal arrives on the main thread.
+    """
+
+    def __init__(self, reader, file_path, proxies):
+        """The constructor.
+
+        :param reader: The snapshot of the reader with the settings of the read. Used by this job only.
+        :param file_path: The path of the .blend file.
+        :param proxies: The proxy nodes shown until the conversion is done by the names of their objects.
+        """
+
+        super().__init__()
+        # Emitted with the job, the name of the object and the node with its full mesh. Arrives queued on the main thread.
+        self.objectLoaded = Signal()
+        self.proxies = proxies
+        self.reader = reader
+
+        # Only used on the main thread. Proxies which were on the build plate once and proxies which got their full mesh.
+        self.added_proxies = set()
+        self.swapped_proxies = set()
+        # Full meshes (or None for removing the proxy) of proxies, which the read didn't add to the scene yet.
+        self.waiting_nodes = {}
+        # True if the result waits for the read to add the proxies to the scene.
+        self.waiting_result = False
+
+        self._file_path = file_path
+        for proxy in proxies.values():
+            proxy.parentChanged.connect(self._proxy_parent_changed)
+
+
+    def getFileName(self):
+        """Gets the path of the converted file, like a ReadMeshJob does.
+
+        :return: The path of the .blend file.
+        """
+
+        return self._file_path
+
+
+    def run(self):
+        """Converts the file and reads all objects. Runs inside the job queue, not on the main thread."""
+
+        nodes = []
+        with Tracing.span('Read full meshes', file = self._file_path):
+            temp_path = self.reader.convert_in_background(self._file_path, nodes, self._object_loaded)
+        self.setResult((temp_path, nodes))
+
+
+    def _object_loaded(self, name, node):
+        """Passes an object on to the main thread. Called by the reader, while blender still exports the other objects.
+
+        :param name: The name of the object.
+        :param node: The node with the full mesh of the object.
+        """
+
+        self.objectLoaded.emit(self, name, node)
+
+
+    def _proxy_parent_changed(self, proxy):
+        """On parent changed connection of a proxy. Tells proxies removed by the user from proxies the read didn't add yet.
+
+        :param proxy: The proxy which got added to or removed from the scene.
+        """
+
+        if proxy.getParent() is not None:
+            self.added_proxies.add(proxy)
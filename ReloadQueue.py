@@ -0,0 +1,86 @@
+"""Debounces file change events, so bursts of saves lead to a single reload per file."""
+
+# Imports from Uranium.
+from UM.Logger import Logger
+from UM.Application import Application
+from UM.JobQueue import JobQueue
+
+# Imports from own package.
+from CuraBlender import BlenderWorker
+from CuraBlender.DeprecatedVersionCheck import DEPRECATED_VERSION
+
+# Imports from QT.
+if not DEPRECATED_VERSION:
+    from PyQt6.QtCore import QTimer
+else:
+    from PyQt5.QtCore import QTimer
+
+
+class ReloadQueue:
+    """Waits for a quiet period after the last change of a file before reloading it.
+
+    Blender saves by writing a temporary file, renaming it and rotating the .blend1 backup, which fires several events.
+    Every new event restarts the quiet period. A newer reload supersedes an older one of the same file: If the older job
+    didn't start yet, it gets removed from the job queue, otherwise its blender programs get cancelled and its result gets
+    discarded. Never blocks the main thread.
+    """
+
+    def __init__(self, reload):
+        """The constructor.
+
+        :param reload: Function which reloads a file after its quiet period. Gets the path and returns the started job or None.
+        """
+
+        self._reload = reload
+        self._timers = {}
+        self._jobs = {}
+
+
+    def add(self, path):
+        """Adds a change event of a file. Restarts the quiet period of this file.
+
+        :param path: The path of the changed file.
+        """
+
+        timer = self._timers.get(path)
+        if timer is None:
+            timer = QTimer()
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda: self._quiet_period_over(path))
+            self._timers[path] = timer
+        timer.start(int(Application.getInstance().getPreferences().getValue('cura_blender/reload_quiet_period')))
+
+
+    def finish(self, job):
+        """Marks a reload job as finished.
+
+        :param job: The finished job.
+        :return: The boolean value if the result of the job is still wanted. False if a newer reload superseded it.
+        """
+
+        path = job.getFileName()
+        if path in self._jobs and self._jobs[path] is not job:
+            Logger.log('d', 'Discarding outdated reload of %s', path)
+            return False
+        self._jobs.pop(path, None)
+        return True
+
+
+    def _quiet_period_over(self, path):
+        """Reloads the file after no further event arrived during the quiet period.
+
+        :param path: The path of the changed file.
+        """
+
+        self._timers.pop(path).deleteLater()
+
+        job = self._jobs.pop(path, None)
+        if job and not job.isFinished():
+            # Only removes jobs which didn't start yet. Running ones stop blender and their results get discarded by finish.
+            JobQueue.getInstance().remove(job)
+            BlenderWorker.cancel_programs(path)
+            Logger.log('d', 'Superseding running reload of %s', path)
+
+        job = self._reload(path)
+        if job:
+            self._jobs[path] = job
@@ -0,0 +1,192 @@
+"""Index from source files and object indices to the nodes on the build plate. Kept current by the signals of the scene."""
+
+# Imports from the python standard library.
+import threading
+
+# Imports from Uranium.
+from UM.Application import Application
+
+# Imports from Cura.
+from cura.Scene.CuraSceneNode import CuraSceneNode
+
+
+def get_source_key(file_name):
+    """Gets the source file and the index of the object inside it from the file name of a node.
+
+    :param file_name: The file name of the mesh data, e.g. 'path/file_curasplit_3.blend'.
+    :return: A tuple (source path, object index starting at 1) or None if the node belongs to no file.
+    """
+
+    if not file_name:
+        return None
+    if '_curasplit_' in file_name and file_name.endswith('.blend'):
+        split = file_name.rindex('_curasplit_')
+        try:
+            return ('{}.blend'.format(file_name[:split]), int(file_name[split + 11:-6]))
+        except ValueError:
+            return None
+    return (file_name, 1)
+
+
+class SceneIndex:
+    """Keeps the source key of every node, so lookups don't need to walk the scene and parse all file names.
+
+    Changed mesh data updates a single node, new nodes only get checked against the children of their parent.
+    Removed nodes get dropped on the next lookup. Reads in the background use it too, so all accesses hold the lock.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        """The constructor. Indexes the current scene once and follows its changes from then on."""
+
+        self._lock = threading.RLock()
+        self._scene_root = Application.getInstance().getController().getScene().getRoot()
+        # Source path -> object index -> nodes.
+        self._nodes = {}
+        # Node -> (file name, source key) as it was indexed.
+        self._keys = {}
+
+        self._index_children(self._scene_root, recursive = True)
+        Application.getInstance().getController().getScene().sceneChanged.connect(self._scene_changed)
+
+
+    @classmethod
+    def get_instance(cls):
+        """Gets the index shared by the reader, writer and main module. The main module creates it on the main thread.
+
+        :return: The shared index.
+        """
+
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = SceneIndex()
+            return cls._instance
+
+
+    def get_nodes(self, source_path, index = None):
+        """Gets all nodes of a source file on the build plate.
+
+        :param source_path: The path of the source file.
+        :param index: The index of the object inside the source file. All objects if none.
+        :return: The nodes ordered by their object index.
+        """
+
+        with self._lock:
+            objects = self._nodes.get(source_path, {})
+            indices = sorted(objects) if index is None else [index]
+            nodes = []
+            for object_index in indices:
+                for node in list(objects.get(object_index, ())):
+                    if self._is_current(node):
+                        nodes.append(node)
+            return nodes
+
+
+    def get_objects(self, source_path):
+        """Gets one node per object of a source file on the build plate.
+
+        :param source_path: The path of the source file.
+        :return: A dictionary with the object index as key and a node as value.
+        """
+
+        with self._lock:
+            objects = {}
+            for node in self.get_nodes(source_path):
+                objects.setdefault(self.get_source(node)[1], node)
+            return objects
+
+
+    def get_source(self, node):
+        """Gets the source file and the object index of a node.
+
+        :param node: The node on the build plate.
+        :return: A tuple (source path, object index) or None.
+        """
+
+        with self._lock:
+            self._index_node(node)
+            entry = self._keys.get(node)
+            return entry[1] if entry else None
+
+
+    def get_sources(self):
+        """Gets all source files with at least one node on the build plate.
+
+        :return: A set with the paths of all source files.
+        """
+
+        with self._lock:
+            return {source_path for source_path in list(self._nodes) if self.get_nodes(source_path)}
+
+
+    def _scene_changed(self, source):
+        """On scene changed connection. Updates the changed node or checks the children of a changed parent.
+
+        :param source: The node which changed.
+        """
+
+        with self._lock:
+            if isinstance(source, CuraSceneNode) and source.getMeshData():
+                self._index_node(source)
+            self._index_children(source)
+
+
+    def _index_children(self, parent, recursive = False):
+        """Indexes all children of a node, which aren't indexed yet. Needs the lock.
+
+        :param parent: The parent node.
+        :param recursive: If true, also indexes all descendants.
+        """
+
+        for child in parent.getChildren():
+            if child not in self._keys or recursive:
+                self._index_node(child)
+            if recursive or child.callDecoration('isGroup'):
+                self._index_children(child, recursive)
+
+
+    def _index_node(self, node):
+        """Indexes a single node. Only parses the file name if it changed since the last time. Needs the lock.
+
+        :param node: The node to index.
+        """
+
+        if not isinstance(node, CuraSceneNode) or not node.getMeshData():
+            return
+        file_name = node.getMeshData().getFileName()
+        entry = self._keys.get(node)
+        if entry and entry[0] == file_name:
+            return
+        if entry and entry[1]:
+            self._nodes.get(entry[1][0], {}).get(entry[1][1], set()).discard(node)
+
+        key = get_source_key(file_name)
+        self._keys[node] = (file_name, key)
+        if key:
+            self._nodes.setdefault(key[0], {}).setdefault(key[1], set()).add(node)
+
+
+    def _is_current(self, node):
+        """Checks if a node is still on the build plate and belongs to its indexed source. Drops it otherwise. Needs the lock.
+
+        :param node: The indexed node.
+        :return: The boolean value if the node is still valid.
+        """
+
+        parent = node
+        while parent is not None and parent is not self._scene_root:
+            parent = parent.getParent()
+        entry = self._keys.get(node)
+        if parent is not None and entry and node.getMeshData() and node.getMeshData().getFileName() == entry[0]:
+            return True
+
+        if entry:
+            del self._keys[node]
+            if entry[1]:
+                self._nodes.get(entry[1][0], {}).get(entry[1][1], set()).discard(node)
+        # The node is still on the build plate, but has a new file name.
+        if parent is not None:
+            self._index_node(node)
+        return False
@@ -0,0 +1,82 @@
+"""Scratch directory for the files blender converts for us. Only uses the python standard library, so it works outside of cura too."""
+
+# Imports from the python standard library.
+import os
+import glob
+import time
+import hashlib
+import tempfile
+import threading
+
+
+# RAM backed directory of most linux systems. Converted files never touch the disk or a slow network share there.
+SHARED_MEMORY_PATH = '/dev/shm'
+# Prefix of all scratch files. Followed by the process id, so files of crashed sessions can be told apart.
+FILE_PREFIX = 'cura_blender_'
+
+
+def get_directory(configured_path = None):
+    """Gets the scratch directory. Prefers the configured directory, then a RAM backed one, then the temp directory.
+
+    :param configured_path: The directory set by the user or None.
+    :return: The first usable directory with forward slashes.
+    """
+
+    candidates = [SHARED_MEMORY_PATH, tempfile.gettempdir()]
+    if configured_path:
+        candidates.insert(0, configured_path)
+        try:
+            os.makedirs(configured_path, exist_ok = True)
+        except OSError:
+            pass
+
+    for path in candidates:
+        if os.path.isdir(path) and os.access(path, os.W_OK | os.X_OK):
+            return path.replace('\\', '/')
+    return tempfile.gettempdir().replace('\\', '/')
+
+
+def build_prefix(directory, name):
+    """Builds the path prefix for the scratch files of a conversion. The same name always gets the same prefix.
+
+    The process and thread are part of it, so conversions of the same file running at the same time don't collide.
+
+    :param directory: The scratch directory.
+    :param name: What gets converted, e.g. the path of the original file.
+    :return: The path prefix. Files get named prefix_index.extension.
+    """
+
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size = 8).hexdigest()
+    return '{}/{}{}_{:x}_{}'.format(directory, FILE_PREFIX, os.getpid(), threading.get_ident(), digest)
+
+
+def remove_files(prefix):
+    """Removes all scratch files of a conversion, including the ones blender left behind after a failure.
+
+    :param prefix: The path prefix of the conversion.
+    """
+
+    for path in glob.glob(glob.escape(prefix) + '_*'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def remove_stale_files(directory, max_age = 3600):
+    """Removes scratch files of other sessions, which didn't get cleaned up, e.g. because cura crashed.
+
+    :param directory: The scratch directory.
+    :param max_age: Files of other processes younger than this number of seconds are kept. They may still be in use.
+    """
+
+    own_prefix = '{}{}_'.format(FILE_PREFIX, os.getpid())
+    now = time.time()
+    for path in glob.glob(os.path.join(glob.escape(directory), FILE_PREFIX + '*')):
+        if os.path.basename(path).startswith(own_prefix):
+            continue
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
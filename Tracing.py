@@ -0,0 +1,169 @@
+"""Trace spans for reading, reloading and writing. Merged with the timings reported by blender into one Chrome trace file.
+
+The file opens in chrome://tracing or ui.perfetto.dev. Tracing is off unless the preference or the environment variable
+names a trace file.
+"""
+
+# Imports from the python standard library.
+import os
+import json
+import time
+import threading
+import itertools
+import contextlib
+import collections
+
+# Imports from Uranium.
+from UM.Logger import Logger
+from UM.Application import Application
+
+
+# Environment variable with the path of the trace file. Overrides the preference, e.g. for a single session.
+TRACE_ENVIRONMENT = 'CURA_BLENDER_TRACE'
+# Environment variable which lets blender run its programs under cProfile, if set to 1.
+PROFILE_ENVIRONMENT = 'CURA_BLENDER_PROFILE'
+# Prefix of the line with the events reported by our BlenderAPI. Must match the one used by the BlenderAPI.
+TRACE_MESSAGE = 'Trace '
+# The oldest events get dropped beyond this number, so long sessions don't grow the file without limit.
+MAX_EVENTS = 200000
+# Seconds between the end of a span and writing the trace file. All spans ending in the meantime get written together.
+FLUSH_DELAY = 5.0
+
+_lock = threading.Lock()
+_events = collections.deque(maxlen = MAX_EVENTS)
+_process_names = {}
+_local = threading.local()
+_profile_counter = itertools.count(1)
+_flush_timer = None
+
+
+def get_trace_path():
+    """Gets the path of the trace file.
+
+    :return: The path or None if tracing is off.
+    """
+
+    trace_path = os.environ.get(TRACE_ENVIRONMENT)
+    if trace_path is None:
+        trace_path = Application.getInstance().getPreferences().getValue('cura_blender/trace_path')
+    return trace_path or None
+
+
+def get_profile_path():
+    """Gets a new path for the cProfile statistics of the next blender program.
+
+    :return: The path next to the trace file or None if blender shouldn't profile.
+    """
+
+    trace_path = get_trace_path()
+    if not trace_path:
+        return None
+    if os.environ.get(PROFILE_ENVIRONMENT) != '1' and not Application.getInstance().getPreferences().getValue('cura_blender/trace_profile'):
+        return None
+    return '{}.blender_{}_{}.prof'.format(os.path.splitext(trace_path)[0], os.getpid(), next(_profile_counter))
+
+
+@contextlib.contextmanager
+def span(name, **args):
+    """Records the time spent inside the block as trace event. Writes the trace file shortly after the outermost span ends.
+
+    :param name: The name of the span.
+    :param args: Further information shown with the span.
+    """
+
+    if not get_trace_path():
+        yield
+        return
+
+    depth = getattr(_local, 'depth', 0)
+    _local.depth = depth + 1
+    start = time.time_ns() // 1000
+    try:
+        yield
+    finally:
+        _local.depth = depth
+        _add_event({'name': name, 'cat': 'cura', 'ph': 'X', 'ts': start, 'dur': time.time_ns() // 1000 - start,
+                    'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args}, 'Cura')
+        if depth == 0:
+            _schedule_flush()
+
+
+def add_blender_events(output):
+    """Takes the trace events reported by our BlenderAPI out of its output. Blender uses the same clock, so they line up.
+
+    :param output: The output of a blender program.
+    :return: The output without the trace events.
+    """
+
+    if not output or TRACE_MESSAGE not in output:
+        return output
+
+    lines = []
+    for line in output.splitlines(keepends = True):
+        if line.startswith(TRACE_MESSAGE):
+            try:
+                events = json.loads(line[len(TRACE_MESSAGE):])
+            except ValueError:
+                Logger.logException('w', 'Could not read the trace events of blender!')
+                continue
+            for event in events:
+                _add_event(event, 'Blender')
+        else:
+            lines.append(line)
+    return ''.join(lines)
+
+
+def flush():
+    """Writes all events into the trace file. Replaces the file atomically, so it can be opened at any time.
+
+    Gets called after FLUSH_DELAY and once more when cura shuts down.
+    """
+
+    trace_path = get_trace_path()
+    if not trace_path:
+        return
+
+    with _lock:
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}}
+                  for (pid, name) in _process_names.items()]
+        events.extend(_events)
+    temp_path = '{}.{}_{}'.format(trace_path, os.getpid(), threading.get_ident())
+    try:
+        with open(temp_path, 'w') as trace_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
+        os.replace(temp_path, trace_path)
+    except OSError:
+        Logger.logException('w', 'Could not write the trace file %s', trace_path)
+
+
+def _schedule_flush():
+    """Writes the trace file after FLUSH_DELAY, unless this is already planned."""
+
+    global _flush_timer
+    with _lock:
+        if _flush_timer is not None:
+            return
+        _flush_timer = threading.Timer(FLUSH_DELAY, _flush_planned)
+        _flush_timer.daemon = True
+        _flush_timer.start()
+
+
+def _flush_planned():
+    """Writes the trace file planned by _schedule_flush. Runs in the thread of the timer."""
+
+    global _flush_timer
+    with _lock:
+        _flush_timer = None
+    flush()
+
+
+def _add_event(event, process_name):
+    """Adds an event. Names its process on the first event, so the processes are easy to tell apart.
+
+    :param event: The trace event.
+    :param process_name: The name of the process, which recorded the event.
+    """
+
+    with _lock:
+        _process_names.setdefault(event['pid'], '{} ({})'.format(process_name, event['pid']))
+        _events.append(event)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""Scriptable stand-in for the blender executable. Speaks the same command line and worker protocol as our BlenderAPI.
+
+Reads fake .blend files written by the benchmarks (json with a list of objects) and writes binary mesh files of the
+configured size. Configured by environment variables:
+
+    FAKE_BLENDER_STARTUP_DELAY   Seconds until a started process is ready (default 0.5).
+    FAKE_BLENDER_EXPORT_TIME     Seconds per exported object (default 0.02).
+    FAKE_BLENDER_TRIANGLES       Triangles per exported object, if the file doesn't set them (default 10000).
+    FAKE_BLENDER_MEMORY          Megabytes every process holds, like blender without a file (default 0).
+    FAKE_BLENDER_FAIL_RATE       Share of program calls which fail (default 0).
+    FAKE_BLENDER_FAIL_PROGRAMS   Programs which always fail, separated by commas.
+    FAKE_BLENDER_FAIL_MODE       'error' prints an error and exits with 1, 'crash' exits without any answer.
+    FAKE_BLENDER_LOG             File which gets a json line per started process, program call and exported object.
+"""
+
+# Imports from the python standard library.
+import os
+import io
+import re
+import sys
+import json
+import time
+import random
+import struct
+import hashlib
+import resource
+import contextlib
+
+# Imports from third party libraries.
+import numpy
+
+
+# Must match the ones used by the BlenderAPI.
+WORKER_MESSAGE = 'CURABLENDER_WORKER:'
+RAW_MAGIC = b'CBRAW001'
+RAW_HEADER = '<8sII'
+PLAN_PREFIX = 'auto:'
+
+VERSION = [4, 2, 0]
+
+
+class InjectedFailure(Exception):
+    """Raised for failures requested by the configuration."""
+
+
+def get_setting(name, default):
+    """Gets a setting from the environment.
+
+    :param name: The name of the setting without prefix.
+    :param default: The default value. Its type is used for the conversion.
+    :return: The value of the setting.
+    """
+
+    value = os.environ.get('FAKE_BLENDER_{}'.format(name))
+    return default if value is None or value == '' else type(default)(value)
+
+
+def log_event(event, **values):
+    """Appends an event to the log file, if one is configured.
+
+    :param event: The name of the event.
+    :param values: Further values of the event.
+    """
+
+    log_path = get_setting('LOG', '')
+    if log_path:
+        values.update({'event': event, 'pid': os.getpid(), 'time': time.time(),
+                       'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss})
+        with open(log_path, 'a') as log_file:
+            log_file.write(json.dumps(values) + '\n')
+
+
+def load_objects(file_path):
+    """Loads the objects of a fake .blend file.
+
+    :param file_path: The path of the file or None for the startup file.
+    :return: A list of dictionaries with 'name', 'revision' and optionally 'triangles'.
+    """
+
+    if not file_path:
+        return []
+    with open(file_path, 'r') as blend_file:
+        return json.load(blend_file)['objects']
+
+
+def get_fingerprint(obj):
+    """Gets a fingerprint, which changes with the revision of the object.
+
+    :param obj: The object of the fake file.
+    :return: The fingerprint.
+    """
+
+    return hashlib.blake2b(json.dumps(obj, sort_keys = True).encode('utf-8'), digest_size = 16).hexdigest()
+
+
+def export(obj, index, file_path):
+    """Writes an object after the configured export time.
+
+    :param obj: The object of the fake file.
+    :param index: The index of the object (starting at 1). Moves the objects apart.
+    :param file_path: The path of the exported file. Writes a binary mesh for .raw and .stl and padding for everything else.
+    :return: The number of vertices.
+    """
+
+    time.sleep(get_setting('EXPORT_TIME', 0.02))
+    triangles = int(obj.get('triangles', get_setting('TRIANGLES', 10000)))
+
+    # A strip of triangles inside a box of 20 mm.
+    vertex_count = triangles + 2
+    steps = numpy.arange(vertex_count, dtype = numpy.float32)
+    vertices = numpy.empty((vertex_count, 3), dtype = '<f4')
+    vertices[:, 0] = steps / vertex_count * 20 + index * 30
+    vertices[:, 1] = (steps % 2) * 20
+    vertices[:, 2] = (steps % 3) * 10
+    indices = numpy.empty((triangles, 3), dtype = '<u4')
+    indices[:, 0] = numpy.arange(triangles)
+    indices[:, 1] = indices[:, 0] + 1
+    indices[:, 2] = indices[:, 0] + 2
+
+    with open(file_path, 'wb') as export_file:
+        if file_path.endswith('.stl'):
+            stl_triangles = numpy.zeros(triangles, dtype = [('normal', '<f4', (3,)), ('vertices', '<f4', (3, 3)), ('attribute', '<u2')])
+            stl_triangles['vertices'] = vertices[indices]
+            export_file.write(bytes(80) + struct.pack('<I', triangles) + stl_triangles.tobytes())
+        else:
+            if file_path.endswith('.raw'):
+                export_file.write(struct.pack(RAW_HEADER, RAW_MAGIC, vertex_count, triangles))
+            export_file.write(vertices.tobytes())
+            export_file.write(indices.tobytes())
+    log_event('export', index = index)
+    return vertex_count
+
+
+def get_export_path(instruction):
+    """Gets the path of the exported file from an instruction of the reader.
+
+    :param instruction: The instruction, e.g. "export_raw(bpy.data.objects[0], 'path')".
+    :return: The path of the exported file.
+    """
+
+    return re.findall(r"'([^']+)'", instruction)[-1]
+
+
+def run_program(arguments, file_path):
+    """Runs the program given as last argument. Same order of arguments as our BlenderAPI.
+
+    :param arguments: All arguments for the program. The program is always the last one.
+    :param file_path: The path of the opened file or None.
+    """
+
+    program = arguments[-1]
+    fail_programs = [name for name in get_setting('FAIL_PROGRAMS', '').split(',') if name]
+    if program in fail_programs or random.random() < get_setting('FAIL_RATE', 0.0):
+        log_event('failure', program = program)
+        if get_setting('FAIL_MODE', 'error') == 'crash':
+            os._exit(1)
+        raise InjectedFailure('Injected failure of {}'.format(program))
+
+    objects = load_objects(file_path)
+    if program == 'Version':
+        print(True)
+    elif program == 'Capabilities':
+        print('Capabilities {}'.format(json.dumps({'version': VERSION, 'compatible': True})))
+    elif program == 'Count nodes':
+        print(len(objects))
+    elif program == 'Single node':
+        export(objects[0], 1, get_export_path(arguments[-2]))
+    elif program == 'Multiple nodes':
+        index = int(arguments[-3])
+        export(objects[index], index + 1, get_export_path(arguments[-4]))
+    elif program == 'All nodes':
+        (temp_prefix, file_extension) = (arguments[-5], arguments[-4])
+        known_fingerprints = set(filter(None, arguments[-3].split(';')))
+        print(len(objects))
+        for (index, obj) in enumerate(objects):
+            print('Object {}:{}'.format(index + 1, obj['name']))
+            fingerprint = '{}:{}'.format(index + 1, get_fingerprint(obj))
+            print('Fingerprint {}'.format(fingerprint))
+            if fingerprint not in known_fingerprints:
+                # Plans choose the format by the number of vertices, like the BlenderAPI does.
+                object_extension = file_extension
+                if file_extension.startswith(PLAN_PREFIX):
+                    plan = file_extension[len(PLAN_PREFIX):].split(',')
+                    vertices = int(obj.get('triangles', get_setting('TRIANGLES', 10000))) + 2
+                    object_extension = plan[min(vertices.bit_length() // 2, len(plan) - 1)]
+                start_time = time.perf_counter()
+                vertices = export(obj, index + 1, '{}_{}.{}'.format(temp_prefix, index + 1, object_extension))
+                print('Export {}:{}:{}:{:.6f}'.format(index + 1, object_extension, vertices, time.perf_counter() - start_time), flush = True)
+    elif program in ('Write', 'Write scene'):
+        if program == 'Write':
+            (output_path, sources) = (arguments[-4], [entry.split('*', 1)[1] for entry in arguments[-2].split(';') if entry])
+            object_count = sum(len(load_objects(source)) for source in sources)
+        else:
+            (output_path, scene_path) = (arguments[-3], arguments[-2])
+            with open(scene_path, 'rb') as scene_file:
+                object_count = struct.unpack('<8sII', scene_file.read(16))[2]
+            os.remove(scene_path)
+        time.sleep(get_setting('EXPORT_TIME', 0.02) * object_count)
+        with open(output_path, 'wb') as output_file:
+            output_file.write(b'BLENDER-v402' + bytes(1024 * object_count))
+    elif program == 'Execute':
+        pass
+    else:
+        raise ValueError('Unknown program {}'.format(program))
+    log_event('program', program = program)
+
+
+class StreamedOutput(io.StringIO):
+    """Sends every complete line as its own message, like the worker of our BlenderAPI does for streamed requests."""
+
+    def __init__(self):
+        super().__init__()
+        self._line = ''
+
+
+    def write(self, text):
+        lines = (self._line + text).split('\n')
+        self._line = lines.pop()
+        for line in lines:
+            sys.__stdout__.write('\n{}{}\n'.format(WORKER_MESSAGE, json.dumps({'line': line})))
+            sys.__stdout__.flush()
+        return super().write(text)
+
+
+def run_worker():
+    """Answers one request per line like the worker of our BlenderAPI."""
+
+    sys.stdout.write('\n{}{}\n'.format(WORKER_MESSAGE, json.dumps({'version': VERSION})))
+    sys.stdout.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        output = StreamedOutput() if request.get('stream') else io.StringIO()
+        success = True
+        try:
+            with contextlib.redirect_stdout(output):
+                run_program(request['arguments'], request['file_path'])
+        except Exception as error:
+            success = False
+            output.write(repr(error))
+        sys.stdout.write('\n{}{}\n'.format(WORKER_MESSAGE, json.dumps({'success': success, 'output': output.getvalue()})))
+        sys.stdout.flush()
+
+
+def main():
+    """Main program. Waits for the start up delay and runs a single program or the worker."""
+
+    # Holds the memory of an empty blender.
+    memory = bytearray(get_setting('MEMORY', 0) << 20)
+    memory[::4096] = b'\x01' * len(memory[::4096])
+    time.sleep(get_setting('STARTUP_DELAY', 0.5))
+    log_event('start', worker = sys.argv[-1] == 'Worker')
+
+    if sys.argv[-1] == 'Worker':
+        run_worker()
+        return 0
+
+    file_path = sys.argv[1] if sys.argv[1] != '--background' else None
+    try:
+        run_program(sys.argv, file_path)
+    except InjectedFailure as error:
+        print(error, file = sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
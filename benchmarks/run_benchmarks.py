@@ -0,0 +1,298 @@
+"""Offline benchmarks for importing, reloading and writing .blend files. Runs without cura and without blender.
+
+Usage: python3 benchmarks/run_benchmarks.py [--objects 1,9,25,81] [--modes process,worker] [--output results.json] ...
+
+The plugin runs on the stand-ins of Uranium, Cura and Qt and starts the fake blender instead of the real one.
+Every combination of object count and mode runs in its own python process, so singletons, caches and peak memory
+never leak from one run into the next. Reports wall time, blender processes, program calls, exported objects and peak memory per stage.
+"""
+
+# Imports from the python standard library.
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib.util
+import subprocess
+import tracemalloc
+
+
+BENCHMARK_PATH = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_PATH = os.path.dirname(BENCHMARK_PATH)
+FAKE_BLENDER = os.path.join(BENCHMARK_PATH, 'fake_blender.py')
+
+# The stages in the order they run. Each one builds on the scene left by the previous one.
+STAGES = ('import', 'import_cached', 'reload', 'write', 'write_scene')
+
+
+def write_blend_file(file_path, objects, revision = 0, changed = 0):
+    """Writes a fake .blend file for the fake blender.
+
+    :param file_path: The path of the file.
+    :param objects: The number of objects.
+    :param revision: The revision of the changed objects.
+    :param changed: The number of objects (from the first one) which get the revision. The others keep revision 0.
+    """
+
+    content = {'objects': [{'name': 'Object_{}'.format(index + 1), 'revision': revision if index < changed else 0}
+                           for index in range(objects)]}
+    with open(file_path, 'w') as blend_file:
+        json.dump(content, blend_file)
+
+
+class StageMeter:
+    """Measures a single stage: wall time, blender processes and calls from the log of the fake blender, peak memory."""
+
+    def __init__(self, log_path):
+        """The constructor.
+
+        :param log_path: The log file of the fake blender.
+        """
+
+        self._log_path = log_path
+        self._log_offset = 0
+        self._start_time = None
+        self._errors = 0
+
+
+    def start(self, logger):
+        """Starts measuring.
+
+        :param logger: The logger stand-in, which counts the logged errors.
+        """
+
+        self._log_offset = os.path.getsize(self._log_path) if os.path.isfile(self._log_path) else 0
+        self._errors = logger.counts['e']
+        tracemalloc.reset_peak()
+        self._start_time = time.perf_counter()
+
+
+    def stop(self, logger, success):
+        """Stops measuring.
+
+        :param logger: The logger stand-in, which counts the logged errors.
+        :param success: The boolean value if the stage finished in time.
+        :return: A dictionary with the measurements.
+        """
+
+        wall_time = time.perf_counter() - self._start_time
+        (_, plugin_peak) = tracemalloc.get_traced_memory()
+
+        events = []
+        if os.path.isfile(self._log_path):
+            with open(self._log_path, 'r') as log_file:
+                log_file.seek(self._log_offset)
+                events = [json.loads(line) for line in log_file if line.strip()]
+
+        return {'seconds': round(wall_time, 4),
+                'processes': sum(1 for event in events if event['event'] == 'start'),
+                'calls': sum(1 for event in events if event['event'] == 'program'),
+                'exports': sum(1 for event in events if event['event'] == 'export'),
+                'failures': sum(1 for event in events if event['event'] == 'failure'),
+                'errors': logger.counts['e'] - self._errors,
+                'blender_peak_mb': round(max([event['maxrss_kb'] for event in events] or [0]) / 1024, 1),
+                'plugin_peak_mb': round(plugin_peak / (1 << 20), 1),
+                'completed': success}
+
+
+def load_plugin(work_path):
+    """Installs the stand-ins and imports the plugin as package CuraBlender.
+
+    :param work_path: The directory for preferences, caches and capabilities.
+    :return: The stand-ins module and the plugin package.
+    """
+
+    sys.path.insert(0, BENCHMARK_PATH)
+    import standins
+    standins.install(PLUGIN_PATH, work_path)
+
+    spec = importlib.util.spec_from_file_location('CuraBlender', os.path.join(PLUGIN_PATH, '__init__.py'),
+                                                  submodule_search_locations = [PLUGIN_PATH])
+    plugin = importlib.util.module_from_spec(spec)
+    sys.modules['CuraBlender'] = plugin
+    spec.loader.exec_module(plugin)
+    return (standins, plugin)
+
+
+def run_single(objects, mode, timeout):
+    """Runs all stages for one object count and mode.
+
+    :param objects: The number of objects in the file.
+    :param mode: 'process' for a new blender per call or 'worker' for the long-lived blender worker.
+    :param timeout: Seconds to wait at most for a single stage.
+    :return: The measurements by stage.
+    """
+
+    work_path = tempfile.mkdtemp(prefix = 'cura_blender_benchmark_')
+    try:
+        (standins, plugin) = load_plugin(work_path)
+        application = standins.Application.getInstance()
+        extension = plugin.CuraBlender.CuraBlender()
+        reader = plugin.BLENDReader.BLENDReader()
+        writer = plugin.BLENDWriter.BLENDWriter()
+        application.getMeshFileHandler().readers['.blend'] = reader
+
+        preferences = application.getPreferences()
+        preferences.setValue('cura_blender/blender_path', FAKE_BLENDER)
+        preferences.setValue('cura_blender/use_blender_worker', mode == 'worker')
+        preferences.setValue('cura_blender/cache_path', os.path.join(work_path, 'cache'))
+        preferences.setValue('cura_blender/progressive_loading', False)
+        preferences.setValue('cura_blender/show_scale_message', False)
+        preferences.setValue('cura_blender/reload_quiet_period', 1)
+
+        log_path = os.environ.setdefault('FAKE_BLENDER_LOG', os.path.join(work_path, 'fake_blender.log'))
+        meter = StageMeter(log_path)
+        file_path = os.path.join(work_path, 'model.blend')
+        copy_path = os.path.join(work_path, 'model_copy.blend')
+        write_blend_file(file_path, objects)
+        shutil.copyfile(file_path, copy_path)
+        scene_root = application.getController().getScene().getRoot()
+
+        # Probes the fake blender once, like cura does on its first start.
+        plugin.CuraBlender.CuraBlender.verify_blender_path(manual = False)
+
+        def read(path):
+            """Reads a file like cura: Inside a read job, the nodes get added on the main thread."""
+
+            added = []
+            def add_nodes(job):
+                for node in job.getResult() or []:
+                    node.setParent(scene_root)
+                added.append(job)
+
+            job = standins.ReadMeshJob(path)
+            job.finished.connect(add_nodes)
+            job.start()
+            # A read which loads fewer objects than the file has failed, even if it finished in time.
+            return standins.loop.run_until(lambda: added, timeout) and len(job.getResult() or []) == objects
+
+        def write(path):
+            """Writes the scene like cura: The stream gets closed right after the writer returned."""
+
+            with open(path, 'wb') as stream:
+                writer.write(stream, [scene_root])
+            return standins.loop.run_until(lambda: not writer._write_jobs, timeout)
+
+        def reload():
+            """Changes the first object and reports the change like the file watcher."""
+
+            write_blend_file(file_path, objects, revision = 1, changed = 1)
+            extension._file_changed(file_path)
+            queue = extension._reload_queue
+            return standins.loop.run_until(lambda: not queue._timers and not queue._jobs, timeout)
+
+        def import_cached():
+            """Reads a copy of the file with the same content. Hits the cache and removes the nodes afterwards."""
+
+            nodes_before = set(scene_root.getChildren())
+            success = read(copy_path)
+            for node in set(scene_root.getChildren()) - nodes_before:
+                node.setParent(None)
+            return success
+
+        def write_scene(path):
+            preferences.setValue('cura_blender/write_scene_meshes', True)
+            return write(path)
+
+        stages = {'import': lambda: read(file_path),
+                  'import_cached': import_cached,
+                  'reload': reload,
+                  'write': lambda: write(os.path.join(work_path, 'output.blend')),
+                  'write_scene': lambda: write_scene(os.path.join(work_path, 'output_scene.blend'))}
+
+        tracemalloc.start()
+        results = {}
+        for stage in STAGES:
+            meter.start(standins.Logger)
+            success = stages[stage]()
+            results[stage] = meter.stop(standins.Logger, success)
+        tracemalloc.stop()
+
+        plugin.BlenderWorker.BlenderWorker.shutdown_all()
+        return results
+    finally:
+        shutil.rmtree(work_path, ignore_errors = True)
+
+
+def parse_arguments(arguments = None):
+    """Parses the command line.
+
+    :param arguments: The arguments to parse. Uses sys.argv if none.
+    :return: The parsed arguments.
+    """
+
+    parser = argparse.ArgumentParser(description = 'Offline benchmarks for the CuraBlender plugin with a fake blender.')
+    parser.add_argument('--objects', default = '1,9,25,81', help = 'Object counts of the benchmark files (default: 1,9,25,81).')
+    parser.add_argument('--modes', default = 'process,worker', help = 'Modes to run: process and/or worker (default: both).')
+    parser.add_argument('--startup-delay', type = float, default = 0.5, help = 'Seconds until the fake blender is ready (default: 0.5).')
+    parser.add_argument('--export-time', type = float, default = 0.02, help = 'Seconds per exported object (default: 0.02).')
+    parser.add_argument('--triangles', type = int, default = 10001,
+                        help = 'Triangles per exported object (default: 10001, so the vertices are no whole number of triangles).')
+    parser.add_argument('--memory', type = int, default = 0, help = 'Megabytes every fake blender holds (default: 0).')
+    parser.add_argument('--fail-rate', type = float, default = 0.0, help = 'Share of blender calls which fail (default: 0).')
+    parser.add_argument('--fail-programs', default = '', help = 'Programs which always fail, separated by commas.')
+    parser.add_argument('--fail-mode', default = 'error', choices = ('error', 'crash'), help = 'How injected failures end (default: error).')
+    parser.add_argument('--timeout', type = float, default = 600, help = 'Seconds to wait at most for a single stage (default: 600).')
+    parser.add_argument('--output', help = 'Path of a json file for the results, e.g. as regression baseline.')
+    parser.add_argument('--single', type = int, help = argparse.SUPPRESS)
+    parser.add_argument('--mode', help = argparse.SUPPRESS)
+    return parser.parse_args(arguments)
+
+
+def main(arguments = None):
+    """Main program. Runs every combination of object count and mode in its own process and prints a table.
+
+    :param arguments: The command line arguments. Uses sys.argv if none.
+    :return: The exit code. 1 if any stage didn't complete.
+    """
+
+    arguments = parse_arguments(arguments)
+    if arguments.single is not None:
+        print(json.dumps(run_single(arguments.single, arguments.mode, arguments.timeout)))
+        return 0
+
+    environment = dict(os.environ)
+    environment.update({'FAKE_BLENDER_STARTUP_DELAY': str(arguments.startup_delay),
+                        'FAKE_BLENDER_EXPORT_TIME': str(arguments.export_time),
+                        'FAKE_BLENDER_TRIANGLES': str(arguments.triangles),
+                        'FAKE_BLENDER_MEMORY': str(arguments.memory),
+                        'FAKE_BLENDER_FAIL_RATE': str(arguments.fail_rate),
+                        'FAKE_BLENDER_FAIL_PROGRAMS': arguments.fail_programs,
+                        'FAKE_BLENDER_FAIL_MODE': arguments.fail_mode})
+    environment.pop('FAKE_BLENDER_LOG', None)
+    os.chmod(FAKE_BLENDER, os.stat(FAKE_BLENDER).st_mode | 0o111)
+
+    runs = []
+    print('{:>7}  {:7}  {:13}  {:>8}  {:>9}  {:>5}  {:>7}  {:>8}  {:>10}  {:>10}'.format(
+        'objects', 'mode', 'stage', 'seconds', 'processes', 'calls', 'exports', 'failures', 'blender MB', 'plugin MB'))
+    for objects in [int(count) for count in arguments.objects.split(',')]:
+        for mode in [mode for mode in arguments.modes.split(',') if mode]:
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), '--single', str(objects), '--mode', mode,
+                                      '--timeout', str(arguments.timeout)],
+                                     stdout = subprocess.PIPE, env = environment, universal_newlines = True)
+            try:
+                stages = json.loads(process.stdout.strip().splitlines()[-1])
+            except (IndexError, ValueError):
+                print('{:>7}  {:7}  failed with exit code {}'.format(objects, mode, process.returncode))
+                runs.append({'objects': objects, 'mode': mode, 'stages': None})
+                continue
+            runs.append({'objects': objects, 'mode': mode, 'stages': stages})
+            for (stage, result) in stages.items():
+                print('{:>7}  {:7}  {:13}  {:>8.3f}  {:>9}  {:>5}  {:>7}  {:>8}  {:>10.1f}  {:>10.1f}{}'.format(
+                    objects, mode, stage, result['seconds'], result['processes'], result['calls'], result['exports'], result['failures'],
+                    result['blender_peak_mb'], result['plugin_peak_mb'], '' if result['completed'] else '  (incomplete)'))
+
+    if arguments.output:
+        settings = {name: value for (name, value) in vars(arguments).items() if name not in ('single', 'mode', 'output')}
+        with open(arguments.output, 'w') as output_file:
+            json.dump({'settings': settings, 'runs': runs}, output_file, indent = 4)
+
+    completed = all(run['stages'] and all(result['completed'] for result in run['stages'].values()) for run in runs)
+    return 0 if completed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
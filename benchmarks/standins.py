@@ -0,0 +1,764 @@
+"""Minimal stand-ins for the parts of Uranium, Cura and Qt the plugin uses. Only good enough for the benchmarks.
+
+Jobs run on a thread pool like in Uranium. Signals emitted on other threads and timers get delivered by a small event
+loop on the main thread, so the plugin sees the same threading as inside cura.
+"""
+
+# Imports from the python standard library.
+import os
+import sys
+import time
+import heapq
+import types
+import itertools
+import threading
+import collections
+
+# Imports from third party libraries.
+import numpy
+
+
+class EventLoop:
+    """Delivers queued calls on the main thread. Replaces the event loop of Qt."""
+
+    def __init__(self):
+        """The constructor."""
+
+        self._lock = threading.Lock()
+        self._calls = []
+        self._counter = itertools.count()
+        self.main_thread = threading.current_thread()
+
+
+    def call_later(self, delay, function, *arguments):
+        """Queues a call.
+
+        :param delay: Seconds to wait before the call.
+        :param function: The function to call on the main thread.
+        :param arguments: The arguments for the function.
+        :return: A handle to cancel the call.
+        """
+
+        handle = [time.monotonic() + delay, next(self._counter), function, arguments, False]
+        with self._lock:
+            heapq.heappush(self._calls, handle)
+        return handle
+
+
+    def run_until(self, condition, timeout = 600):
+        """Delivers queued calls until the condition is true.
+
+        :param condition: Function without arguments, which returns true once the work is done.
+        :param timeout: Seconds to wait at most.
+        :return: The boolean value if the condition got true in time.
+        """
+
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            with self._lock:
+                handle = self._calls[0] if self._calls and self._calls[0][0] <= time.monotonic() else None
+                if handle:
+                    heapq.heappop(self._calls)
+            if handle is None:
+                time.sleep(0.001)
+            elif not handle[4]:
+                handle[2](*handle[3])
+        return True
+
+
+loop = EventLoop()
+
+
+class Signal:
+    """Like the signals of Uranium: Direct call on the main thread, queued call from all other threads."""
+
+    def __init__(self):
+        """The constructor."""
+
+        self._slots = []
+
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+
+    def disconnect(self, slot):
+        if slot in self._slots:
+            self._slots.remove(slot)
+
+
+    def emit(self, *arguments):
+        if threading.current_thread() is loop.main_thread:
+            for slot in list(self._slots):
+                slot(*arguments)
+        else:
+            loop.call_later(0, self.emit, *arguments)
+
+
+class Preferences:
+    """Preferences kept in memory."""
+
+    def __init__(self):
+        self._values = {}
+
+
+    def addPreference(self, key, default_value):
+        self._values.setdefault(key, default_value)
+
+
+    def getValue(self, key):
+        return self._values.get(key)
+
+
+    def setValue(self, key, value):
+        self._values[key] = value
+
+
+class AxisAlignedBox:
+    """Bounding box with the properties used by the plugin."""
+
+    def __init__(self, minimum, maximum):
+        (self.left, self.bottom, self.back) = (float(value) for value in minimum)
+        (self.right, self.top, self.front) = (float(value) for value in maximum)
+        self.width = self.right - self.left
+        self.height = self.top - self.bottom
+        self.depth = self.front - self.back
+
+
+class MeshData:
+    """Immutable mesh data like the one of Uranium."""
+
+    def __init__(self, vertices, indices, file_name):
+        self._vertices = vertices
+        self._indices = indices
+        self._file_name = file_name
+
+
+    def getVertices(self):
+        return self._vertices
+
+
+    def getIndices(self):
+        return self._indices
+
+
+    def getFileName(self):
+        return self._file_name
+
+
+    def set(self, file_name):
+        return MeshData(self._vertices, self._indices, file_name)
+
+
+class MeshBuilder:
+    """Builds mesh data from vertex and index buffers."""
+
+    def __init__(self):
+        self._vertices = None
+        self._indices = None
+        self._file_name = None
+
+
+    def setVertices(self, vertices):
+        self._vertices = vertices
+
+
+    def setIndices(self, indices):
+        self._indices = indices
+
+
+    def setFileName(self, file_name):
+        self._file_name = file_name
+
+
+    def calculateNormals(self, fast = False):
+        # Same as in Uranium: The fast calculation ignores the indices and fails if the vertices aren't whole triangles.
+        if fast or self._indices is None:
+            triangles = self._vertices.reshape(-1, 3, 3)
+        else:
+            triangles = self._vertices[self._indices]
+        numpy.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+
+
+    def build(self):
+        return MeshData(self._vertices, self._indices, self._file_name)
+
+
+class Vector:
+    def __init__(self, x = 0, y = 0, z = 0):
+        (self.x, self.y, self.z) = (x, y, z)
+
+
+class Matrix:
+    def __init__(self, data):
+        self._data = data
+
+
+    def getData(self):
+        return self._data
+
+
+class SceneNode:
+    """Scene node with mesh data, scale and children. Reports changes to the scene like Uranium."""
+
+    def __init__(self, parent = None, name = ''):
+        self.parentChanged = Signal()
+        self._parent = None
+        self._children = []
+        self._mesh_data = None
+        self._scale = 1.0
+        self._name = name
+        if parent:
+            self.setParent(parent)
+
+
+    def getName(self):
+        return self._name
+
+
+    def getParent(self):
+        return self._parent
+
+
+    def setParent(self, parent):
+        if self._parent:
+            self._parent._children.remove(self)
+        old_parent = self._parent
+        self._parent = parent
+        if parent:
+            parent._children.append(self)
+        self.parentChanged.emit(self)
+        Application.getInstance().getController().getScene().sceneChanged.emit(parent or old_parent)
+
+
+    def getChildren(self):
+        return list(self._children)
+
+
+    def getAllChildren(self):
+        children = []
+        for child in self._children:
+            children.append(child)
+            children.extend(child.getAllChildren())
+        return children
+
+
+    def getMeshData(self):
+        return self._mesh_data
+
+
+    def setMeshData(self, mesh_data):
+        self._mesh_data = mesh_data
+        if self._parent:
+            Application.getInstance().getController().getScene().sceneChanged.emit(self)
+
+
+    def scale(self, scale):
+        self._scale *= scale.x
+
+
+    def getScale(self):
+        return Vector(self._scale, self._scale, self._scale)
+
+
+    def setScale(self, scale):
+        self._scale = scale.x
+
+
+    def callDecoration(self, name):
+        return {'isSliceable': self._mesh_data is not None, 'isGroup': False}.get(name)
+
+
+    def getBoundingBox(self):
+        if self._mesh_data is None or not len(self._mesh_data.getVertices()):
+            return None
+        vertices = self._mesh_data.getVertices()
+        return AxisAlignedBox(vertices.min(axis = 0) * self._scale, vertices.max(axis = 0) * self._scale)
+
+
+    def getWorldTransformation(self):
+        return Matrix(numpy.diag([self._scale, self._scale, self._scale, 1.0]))
+
+
+class Scene:
+    """Scene with the root node, the change signal and the watched files of cura."""
+
+    def __init__(self):
+        self.sceneChanged = Signal()
+        self._root = None
+
+
+    def getRoot(self):
+        if self._root is None:
+            self._root = SceneNode(name = 'Root')
+        return self._root
+
+
+    def removeWatchedFile(self, file_path):
+        pass
+
+
+class BuildVolume:
+    def getBoundingBox(self):
+        return AxisAlignedBox((-150, 0, -150), (150, 300, 150))
+
+
+class Controller:
+    def __init__(self):
+        self._scene = Scene()
+
+
+    def getScene(self):
+        return self._scene
+
+
+class MeshFileHandler:
+    """Hands out the readers for files. Only knows the reader of the plugin."""
+
+    def __init__(self):
+        self.readers = {}
+
+
+    def getReaderForFile(self, file_name):
+        return self.readers.get(os.path.splitext(file_name)[1].lower())
+
+
+class Application:
+    """The application singleton with everything the plugin asks it for."""
+
+    _instance = None
+
+    def __init__(self):
+        self._preferences = Preferences()
+        self._controller = Controller()
+        self._build_volume = BuildVolume()
+        self._mesh_file_handler = MeshFileHandler()
+        self.applicationShuttingDown = Signal()
+        self.arrange_calls = 0
+
+
+    @classmethod
+    def getInstance(cls):
+        if cls._instance is None:
+            cls._instance = Application()
+        return cls._instance
+
+
+    def getAPIVersion(self):
+        return Version('8.0.0')
+
+
+    def getPreferences(self):
+        return self._preferences
+
+
+    def getController(self):
+        return self._controller
+
+
+    def getBuildVolume(self):
+        return self._build_volume
+
+
+    def getMeshFileHandler(self):
+        return self._mesh_file_handler
+
+
+    def arrangeAll(self):
+        self.arrange_calls += 1
+
+
+    def createQmlComponent(self, path, context):
+        return types.SimpleNamespace(show = lambda: None)
+
+
+class Version:
+    def __init__(self, version):
+        self._version = tuple(int(part) for part in str(version).split('.'))
+
+
+    def __lt__(self, other):
+        return self._version < other._version
+
+
+class Logger:
+    """Counts the logged errors instead of printing them."""
+
+    counts = collections.Counter()
+
+    @classmethod
+    def log(cls, level, message, *arguments):
+        cls.counts[level] += 1
+
+
+    @classmethod
+    def logException(cls, level, message, *arguments):
+        cls.counts[level] += 1
+
+
+class Message:
+    """Counts the shown messages by their title."""
+
+    shown = collections.Counter()
+
+    class ActionButtonAlignment:
+        ALIGN_LEFT = 0
+        ALIGN_RIGHT = 1
+
+    class ActionButtonStyle:
+        DEFAULT = 0
+        SECONDARY = 1
+
+    def __init__(self, text = '', title = '', **kwargs):
+        self.text = text
+        self.title = title
+        self.actionTriggered = Signal()
+
+
+    def addAction(self, *arguments, **kwargs):
+        pass
+
+
+    def show(self):
+        Message.shown[self.title] += 1
+
+
+    def hide(self):
+        pass
+
+
+class Job:
+    """A job which runs on the thread pool of the job queue."""
+
+    def __init__(self):
+        self.finished = Signal()
+        self._result = None
+        self._finished = False
+
+
+    def run(self):
+        pass
+
+
+    def start(self):
+        JobQueue.getInstance().add(self)
+
+
+    def setResult(self, result):
+        self._result = result
+
+
+    def getResult(self):
+        return self._result
+
+
+    def isFinished(self):
+        return self._finished
+
+
+    def _run_and_finish(self):
+        try:
+            self.run()
+        except Exception:
+            Logger.logException('e', 'Job failed')
+        self._finished = True
+        self.finished.emit(self)
+
+
+class JobQueue:
+    """Runs jobs in order on a few threads like Uranium."""
+
+    _instance = None
+
+    def __init__(self, thread_count = max(1, (os.cpu_count() or 2) - 1)):
+        self._condition = threading.Condition()
+        self._jobs = collections.deque()
+        for _ in range(thread_count):
+            threading.Thread(target = self._work, daemon = True).start()
+
+
+    @classmethod
+    def getInstance(cls):
+        if cls._instance is None:
+            cls._instance = JobQueue()
+        return cls._instance
+
+
+    def add(self, job):
+        with self._condition:
+            self._jobs.append(job)
+            self._condition.notify()
+
+
+    def remove(self, job):
+        with self._condition:
+            if job in self._jobs:
+                self._jobs.remove(job)
+
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._jobs:
+                    self._condition.wait()
+                job = self._jobs.popleft()
+            job._run_and_finish()
+
+
+class ReadMeshJob(Job):
+    """Reads a file with the reader for its extension. The result is the list of read nodes."""
+
+    def __init__(self, file_name):
+        super().__init__()
+        self._file_name = file_name
+
+
+    def getFileName(self):
+        return self._file_name
+
+
+    def run(self):
+        reader = Application.getInstance().getMeshFileHandler().getReaderForFile(self._file_name)
+        self.setResult(reader.read(self._file_name))
+
+
+class AddSceneNodeOperation:
+    def __init__(self, node, parent):
+        (self._node, self._parent) = (node, parent)
+
+
+    def redo(self):
+        self._node.setParent(self._parent)
+
+
+    def push(self):
+        self.redo()
+
+
+class RemoveSceneNodeOperation:
+    def __init__(self, node):
+        self._node = node
+
+
+    def redo(self):
+        self._node.setParent(None)
+
+
+    def push(self):
+        self.redo()
+
+
+class GroupedOperation:
+    def __init__(self):
+        self._children = []
+
+
+    def addOperation(self, operation):
+        self._children.append(operation)
+
+
+    def getNumChildrenOperations(self):
+        return len(self._children)
+
+
+    def redo(self):
+        for operation in self._children:
+            operation.redo()
+
+
+    def push(self):
+        self.redo()
+
+
+class QTimer:
+    """Single shot timer driven by the event loop."""
+
+    def __init__(self):
+        self.timeout = Signal()
+        self._handle = None
+
+
+    def setSingleShot(self, single_shot):
+        pass
+
+
+    def start(self, milliseconds):
+        self.stop()
+        self._handle = loop.call_later(milliseconds / 1000, self._fire)
+
+
+    def stop(self):
+        if self._handle:
+            self._handle[4] = True
+            self._handle = None
+
+
+    def _fire(self):
+        self._handle = None
+        self.timeout.emit()
+
+
+    def deleteLater(self):
+        self.stop()
+
+
+class QFileSystemWatcher:
+    """Remembers the watched files. The benchmarks report changes themselves."""
+
+    def __init__(self):
+        self.fileChanged = Signal()
+        self._files = set()
+
+
+    def addPath(self, path):
+        self._files.add(path)
+
+
+    def files(self):
+        return list(self._files)
+
+
+class Extension:
+    def setMenuName(self, name):
+        pass
+
+
+    def addMenuItem(self, name, function):
+        pass
+
+
+    def getPluginId(self):
+        return 'CuraBlender'
+
+
+class PluginRegistry:
+    """Knows the path of the plugin, which gets set by install."""
+
+    plugin_path = None
+
+    @classmethod
+    def getInstance(cls):
+        return cls
+
+
+    @classmethod
+    def getPluginPath(cls, plugin_id):
+        return cls.plugin_path
+
+
+class Resources:
+    """Keeps all storage of the benchmarks inside one temporary directory, which gets set by install."""
+
+    Preferences = 'preferences'
+    storage_path = None
+
+    @classmethod
+    def getStoragePath(cls, resource_type):
+        return cls.storage_path
+
+
+    @classmethod
+    def getCacheStoragePath(cls):
+        return os.path.join(cls.storage_path, 'cache')
+
+
+    @classmethod
+    def getDataStoragePath(cls):
+        return os.path.join(cls.storage_path, 'data')
+
+
+class Platform:
+    @staticmethod
+    def isWindows():
+        return False
+
+
+    @staticmethod
+    def isOSX():
+        return False
+
+
+    @staticmethod
+    def isLinux():
+        return True
+
+
+class Selection:
+    @staticmethod
+    def getAllSelectedObjects():
+        return []
+
+
+class i18nCatalog:
+    def __init__(self, name):
+        pass
+
+
+    def i18nc(self, context, text, *arguments):
+        return text
+
+
+class MeshReader:
+    def __init__(self):
+        pass
+
+
+class MeshWriter:
+    class OutputMode:
+        TextMode = 1
+        BinaryMode = 2
+
+    def __init__(self, add_to_recent_files = True):
+        pass
+
+
+def install(plugin_path, storage_path):
+    """Registers all stand-ins as modules, so the plugin imports them instead of Uranium, Cura and Qt.
+
+    :param plugin_path: The directory of the plugin.
+    :param storage_path: The directory for preferences, caches and capabilities.
+    """
+
+    PluginRegistry.plugin_path = plugin_path
+    Resources.storage_path = storage_path
+    contents = {
+        'UM.Application': {'Application': Application},
+        'UM.Extension': {'Extension': Extension},
+        'UM.Job': {'Job': Job},
+        'UM.JobQueue': {'JobQueue': JobQueue},
+        'UM.Logger': {'Logger': Logger},
+        'UM.Math.Vector': {'Vector': Vector},
+        'UM.Mesh.MeshBuilder': {'MeshBuilder': MeshBuilder},
+        'UM.Mesh.MeshReader': {'MeshReader': MeshReader},
+        'UM.Mesh.MeshWriter': {'MeshWriter': MeshWriter},
+        'UM.Mesh.ReadMeshJob': {'ReadMeshJob': ReadMeshJob},
+        'UM.Message': {'Message': Message},
+        'UM.Operations.AddSceneNodeOperation': {'AddSceneNodeOperation': AddSceneNodeOperation},
+        'UM.Operations.RemoveSceneNodeOperation': {'RemoveSceneNodeOperation': RemoveSceneNodeOperation},
+        'UM.Operations.GroupedOperation': {'GroupedOperation': GroupedOperation},
+        'UM.Platform': {'Platform': Platform},
+        'UM.PluginRegistry': {'PluginRegistry': PluginRegistry},
+        'UM.Resources': {'Resources': Resources},
+        'UM.Scene.Selection': {'Selection': Selection},
+        'UM.Signal': {'Signal': Signal},
+        'UM.Version': {'Version': Version},
+        'UM.i18n': {'i18nCatalog': i18nCatalog},
+        'cura.Scene.CuraSceneNode': {'CuraSceneNode': SceneNode},
+        'PyQt6.QtCore': {'QTimer': QTimer, 'QFileSystemWatcher': QFileSystemWatcher, 'QUrl': str, 'QEventLoop': object},
+        'PyQt6.QtGui': {'QDesktopServices': None},
+        'PyQt6.QtWidgets': {'QFileDialog': None, 'QInputDialog': None},
+    }
+    for (module_name, attributes) in contents.items():
+        parts = module_name.split('.')
+        # Creates the parent packages on the way.
+        for depth in range(1, len(parts) + 1):
+            name = '.'.join(parts[:depth])
+            if name not in sys.modules:
+                module = types.ModuleType(name)
+                module.__path__ = []
+                sys.modules[name] = module
+                if depth > 1:
+                    setattr(sys.modules['.'.join(parts[:depth - 1])], parts[depth - 1], module)
+        sys.modules[module_name].__dict__.update(attributes)